@@ -0,0 +1,56 @@
+"""add_phone_digits
+
+Revision ID: 3c8e51d0a7b2
+Revises: f0b7a1d9d22a
+Create Date: 2026-10-18 10:12:41.305117
+
+phone_digits is unique, so one number cannot be registered twice in different
+formats. Rows stored before this revision may already hold the same number in
+different formats ("+380674444441" and "0674444441"); the upgrade then stops
+before creating the index and lists them. Find them with
+
+    SELECT phone_digits, array_agg(id ORDER BY id) FROM contacts
+    GROUP BY phone_digits HAVING count(*) > 1;
+
+change the phone of all but one account of each group, and run the upgrade again.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e51d0a7b2'
+down_revision: Union[str, None] = 'f0b7a1d9d22a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('phone_digits', sa.String(length=13), nullable=True))
+    # backfill with the same normalization as src.database.models.normalize_phone
+    op.execute(r"UPDATE contacts SET phone_digits = regexp_replace(phone, '\D', '', 'g')")
+    op.execute("UPDATE contacts SET phone_digits = substr(phone_digits, 3) WHERE phone_digits LIKE '380%'")
+    op.alter_column('contacts', 'phone_digits', nullable=False)
+    duplicates = op.get_bind().execute(
+        sa.text("SELECT phone_digits, count(*) FROM contacts GROUP BY phone_digits HAVING count(*) > 1")
+    ).all()
+    if duplicates:
+        shared = ", ".join(f"{phone_digits} ({count} contacts)" for phone_digits, count in duplicates)
+        raise RuntimeError(
+            f"Phone numbers shared by several contacts: {shared}. "
+            f"Clean them up as described in the docstring of revision {revision}."
+        )
+    op.create_index(
+        'ix_contacts_phone_digits',
+        'contacts',
+        ['phone_digits'],
+        unique=True,
+        postgresql_ops={'phone_digits': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_phone_digits', table_name='contacts')
+    op.drop_column('contacts', 'phone_digits')
@@ -0,0 +1,53 @@
+"""add_owned_contacts
+
+Revision ID: 5b3e9f2a7c41
+Revises: 7d2f0c9e4b15
+Create Date: 2026-10-18 18:21:44.306117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b3e9f2a7c41'
+down_revision: Union[str, None] = '7d2f0c9e4b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('owned_contacts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('email', sa.String(length=50), nullable=False),
+    sa.Column('phone', sa.String(length=13), nullable=False),
+    sa.Column('phone_digits', sa.String(length=13), nullable=False),
+    sa.Column('birthday', sa.Date(), nullable=False),
+    sa.Column('birthday_md', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['contacts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_owned_contacts_owner_id_id', 'owned_contacts', ['owner_id', 'id'], unique=False)
+    op.create_index('ix_owned_contacts_owner_id_name', 'owned_contacts', ['owner_id', 'name'], unique=False)
+    op.create_index('ix_owned_contacts_owner_id_email', 'owned_contacts', ['owner_id', 'email'], unique=False)
+    op.create_index(
+        'ix_owned_contacts_owner_id_phone_digits',
+        'owned_contacts',
+        ['owner_id', 'phone_digits'],
+        unique=False,
+        postgresql_ops={'phone_digits': 'varchar_pattern_ops'},
+    )
+    op.create_index('ix_owned_contacts_owner_id_birthday_md', 'owned_contacts', ['owner_id', 'birthday_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_owned_contacts_owner_id_birthday_md', table_name='owned_contacts')
+    op.drop_index('ix_owned_contacts_owner_id_phone_digits', table_name='owned_contacts')
+    op.drop_index('ix_owned_contacts_owner_id_email', table_name='owned_contacts')
+    op.drop_index('ix_owned_contacts_owner_id_name', table_name='owned_contacts')
+    op.drop_index('ix_owned_contacts_owner_id_id', table_name='owned_contacts')
+    op.drop_table('owned_contacts')
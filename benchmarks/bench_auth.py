@@ -0,0 +1,141 @@
+"""
+Throughput and allocations of the auth hot path, with a regression gate.
+
+Measures each piece of src.services.auth in isolation (bcrypt hash and verify, JWT
+encode and decode, get_current_contact with its database lookup) and the full cycle of
+a login followed by an authenticated GET through main:app. Every operation runs for at
+least --min-time seconds, split in five rounds; ops/s is the rate of the fastest round,
+which is the least disturbed by the rest of the machine, and alloc_kib the mean peak of
+memory traced by tracemalloc during one operation.
+
+--save writes the results as a baseline; --baseline compares with one and exits with
+status 1 when an operation is slower or allocates more than --tolerance allows.
+
+    python benchmarks/bench_auth.py --save auth-baseline.json
+    python benchmarks/bench_auth.py --baseline auth-baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+
+async def measure(operation, min_time: float, rounds: int = 5, alloc_runs: int = 5) -> dict:
+    rates = []
+    for _ in range(rounds):
+        count, started = 0, time.perf_counter()
+        while count < 3 or time.perf_counter() - started < min_time / rounds:
+            await operation()
+            count += 1
+        rates.append(count / (time.perf_counter() - started))
+    ops = max(rates)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_runs):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await operation()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {"ops": round(ops, 1), "alloc_kib": round(sum(peaks) / len(peaks) / 1024, 2)}
+
+
+def check(results: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    print(f"\n{'operation':<22} {'ops/s':>16} {'alloc KiB':>18}")
+    for name, after in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        ops_change = after["ops"] / before["ops"] - 1
+        alloc_change = after["alloc_kib"] / before["alloc_kib"] - 1 if before["alloc_kib"] else 0.0
+        regressed = ops_change < -tolerance or alloc_change > tolerance
+        ok = ok and not regressed
+        print(
+            f"{name:<22} {ops_change:>+16.1%} {alloc_change:>+18.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+async def main(args) -> int:
+    from bench_http import PASSWORD, Client, prepare_database
+    from main import app
+    from my_limiter import limiter
+    from src.database.db import sessionmanager
+    from src.services.auth import auth_service
+
+    limiter.enabled = False
+    await prepare_database(1)
+    email = "contact0@example.com"
+    password_hash = auth_service.get_password_hash(PASSWORD)
+    access_token = await auth_service.create_access_token(data={"sub": email})
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
+
+    async def bcrypt_hash():
+        auth_service.get_password_hash(PASSWORD)
+
+    async def bcrypt_verify():
+        auth_service.verify_password(PASSWORD, password_hash)
+
+    async def jwt_encode():
+        await auth_service.create_access_token(data={"sub": email})
+
+    async def jwt_decode():
+        await auth_service.decode_refresh_token(refresh_token)
+
+    async def get_current_contact():
+        async with sessionmanager.session() as session:
+            await auth_service.get_current_contact(access_token, session)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        client = Client(http, 0)
+
+        async def login_then_get():
+            await client.login()
+            response = await http.get("/api/contacts/1", headers=client.auth())
+            assert response.status_code == 200, response.text
+
+        operations = {
+            "bcrypt_hash": bcrypt_hash,
+            "bcrypt_verify": bcrypt_verify,
+            "jwt_encode": jwt_encode,
+            "jwt_decode": jwt_decode,
+            "get_current_contact": get_current_contact,
+            "login_then_get": login_then_get,
+        }
+        results = {}
+        print(f"{'operation':<22} {'ops/s':>10} {'alloc KiB':>10}")
+        for name, operation in operations.items():
+            results[name] = await measure(operation, args.min_time)
+            print(f"{name:<22} {results[name]['ops']:>10.1f} {results[name]['alloc_kib']:>10.2f}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if not check(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per operation")
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    sys.exit(asyncio.run(main(args)))
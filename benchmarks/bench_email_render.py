@@ -0,0 +1,84 @@
+"""
+Confirmation emails rendered per second.
+
+Compares the fastapi-mail path (a fresh Jinja2 environment, template load and
+render, then MIME building and encoding for every message) with the precompiled
+TemplatedEmail from src.services.email_render.
+
+    python benchmarks/bench_email_render.py --messages 20000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi_mail import ConnectionConfig, MessageSchema, MessageType
+from fastapi_mail.msg import MailMsg
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.services.email_render import TemplatedEmail  # noqa: E402
+
+TEMPLATE_FOLDER = Path(__file__).resolve().parent.parent / "src" / "services" / "templates"
+TOKEN = "x" * 150
+
+
+async def fastapi_mail_render(conf: ConnectionConfig, number: int) -> bytes:
+    template = conf.template_engine().get_template("email_template.html")
+    message = MessageSchema(
+        subject="Confirm your email ",
+        recipients=[f"user{number}@example.com"],
+        template_body=template.render(host="http://localhost:8000/", username=f"user{number}", token=TOKEN),
+        subtype=MessageType.html,
+    )
+    msg = await MailMsg(message)._message(f"Auth contact <{conf.MAIL_FROM}>")
+    return msg.as_bytes()
+
+
+def templated_render(templated: TemplatedEmail, number: int) -> bytes:
+    return templated.prepare(
+        f"user{number}@example.com", username=f"user{number}", host="http://localhost:8000/", token=TOKEN
+    ).data
+
+
+async def main(args):
+    conf = ConnectionConfig(
+        MAIL_USERNAME="bench@example.com",
+        MAIL_PASSWORD="password",
+        MAIL_FROM="bench@example.com",
+        MAIL_PORT=465,
+        MAIL_SERVER="localhost",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+    )
+    started = time.perf_counter()
+    for number in range(args.messages):
+        await fastapi_mail_render(conf, number)
+    baseline = args.messages / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    templated = TemplatedEmail(
+        TEMPLATE_FOLDER,
+        "email_template.html",
+        "email_template.txt",
+        fields=("username", "host", "token"),
+        subject="Confirm your email ",
+        sender_address=conf.MAIL_FROM,
+        sender_name="Auth contact",
+    )
+    compile_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for number in range(args.messages):
+        templated_render(templated, number)
+    compiled = args.messages / (time.perf_counter() - started)
+
+    print(f"fastapi-mail   {baseline:12.0f} messages/s")
+    print(f"TemplatedEmail {compiled:12.0f} messages/s  (compiled once in {compile_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
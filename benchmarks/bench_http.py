@@ -0,0 +1,271 @@
+"""
+HTTP throughput and latency percentiles of the real application, scenario by scenario.
+
+Drives main:app in process through httpx's ASGI transport with --concurrency clients,
+each logged in as its own seeded contact, so the numbers include routing, validation,
+dependencies, the database and serialization, but no network or server overhead.
+The rate limits are switched off. Redis is only used with --lifespan, which also runs
+the application lifespan (a Redis server must be reachable).
+
+The database is --db-url (default: a fresh SQLite file); its tables are created and
+seeded with --contacts contacts, each with an address book of --book-size entries,
+which the list, search and birthdays scenarios read. A database that already has
+tables is refused, since they are dropped first; pass --recreate to drop them anyway. Results are written to --output as JSON and compared
+with a previous run with --compare, which fails when a p95 regresses by more than --tolerance.
+
+    python benchmarks/bench_http.py --requests 500 --concurrency 16 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+PASSWORD = "secret1"
+SCENARIOS = ("signup", "login", "list", "search", "birthdays", "refresh")
+
+
+def percentile(samples: list[float], share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def seed_contact(number: int, password: str, today: date):
+    from src.database.models import Contact
+
+    return Contact(
+        name=f"Contact {number}",
+        email=f"contact{number}@example.com",
+        phone=f"0{number:09d}",
+        birthday=today - timedelta(days=365 * 30 + number % 365),
+        password=password,
+        confirmed=True,
+    )
+
+
+def seed_entry(owner_id: int, number: int, today: date):
+    from src.database.models import OwnedContact
+
+    return OwnedContact(
+        owner_id=owner_id,
+        name=f"Entry {number}",
+        email=f"entry{number}@example.com",
+        phone=f"0{number:09d}",
+        birthday=today - timedelta(days=365 * 30 + number % 365),
+    )
+
+
+async def prepare_database(contacts: int, book_size: int = 100, recreate: bool = False):
+    """
+    The prepare_database function creates the tables of DB_URL and seeds the benchmark contacts.
+        The tables are dropped first, so a database that already has any is refused unless recreate is set.
+
+    :param contacts: int: How many contacts to seed
+    :param book_size: int: How many address book entries each contact gets
+    :param recreate: bool: Drop the tables of a database that is not empty
+    :return: None
+    :doc-author: Trelent
+    """
+    from sqlalchemy import inspect
+
+    from src.database.db import sessionmanager
+    from src.database.models import Base
+    from src.services.auth import auth_service
+
+    async with sessionmanager.engine.begin() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        if tables and not recreate:
+            raise SystemExit(
+                f"{sessionmanager.engine.url.render_as_string()} already has tables ({', '.join(tables)}); "
+                "the benchmark drops them, pass --recreate if that is what you want"
+            )
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    password = auth_service.get_password_hash(PASSWORD)
+    today = date.today()
+    async with sessionmanager.session() as session:
+        for start in range(0, contacts, 5000):
+            session.add_all(seed_contact(number, password, today) for number in range(start, min(start + 5000, contacts)))
+            await session.commit()
+        # contact N has id N + 1, its entries follow each other
+        for owner in range(contacts):
+            session.add_all(seed_entry(owner + 1, number, today) for number in range(book_size))
+            if owner % 50 == 49 or owner == contacts - 1:
+                await session.commit()
+
+
+class Client:
+    def __init__(self, http: httpx.AsyncClient, number: int, book_size: int = 100):
+        self.http = http
+        self.number = number
+        self.book_size = book_size
+        self.access_token = None
+        self.refresh_token = None
+        self.signups = 0
+
+    @property
+    def email(self) -> str:
+        return f"contact{self.number}@example.com"
+
+    async def login(self) -> httpx.Response:
+        response = await self.http.post("/api/auth/login", data={"username": self.email, "password": PASSWORD})
+        if response.status_code == 200:
+            tokens = response.json()
+            self.access_token, self.refresh_token = tokens["access_token"], tokens["refresh_token"]
+        return response
+
+    def auth(self, token: str | None = None) -> dict:
+        return {"Authorization": f"Bearer {token or self.access_token}"}
+
+    async def signup(self) -> httpx.Response:
+        self.signups += 1
+        number = 10_000_000 + self.number * 100_000 + self.signups
+        return await self.http.post(
+            "/api/auth/signup",
+            json={
+                "name": f"Signup {number}",
+                "email": f"signup{number}@example.com",
+                "phone": f"0{number:09d}",
+                "birthday": "1990-01-01",
+                "password": PASSWORD,
+            },
+        )
+
+    async def list(self) -> httpx.Response:
+        return await self.http.get("/api/contacts/", params={"offset": self.number % max(self.book_size - 10, 1), "limit": 10}, headers=self.auth())
+
+    async def search(self) -> httpx.Response:
+        return await self.http.get(f"/api/contacts/search/Entry {self.number % max(self.book_size, 1)}", headers=self.auth())
+
+    async def birthdays(self) -> httpx.Response:
+        return await self.http.get("/api/contacts/coming-birthday/", headers=self.auth())
+
+    async def refresh(self) -> httpx.Response:
+        response = await self.http.get("/api/auth/refresh_token", headers=self.auth(self.refresh_token))
+        if response.status_code == 200:
+            tokens = response.json()
+            self.access_token, self.refresh_token = tokens["access_token"], tokens["refresh_token"]
+        return response
+
+
+async def run_scenario(clients: list[Client], name: str, requests: int) -> dict:
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def worker(client: Client):
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await getattr(client, name)()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    print(f"\n{'scenario':<10} {'p95 before':>11} {'p95 after':>10} {'change':>8}")
+    for name, after in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        change = after["p95_ms"] / before["p95_ms"] - 1
+        flag = ""
+        if change > tolerance:
+            ok, flag = False, "  REGRESSION"
+        print(f"{name:<10} {before['p95_ms']:>9.2f}ms {after['p95_ms']:>8.2f}ms {change:>+8.1%}{flag}")
+    return ok
+
+
+async def main(args) -> int:
+    from main import app
+    from my_limiter import limiter
+
+    limiter.enabled = False
+    await prepare_database(args.contacts, args.book_size, args.recreate)
+
+    lifespan = app.router.lifespan_context(app) if args.lifespan else contextlib.nullcontext()
+    async with lifespan:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            clients = [Client(http, number, args.book_size) for number in range(args.concurrency)]
+            for client in clients:
+                await client.login()
+            results = {
+                "commit": git_commit(),
+                "database": args.db_url.split("://")[0],
+                "contacts": args.contacts,
+                "book_size": args.book_size,
+                "concurrency": args.concurrency,
+                "scenarios": {},
+            }
+            print(f"{'scenario':<10} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+            for name in args.scenarios:
+                stats = await run_scenario(clients, name, args.requests)
+                results["scenarios"][name] = stats
+                print(
+                    f"{name:<10} {stats['rps']:>8.1f} {stats['p50_ms']:>7.2f}ms "
+                    f"{stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms {stats['errors']:>7}"
+                )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db-url", default=None, help="defaults to a new SQLite file")
+    parser.add_argument("--recreate", action="store_true", help="drop the tables of a --db-url that has any")
+    parser.add_argument("--contacts", type=int, default=1000)
+    parser.add_argument("--book-size", type=int, default=100, help="address book entries per contact")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--lifespan", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    if args.db_url is None:
+        args.db_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["DB_URL"] = args.db_url
+    args.contacts = max(args.contacts, args.concurrency)
+    sys.exit(asyncio.run(main(args)))
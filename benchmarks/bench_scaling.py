@@ -0,0 +1,126 @@
+"""
+Throughput of serve.py as the number of workers grows.
+
+For every worker count in --workers the launcher is started on a free port against a
+seeded SQLite database, and --clients load generator processes send requests for
+--duration seconds: the liveness probe, which measures the server itself, and an
+authenticated GET of a contact, which adds JWT decoding and a database query. Reports
+req/s per worker count and the scaling efficiency relative to one worker
+(req/s / (workers * req/s of one worker)). Efficiency above the number of cores cannot
+be expected; with SQLite the database serializes writes but not these reads.
+
+    python benchmarks/bench_scaling.py --workers 1 2 4 --clients 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/health/live").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"serve.py did not start on {base_url}")
+
+
+async def drive(base_url: str, path: str, headers: dict, duration: float, connections: int) -> int:
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits) as http:
+
+        async def loop() -> int:
+            done = 0
+            while time.monotonic() < deadline:
+                response = await http.get(path)
+                assert response.status_code == 200, response.text
+                done += 1
+            return done
+
+        return sum(await asyncio.gather(*(loop() for _ in range(connections))))
+
+
+def client_process(job: tuple) -> int:
+    return asyncio.run(drive(*job))
+
+
+def run(workers: int, args, env: dict, headers: dict) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--allow-unsafe"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(base_url)
+        results = {}
+        for name, path, request_headers in (
+            ("live", "/api/health/live", {}),
+            ("contact", "/api/contacts/1", headers),
+        ):
+            job = (base_url, path, request_headers, args.duration, args.connections)
+            with multiprocessing.Pool(args.clients) as pool:
+                total = sum(pool.map(client_process, [job] * args.clients))
+            results[name] = total / args.duration
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+async def prepare(db_url: str) -> dict:
+    os.environ["DB_URL"] = db_url
+    from bench_http import prepare_database
+    from src.services.auth import auth_service
+
+    await prepare_database(1)
+    token = await auth_service.create_access_token(data={"sub": "contact0@example.com"}, expires_delta=3600)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def main(args):
+    db_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    headers = asyncio.run(prepare(db_url))
+    env = {**os.environ, "DB_URL": db_url, "RATELIMIT_ENABLED": "false", "WARMUP_ENABLED": "false"}
+
+    print(f"{'workers':>7} {'live req/s':>12} {'eff.':>6} {'contact req/s':>14} {'eff.':>6}")
+    single = None
+    for workers in args.workers:
+        results = run(workers, args, env, headers)
+        single = single or results
+        efficiency = {name: rate / (workers * single[name]) for name, rate in results.items()}
+        print(
+            f"{workers:>7} {results['live']:>12.1f} {efficiency['live']:>6.0%} "
+            f"{results['contact']:>14.1f} {efficiency['contact']:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=max(os.cpu_count() or 1, 2), help="load generator processes")
+    parser.add_argument("--connections", type=int, default=8, help="concurrent connections per client")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Per-message latency and throughput of confirmation email delivery.
+
+Compares fastapi-mail's FastMail, which opens a new SMTP session per message,
+with the pooled transport in src.services.mail_transport. Both send to a local
+aiosmtpd server, so the numbers only include the SMTP conversation; against a
+real provider every new session also pays the TLS handshake and LOGIN.
+
+    python benchmarks/bench_smtp.py --messages 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.services.mail_transport import SMTPPool  # noqa: E402
+
+TEMPLATE_FOLDER = Path(__file__).resolve().parent.parent / "src" / "services" / "templates"
+
+
+class NullHandler:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def message(number: int) -> MessageSchema:
+    return MessageSchema(
+        subject="Confirm your email ",
+        recipients=[f"user{number}@example.com"],
+        template_body={"host": "http://localhost:8000/", "username": f"user{number}", "token": "x" * 150},
+        subtype=MessageType.html,
+    )
+
+
+async def run(send, messages: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(number):
+        async with semaphore:
+            started = time.perf_counter()
+            await send(message(number))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in range(messages)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "messages/s": messages / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main(args):
+    port = free_port()
+    controller = Controller(NullHandler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    conf = ConnectionConfig(
+        MAIL_USERNAME="bench@example.com",
+        MAIL_PASSWORD="password",
+        MAIL_FROM="bench@example.com",
+        MAIL_PORT=port,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+    )
+    try:
+        fm = FastMail(conf)
+        pool = SMTPPool(conf, size=args.pool_size)
+        results = {
+            "FastMail": await run(
+                lambda msg: fm.send_message(msg, template_name="email_template.html"),
+                args.messages,
+                args.concurrency,
+            ),
+            "SMTPPool": await run(
+                lambda msg: pool.send_message(msg, template_name="email_template.html"),
+                args.messages,
+                args.concurrency,
+            ),
+        }
+        await pool.close()
+    finally:
+        controller.stop()
+    for name, result in results.items():
+        print(f"{name:10}" + "  ".join(f"{key}={value:9.2f}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=2)
+    asyncio.run(main(parser.parse_args()))
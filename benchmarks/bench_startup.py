@@ -0,0 +1,106 @@
+"""
+Cold start time of a worker process, with an import-time report.
+
+Starts fresh interpreters that import main, build the application and then touch the
+lazily created subsystems (settings, database engine, mail pool, avatar storage), and
+reports the median of each phase. -X importtime output is summed per top-level package
+and per first-party module to show where import time goes. With --ref the same
+measurement runs on a git worktree of another commit for comparison.
+
+    python benchmarks/bench_startup.py --runs 7 --ref HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIRST_PARTY = ("main", "my_limiter", "worker", "conf", "src")
+
+PHASES = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app() if hasattr(main, "create_app") else main.app
+created = time.perf_counter()
+from src.database.db import sessionmanager
+sessionmanager.engine
+from src.services import email
+email.get_mail_pool() if hasattr(email, "get_mail_pool") else email.mail_pool
+from src.services import avatar
+avatar.get_storage()
+initialized = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "subsystems_ms": (initialized - created) * 1000,
+}))
+"""
+
+
+def measure(cwd: Path, runs: int) -> dict:
+    samples = defaultdict(list)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PHASES], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout
+        for phase, value in json.loads(output.splitlines()[-1]).items():
+            samples[phase].append(value)
+    return {phase: statistics.median(values) for phase, values in samples.items()}
+
+
+def import_report(cwd: Path, top: int):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=cwd, capture_output=True, text=True, check=True
+    ).stderr
+    packages, first_party = defaultdict(int), {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        module = name.strip()
+        packages[module.split(".")[0]] += int(self_us)
+        if module.split(".")[0] in FIRST_PARTY:
+            first_party[module] = int(cumulative_us)
+    print(f"\n{'package (self time)':<40} {'ms':>8}")
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<40} {us / 1000:>8.1f}")
+    print(f"\n{'first-party module (cumulative)':<40} {'ms':>8}")
+    for module, us in sorted(first_party.items(), key=lambda item: -item[1])[:top]:
+        print(f"{module:<40} {us / 1000:>8.1f}")
+
+
+def print_phases(label: str, phases: dict):
+    total = sum(phases.values())
+    print(
+        f"{label:<10} import {phases['import_ms']:8.1f} ms   create_app {phases['create_app_ms']:7.1f} ms   "
+        f"subsystems {phases['subsystems_ms']:7.1f} ms   total {total:8.1f} ms"
+    )
+
+
+def main(args):
+    print_phases("current", measure(ROOT, args.runs))
+    if args.ref:
+        worktree = Path(tempfile.mkdtemp()) / "ref"
+        subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.ref], cwd=ROOT, check=True, capture_output=True)
+        try:
+            if (ROOT / ".env").exists():
+                os.symlink(ROOT / ".env", worktree / ".env")
+            print_phases(args.ref, measure(worktree, args.runs))
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT, check=True)
+    import_report(ROOT, args.top)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="git commit to compare with")
+    parser.add_argument("--top", type=int, default=12)
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Latency of each src.repository.contacts and src.repository.owned_contacts query against
+seeded datasets of --rows accounts and --rows address book entries. Address book queries
+run in the book of the middle owner. See benchmarks/conftest.py for how to run the suite
+and compare runs.
+"""
+import itertools
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+from src.database.models import Contact
+from src.repository import contacts as repository_contacts
+from src.repository import owned_contacts as repository_owned_contacts
+from src.schemas import UpdateSchema
+
+from conftest import contact_row
+
+SEARCH_TERMS = {
+    "email": "user{middle}@example.com",
+    "name": "Iryna Melnyk",
+    "phone_prefix": "{digits:.9}",
+    "phone_formatted": "+38 ({digits:.3}) {digits[3]}{digits[4]}{digits[5]}-{digits[6]}{digits[7]}",
+    "no_match": "Nobody",
+}
+
+
+def test_get_contacts_first_page(benchmark, dataset):
+    result = benchmark(dataset.call, repository_owned_contacts.get_contacts, dataset.owner, 0, 10)
+    assert len(result) == 10
+
+
+def test_get_contacts_deep_page(benchmark, dataset):
+    result = benchmark(dataset.call, repository_owned_contacts.get_contacts, dataset.owner, dataset.book_size - 20, 10)
+    assert len(result) == 10
+
+
+def test_get_contact(benchmark, dataset):
+    contact_id = dataset.owner_first + dataset.book_size // 2 + 1
+    result = benchmark(dataset.call, repository_owned_contacts.get_contact, dataset.owner, contact_id)
+    assert result is not None
+
+
+def test_get_contact_by_email(benchmark, dataset):
+    result = benchmark(dataset.call, repository_contacts.get_contact_by_email, f"user{dataset.rows // 2}@example.com")
+    assert result is not None
+
+
+@pytest.mark.parametrize("kind", SEARCH_TERMS)
+def test_search_contacts(benchmark, dataset, kind):
+    middle = dataset.owner_first + dataset.book_size // 2
+    term = SEARCH_TERMS[kind].format(middle=middle, digits=f"067{middle:07d}")
+    result = benchmark(dataset.call, repository_owned_contacts.search_contacts, dataset.owner, term, 0, 10)
+    assert (len(result) == 0) == (kind == "no_match")
+
+
+def test_search_contacts_coming_birthday(benchmark, dataset):
+    benchmark(dataset.call, repository_owned_contacts.search_contacts_coming_birthday, dataset.owner, 0, 10)
+
+
+def test_update_contact(benchmark, dataset):
+    contact = dataset.call(repository_contacts.get_contact_by_email, f"user{dataset.rows // 3}@example.com")
+    names = itertools.cycle(("Updated Name", contact.name))
+
+    def update():
+        body = UpdateSchema(name=next(names), phone=contact.phone, birthday=contact.birthday)
+        return dataset.call(repository_contacts.update_contact, contact.id, body)
+
+    assert benchmark(update) is not None
+
+
+def test_delete_contact(benchmark, dataset):
+    numbers = itertools.count(dataset.rows + 1_000_000)
+
+    async def add_contact(session):
+        result = await session.execute(insert(Contact).returning(Contact.id), [contact_row(next(numbers), date.today())])
+        contact_id = result.scalar_one()
+        await session.commit()
+        return contact_id
+
+    def setup():
+        async def run():
+            async with dataset.session_maker() as session:
+                return await add_contact(session)
+
+        return (repository_contacts.delete_contact, dataset.run(run())), {}
+
+    benchmark.pedantic(dataset.call, setup=setup, rounds=50)
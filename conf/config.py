@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Any
 
 from pydantic import ConfigDict, field_validator, EmailStr
@@ -18,6 +19,66 @@ class Settings(BaseSettings):
     CLOUD_NAME: str
     CLOUD_API_KEY: str
     CLOUD_API_SECRET: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_MAX_CONNECTIONS: int | None = None
+    WEB_CONCURRENCY: int | None = None
+    GRACEFUL_TIMEOUT: int = 30
+    MAIL_POOL_SIZE: int = 2
+    MAIL_POOL_IDLE_TIMEOUT: int = 30
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL: float = 2.0
+    OUTBOX_LEASE: int = 120
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE: int = 30
+    AVATAR_STORAGE: str = "cloudinary"
+    AVATAR_LOCAL_DIR: str = "media/avatars"
+    AVATAR_THUMBNAIL_SIZES: list[int] = [32, 64, 128]
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    AVATAR_UPLOAD_WORKERS: int = 4
+    AVATAR_PROCESS_WORKERS: int = 2
+    AVATAR_SIZE: int = 250
+    AVATAR_MAX_PIXELS: int = 40_000_000
+    AVATAR_DEDUP_TTL: int = 30 * 24 * 3600
+    HEALTH_PROBE_INTERVAL: float = 5.0
+    HEALTH_PROBE_TIMEOUT: float = 2.0
+    HEALTH_POOL_SATURATION: float = 0.9
+    HEALTH_OUTBOX_MAX_AGE: int = 900
+    SQL_PROFILE_ENABLED: bool = False
+    SQL_SLOW_THRESHOLD_MS: float = 100.0
+    SQL_EXPLAIN_SAMPLE_RATE: float = 0.0
+    SQL_SLOW_LOG: str = "logs/slow_queries.log"
+    ADMIN_EMAILS: list[str] = []
+    PROFILE_SECRET: str | None = None
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_DIR: str = "logs/profiles"
+    LOOP_LAG_INTERVAL: float = 0.1
+    LOOP_LAG_THRESHOLD: float = 0.1
+    LOOP_LAG_CAPTURE_INTERVAL: float = 60.0
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int = 5
+    SEARCH_CACHE_TTL: int = 30
+    CONTACT_CACHE_TTL: int = 300
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_RETRY_INTERVAL: float = 5.0
+    # BCAST tracking notifies every worker of every write under these prefixes, so only keys
+    # read far more often than written belong here, not the per-query search entries
+    REDIS_TRACKED_PREFIXES: list[str] = ["owned_contact:", "search:generation:"]
+    REDIS_LOCAL_CACHE_SIZE: int = 10000
+    REDIS_LOCAL_CACHE_TTL: float = 60.0
+    RATELIMIT_SYNC_INTERVAL: float = 1.0
+    INVALIDATION_CHANNEL: str = "cache:invalidation"
+    INVALIDATION_QUEUE_SIZE: int = 10000
+    TRUSTED_PROXIES: list[str] = []
+
+    @field_validator("AVATAR_STORAGE")
+    @classmethod
+    def validate_avatar_storage(cls, v: Any):
+        if v not in ["cloudinary", "local"]:
+            raise ValueError("avatar storage must be cloudinary or local")
+        return v
 
     @field_validator("ALGORITHM")
     @classmethod
@@ -30,4 +91,29 @@ class Settings(BaseSettings):
         extra="ignore", env_file=".env", env_file_encoding="utf-8"
     )  # noqa
 
-config = Settings()
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    The get_settings function reads the settings from the environment and .env on first use.
+
+    :return: The application settings
+    :doc-author: Trelent
+    """
+    return Settings()
+
+
+class LazySettings:
+    """
+    Stands in for the Settings instance and reads it on first attribute access, so importing
+    a module that uses ``config`` neither parses .env nor fails on a missing setting.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(get_settings(), name, value)
+
+
+config = LazySettings()
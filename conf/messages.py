@@ -11,3 +11,8 @@ CONTACT_NOT_FOUND = "Contact not found"
 INVALID_SCOPE_FOR_TOKEN = "Invalid scope for token"
 COULD_NOT_VALIDATE_CREDENTIALS = "Could not validate credentials"
 INVALID_TOKEN_FOR_EMAIL_VERIFICATION = "Invalid token for email verification"
+PHONE_EXIST = "Phone number already exists"
+FILE_TOO_LARGE = "File is too large"
+INVALID_IMAGE = "File is not a supported image"
+AVATAR_NOT_FOUND = "Avatar not found"
+NOT_ENOUGH_PERMISSIONS = "Not enough permissions"
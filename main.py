@@ -1,38 +1,24 @@
 # import os
 # import uvicorn
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.database.db import get_db
 from src.routes import contacts
 from src.routes import auth
+from src.routes import avatars
+from src.routes import health
+from src.routes import admin
+from src.database.profiler import RouteContextMiddleware
+from src.services.avatar import UploadLimitMiddleware
+from src.services.health import get_health_prober
+from src.services.metrics import MetricsMiddleware, metrics_response
+from src.services.profiling import ProfilerMiddleware
 
 from my_limiter import lifespan
 from conf.config import config
 
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
 
-
-app = FastAPI(lifespan=lifespan)
-# app = FastAPI()
-
-app.include_router(auth.router, prefix="/api")
-app.include_router(contacts.router, prefix="/api")
-
-
-origins = ["*"]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-@app.get("/")
 def index():
     """
     The index function is the default function that will be called when a user
@@ -45,28 +31,81 @@ def index():
     return {"message": "Hello World"}
 
 
-@app.get("/api/healthchecker")
-async def healthchecker(db: AsyncSession = Depends(get_db)):
+def metrics():
+    """
+    The metrics function exposes the Prometheus metrics of the application.
+
+    :return: The metrics in the Prometheus text format
+    :doc-author: Trelent
+    """
+    return metrics_response()
+
+
+async def healthchecker():
     """
     The healthchecker function is a simple function that checks if the database connection is working.
-    It does this by executing a simple SQL query and checking if it returns any results.
-    If it doesn't, then we know something's wrong with the database connection.
+    It reads the database check of the background health prober (see /api/health/ready)
+    instead of opening a session on every request.
+    If it failed, then we know something's wrong with the database connection.
     
-    :param db: AsyncSession: Inject the database session into the function
     :return: A dict
     :doc-author: Trelent
     """
-    try:
-        result = await db.execute(text("SELECT 1"))
-        result = result.fetchone()
-        if result is None:
-            raise HTTPException(
-                status_code=500, detail="Database is not configured correctly"
-            )
-        return {"message": "Welcome to FastAPI!"}
-    except Exception as e:
-        print(e)
+    report = await get_health_prober().snapshot()
+    if not report["checks"]["database"]["ok"]:
         raise HTTPException(status_code=500, detail="Error connecting to the database")
+    return {"message": "Welcome to FastAPI!"}
+
+
+def create_app() -> FastAPI:
+    """
+    The create_app function builds the application: routers, middleware and the root routes.
+        The database engine, the mail pool, the avatar storage and the settings themselves are
+        created on first use, so neither importing this module nor calling create_app opens a
+        connection. Run it with ``uvicorn --factory main:create_app``; ``main:app`` still works.
+
+    :return: The FastAPI application
+    :doc-author: Trelent
+    """
+    app = FastAPI(lifespan=lifespan)
+
+    app.include_router(auth.router, prefix="/api")
+    app.include_router(contacts.router, prefix="/api")
+    app.include_router(avatars.router, prefix="/api")
+    app.include_router(health.router, prefix="/api")
+    app.include_router(admin.router, prefix="/api")
+
+    origins = ["*"]
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(UploadLimitMiddleware)
+    app.add_middleware(
+        ProfilerMiddleware,
+        secret=config.PROFILE_SECRET,
+        interval=config.PROFILE_INTERVAL,
+        directory=config.PROFILE_DIR,
+    )
+    app.add_middleware(MetricsMiddleware)
+    if config.SQL_PROFILE_ENABLED:
+        app.add_middleware(RouteContextMiddleware)
+
+    app.get("/")(index)
+    app.get("/metrics", include_in_schema=False)(metrics)
+    app.get("/api/healthchecker")(healthchecker)
+    return app
+
+
+def __getattr__(name: str):
+    # main:app is built on first access rather than at import
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # if __name__ == "__main__":
@@ -1,35 +1,70 @@
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-import redis.asyncio as redis
+from src.services.rate_limit import user_or_ip_key
 
 from conf.config import config
 
-r = None
-limiter = Limiter(key_func=get_remote_address)
+# the two-tier strategy only works with its own storage, see src.services.rate_limit
+limiter = Limiter(key_func=user_or_ip_key, strategy="two-tier", storage_uri="twotier://")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global r
     global limiter
 
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-    r = await redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
+    from src.services.email import get_confirmation_email, get_mail_pool
+
+    get_confirmation_email()
+
+    from src.services.redis_client import get_redis
+
+    from src.services.invalidation import bus
+
+    redis_service = get_redis()
+    redis_service.start()
+    bus.start()
+    limiter.limiter.storage.start()
+
+    from src.services.health import get_health_prober
+    from src.services.loop_monitor import get_loop_monitor
+
+    health_prober = get_health_prober()
+    loop_monitor = get_loop_monitor()
+    health_prober.start()
+    loop_monitor.start()
+
+    from src.services.warmup import warm_up, warmup_state
+
+    async def warm_up_and_report():
+        await warm_up(min(config.WARMUP_DB_CONNECTIONS, config.DB_POOL_SIZE))
+        await health_prober.run_once()
+
+    warmup_task = None
+    if config.WARMUP_ENABLED:
+        warmup_task = asyncio.create_task(warm_up_and_report())
+    else:
+        warmup_state.done, warmup_state.duration = True, 0.0
 
     yield
 
-    await r.close()
+    if warmup_task is not None:
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+    await loop_monitor.stop()
+    await health_prober.stop()
+    await limiter.limiter.storage.stop()
+    await bus.stop()
+    await redis_service.close()
+    await get_mail_pool().close()
@@ -0,0 +1,276 @@
+"""
+Synthetic data generator for the contacts and owned_contacts tables.
+
+Generates contacts with Ukrainian names, mobile numbers of the Ukrainian operators in
+both the 0XX and +380 formats, name-based emails on common domains and birthdays spread
+around 1987. Names repeat with a skewed distribution, so the natural email and phone
+collisions happen; they are resolved the way users do (a number appended to the email,
+another number drawn) and counted. Rows already in the table take part in the check.
+
+Every contact gets one of --password-pool precomputed bcrypt hashes of "password<N>",
+so a million rows cost a handful of hashes. PostgreSQL is loaded with COPY, SQLite
+with batched executemany. The same --seed always produces the same rows.
+
+With --owners K the last K of the new accounts also get an address book of --book-size
+entries each, drawn the same way; entries of a book need not be unique.
+
+    python seed.py --rows 1000000 --seed 42 --truncate
+    python seed.py --rows 1000 --owners 1000 --book-size 1000
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.database.models import Base, birthday_month_day, normalize_phone
+
+from conf.config import config
+
+COLUMNS = ("name", "email", "phone", "phone_digits", "birthday", "password", "confirmed")
+OWNED_COLUMNS = ("owner_id", "name", "email", "phone", "phone_digits", "birthday", "birthday_md")
+FIRST_NAMES = (
+    "Oleksandr", "Olena", "Andrii", "Iryna", "Dmytro", "Oksana", "Serhii", "Natalia", "Volodymyr", "Tetiana",
+    "Mykola", "Yulia", "Ivan", "Kateryna", "Taras", "Svitlana", "Bohdan", "Mariia", "Yurii", "Anna",
+    "Vitalii", "Liudmyla", "Roman", "Halyna", "Maksym", "Viktoriia", "Artem", "Daryna", "Ostap", "Solomiia",
+)
+LAST_NAMES = (
+    "Melnyk", "Shevchenko", "Boiko", "Kovalenko", "Bondarenko", "Tkachenko", "Kovalchuk", "Kravchenko",
+    "Oliinyk", "Shevchuk", "Koval", "Polishchuk", "Bondar", "Tkachuk", "Moroz", "Marchenko", "Lysenko",
+    "Rudenko", "Savchenko", "Petrenko", "Klymenko", "Pavlenko", "Kravchuk", "Kuzmenko", "Ponomarenko",
+    "Savchuk", "Vasylenko", "Levchenko", "Kharchenko", "Karpenko", "Hnatiuk", "Zinchenko", "Honcharenko",
+)
+OPERATOR_CODES = ("050", "066", "095", "099", "067", "068", "096", "097", "098", "063", "073", "093")
+DOMAINS = ("gmail.com", "ukr.net", "i.ua", "outlook.com", "meta.ua", "yahoo.com")
+DOMAIN_WEIGHTS = (50, 25, 8, 8, 5, 4)
+
+
+def _zipf_cum_weights(size: int) -> list[float]:
+    return list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+class ContactGenerator:
+    """
+    Produces contact rows as tuples in COLUMNS order, unique on email and phone digits,
+    and address book entries in OWNED_COLUMNS order.
+    """
+
+    def __init__(self, seed: int, password_hashes: list[str], emails=(), phone_digits=(), confirmed_rate: float = 1.0):
+        self.rng = random.Random(seed)
+        self.password_hashes = password_hashes
+        self.confirmed_rate = confirmed_rate
+        self.emails = set(emails)
+        self.phone_digits = set(phone_digits)
+        self.email_collisions = 0
+        self.phone_collisions = 0
+        self._first_weights = _zipf_cum_weights(len(FIRST_NAMES))
+        self._last_weights = _zipf_cum_weights(len(LAST_NAMES))
+        self._domain_weights = list(itertools.accumulate(DOMAIN_WEIGHTS))
+
+    def _name(self) -> tuple[str, str]:
+        rng = self.rng
+        first = rng.choices(FIRST_NAMES, cum_weights=self._first_weights)[0]
+        last = rng.choices(LAST_NAMES, cum_weights=self._last_weights)[0]
+        return first, last
+
+    def _address(self, first: str, last: str) -> tuple[str, str]:
+        rng = self.rng
+        local = rng.choice((f"{first}.{last}", f"{first}{last}", f"{first[0]}{last}", f"{last}.{first}")).lower()
+        if rng.random() < 0.4:
+            local += str(rng.randint(1, 99))
+        return local, rng.choices(DOMAINS, cum_weights=self._domain_weights)[0]
+
+    def _number(self) -> str:
+        return f"{self.rng.choice(OPERATOR_CODES)}{self.rng.randrange(10_000_000):07d}"
+
+    def _format(self, number: str) -> str:
+        return number if self.rng.random() < 0.6 else f"+38{number}"
+
+    def _email(self, first: str, last: str) -> str:
+        rng = self.rng
+        local, domain = self._address(first, last)
+        email = f"{local}@{domain}"
+        while email in self.emails:
+            self.email_collisions += 1
+            email = f"{local}{rng.randint(1, 99999)}@{domain}"
+        self.emails.add(email)
+        return email
+
+    def _phone(self) -> tuple[str, str]:
+        while True:
+            number = self._number()
+            if number not in self.phone_digits:
+                break
+            self.phone_collisions += 1
+        self.phone_digits.add(number)
+        phone = self._format(number)
+        return phone, normalize_phone(phone)
+
+    def _birthday(self) -> date:
+        year = min(max(round(self.rng.gauss(1987, 14)), 1935), 2008)
+        return date(year, 1, 1) + timedelta(days=self.rng.randrange(365))
+
+    def row(self, number: int) -> tuple:
+        first, last = self._name()
+        phone, digits = self._phone()
+        return (
+            f"{first} {last}",
+            self._email(first, last),
+            phone,
+            digits,
+            self._birthday(),
+            self.password_hashes[number % len(self.password_hashes)],
+            self.rng.random() < self.confirmed_rate,
+        )
+
+    def owned_row(self, owner_id: int) -> tuple:
+        first, last = self._name()
+        local, domain = self._address(first, last)
+        phone = self._format(self._number())
+        birthday = self._birthday()
+        return (
+            owner_id,
+            f"{first} {last}",
+            f"{local}@{domain}",
+            phone,
+            normalize_phone(phone),
+            birthday,
+            birthday_month_day(birthday),
+        )
+
+    def batches(self, rows: int, batch_size: int):
+        for start in range(0, rows, batch_size):
+            yield [self.row(number) for number in range(start, min(start + batch_size, rows))]
+
+    def owned_batches(self, owner_ids: list[int], book_size: int, batch_size: int):
+        rows = ((owner_id, number) for owner_id in owner_ids for number in range(book_size))
+        while batch := [self.owned_row(owner_id) for owner_id, _ in itertools.islice(rows, batch_size)]:
+            yield batch
+
+
+async def existing_keys(engine: AsyncEngine) -> tuple[list[str], list[str]]:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT email, phone_digits FROM contacts"))
+        rows = result.all()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+async def newest_ids(engine: AsyncEngine, count: int) -> list[int]:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT id FROM contacts ORDER BY id DESC LIMIT :count"), {"count": count})
+        return sorted(row[0] for row in result)
+
+
+async def _write(engine: AsyncEngine, table: str, columns: tuple, batches) -> int:
+    """
+    The _write function writes batches of rows into a table, with COPY on PostgreSQL and executemany elsewhere.
+
+    :param engine: AsyncEngine: The target database
+    :param table: str: The table to fill
+    :param columns: tuple: The columns of the rows, in order
+    :param batches: An iterable of lists of row tuples
+    :return: The number of rows inserted
+    :doc-author: Trelent
+    """
+    inserted = 0
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            raw = await conn.get_raw_connection()
+            for batch in batches:
+                await raw.driver_connection.copy_records_to_table(table, records=batch, columns=columns)
+                inserted += len(batch)
+        else:
+            statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            for batch in batches:
+                await conn.exec_driver_sql(statement, batch)
+                inserted += len(batch)
+    return inserted
+
+
+async def load(engine: AsyncEngine, generator: ContactGenerator, rows: int, batch_size: int) -> int:
+    """
+    The load function writes the generated contacts.
+
+    :param engine: AsyncEngine: The target database
+    :param generator: ContactGenerator: The row source
+    :param rows: int: How many contacts to insert
+    :param batch_size: int: Rows per COPY or executemany call
+    :return: The number of rows inserted
+    :doc-author: Trelent
+    """
+    return await _write(engine, "contacts", COLUMNS, generator.batches(rows, batch_size))
+
+
+async def load_owned(
+    engine: AsyncEngine, generator: ContactGenerator, owner_ids: list[int], book_size: int, batch_size: int
+) -> int:
+    """
+    The load_owned function writes an address book of book_size generated entries for every owner.
+
+    :param engine: AsyncEngine: The target database
+    :param generator: ContactGenerator: The row source
+    :param owner_ids: list[int]: The accounts that get a book
+    :param book_size: int: How many entries each book gets
+    :param batch_size: int: Rows per COPY or executemany call
+    :return: The number of rows inserted
+    :doc-author: Trelent
+    """
+    return await _write(
+        engine, "owned_contacts", OWNED_COLUMNS, generator.owned_batches(owner_ids, book_size, batch_size)
+    )
+
+
+async def main(args):
+    from src.services.auth import auth_service
+
+    engine = create_async_engine(args.db_url)
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    if args.truncate:
+        async with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                await conn.execute(text("TRUNCATE contacts RESTART IDENTITY CASCADE"))
+            else:
+                await conn.execute(text("DELETE FROM owned_contacts"))
+                await conn.execute(text("DELETE FROM contacts"))
+    emails, phone_digits = await existing_keys(engine)
+
+    started = time.perf_counter()
+    password_hashes = [auth_service.get_password_hash(f"password{n}") for n in range(args.password_pool)]
+    hashing = time.perf_counter() - started
+
+    generator = ContactGenerator(args.seed, password_hashes, emails, phone_digits, args.confirmed_rate)
+    started = time.perf_counter()
+    inserted = await load(engine, generator, args.rows, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"inserted {inserted} contacts in {elapsed:.1f}s ({inserted / elapsed:.0f} rows/s)")
+
+    if args.owners:
+        owner_ids = await newest_ids(engine, min(args.owners, inserted))
+        started = time.perf_counter()
+        owned = await load_owned(engine, generator, owner_ids, args.book_size, args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"inserted {owned} address book entries for {len(owner_ids)} owners in {elapsed:.1f}s")
+    await engine.dispose()
+
+    print(f"{args.password_pool} password hashes in {hashing:.1f}s, passwords password0..password{args.password_pool - 1}")
+    print(f"resolved {generator.email_collisions} email and {generator.phone_collisions} phone collisions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--password-pool", type=int, default=4)
+    parser.add_argument("--confirmed-rate", type=float, default=1.0)
+    parser.add_argument("--owners", type=int, default=0, help="new accounts that get an address book")
+    parser.add_argument("--book-size", type=int, default=1000, help="entries per address book")
+    parser.add_argument("--truncate", action="store_true", help="delete the existing contacts first")
+    parser.add_argument("--db-url", default=config.DB_URL)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,166 @@
+"""
+Production launcher: gunicorn with uvicorn workers on uvloop and httptools.
+
+    python serve.py --workers 4 --bind 0.0.0.0:8000
+
+The number of workers defaults to WEB_CONCURRENCY or the number of CPUs. When
+DB_MAX_CONNECTIONS is set, it is the database connection budget of the whole
+deployment and every worker's pool is sized to its share of it. Each worker builds its
+own application with main.create_app after the fork, so connections, the Redis client
+and thread pools are never shared between processes.
+
+Before starting, the launcher refuses process-local state that would be wrong with
+more than one worker: connections opened in the master. The limiter storage reconciles
+the workers' counters through Redis (see src.services.rate_limit) and is told the number
+of workers. Prometheus metrics are switched to multiprocess mode when
+PROMETHEUS_MULTIPROC_DIR is not set.
+
+SIGHUP reads the settings again, splits the connection budget anew and replaces the
+workers gracefully, SIGTERM stops them after GRACEFUL_TIMEOUT seconds at most. A budget
+smaller than the number of workers is refused, at start and on reload.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def pool_sizes(workers: int, max_connections: int | None, pool_size: int, max_overflow: int) -> tuple[int, int]:
+    """
+    The pool_sizes function splits a deployment-wide connection budget between the workers.
+        Half of each worker's share is kept open and the other half is overflow.
+
+    :param workers: int: The number of worker processes
+    :param max_connections: int | None: The budget, None keeps the configured sizes
+    :param pool_size: int: The configured DB_POOL_SIZE
+    :param max_overflow: int: The configured DB_MAX_OVERFLOW
+    :return: The pool size and max overflow of each worker
+    :raises ValueError: The budget does not give every worker a connection
+    :doc-author: Trelent
+    """
+    if max_connections is None:
+        return pool_size, max_overflow
+    if max_connections < workers:
+        raise ValueError(f"DB_MAX_CONNECTIONS={max_connections} is less than one connection for each of {workers} workers")
+    share = max_connections // workers
+    size = max(share // 2, 1)
+    return size, share - size
+
+
+def configure(workers: int) -> None:
+    """
+    The configure function adjusts the settings that the workers inherit from the master process:
+        the number of workers and each worker's share of the connection budget.
+
+    :param workers: int: The number of worker processes
+    :return: Nothing
+    :raises ValueError: The connection budget is smaller than the number of workers
+    :doc-author: Trelent
+    """
+    from conf.config import config
+
+    config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW = pool_sizes(
+        workers, config.DB_MAX_CONNECTIONS, config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW
+    )
+    config.WEB_CONCURRENCY = workers
+
+
+def check_shared_state(workers: int) -> list[str]:
+    """
+    The check_shared_state function lists the per-process state that is not safe with this many workers.
+
+    :param workers: int: The number of worker processes
+    :return: The problems found, empty if it is safe to start
+    :doc-author: Trelent
+    """
+    from src.database.db import sessionmanager
+    from src.services.redis_client import get_redis
+
+    problems = []
+    if get_redis()._client is not None:
+        problems.append("the Redis client was created in the master process and would be shared by the workers")
+    if sessionmanager._engine is not None:
+        problems.append("the database engine was created in the master process and would be shared by the workers")
+    return problems
+
+
+def on_reload(server):
+    # SIGHUP: the workers about to be spawned must not inherit the settings cached at start
+    from conf.config import get_settings
+
+    get_settings.cache_clear()
+    configure(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import create_app
+
+        return create_app()
+
+
+def main(args) -> int:
+    workers = args.workers or int(os.environ.get("WEB_CONCURRENCY") or 0) or os.cpu_count() or 1
+    if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # must be set before prometheus_client is imported
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+    from conf.config import config
+
+    problems = check_shared_state(workers)
+    if problems and not args.allow_unsafe:
+        for problem in problems:
+            print(f"serve.py: {problem}", file=sys.stderr)
+        return 1
+
+    # the workers are forked from this process and inherit the adjusted settings
+    try:
+        configure(workers)
+    except ValueError as error:
+        print(f"serve.py: {error}", file=sys.stderr)
+        return 1
+    Server(
+        {
+            "bind": args.bind,
+            "workers": workers,
+            "worker_class": "serve.Worker",
+            "graceful_timeout": config.GRACEFUL_TIMEOUT,
+            "keepalive": 5,
+            "max_requests": args.max_requests,
+            "max_requests_jitter": args.max_requests // 10,
+            "on_reload": on_reload,
+            "child_exit": child_exit,
+        }
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--bind", default=f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+    parser.add_argument("--max-requests", type=int, default=0, help="restart a worker after this many requests")
+    parser.add_argument("--allow-unsafe", action="store_true", help="start despite process-local state")
+    sys.exit(main(parser.parse_args()))
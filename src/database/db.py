@@ -1,6 +1,7 @@
 import contextlib
 from typing import AsyncIterator
 
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -8,36 +9,79 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
-from conf.config import config
+from src.database.profiler import install_profiler
+from src.services.metrics import instrument_engine
 
-DB_URL = config.DB_URL
+from conf.config import config
 
 
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
-        self._session_maker: async_sessionmaker | None = async_sessionmaker(
+    """
+    Creates the engine on first use, with the url given or DB_URL from the settings,
+    so that importing the application does not build a connection pool. The pool holds
+    DB_POOL_SIZE connections plus DB_MAX_OVERFLOW more under load; serve.py sizes them
+    from the number of workers.
+    """
+
+    def __init__(self, url: str | None = None):
+        self._url = url
+        self._engine: AsyncEngine | None = None
+        self._session_maker: async_sessionmaker | None = None
+
+    def _init_engine(self):
+        url = make_url(self._url or config.DB_URL)
+        options = {}
+        if url.get_backend_name() != "sqlite":
+            options = {"pool_size": config.DB_POOL_SIZE, "max_overflow": config.DB_MAX_OVERFLOW}
+        self._engine = create_async_engine(url, **options)
+        instrument_engine(self._engine)
+        if config.SQL_PROFILE_ENABLED:
+            install_profiler(
+                self._engine,
+                config.SQL_SLOW_THRESHOLD_MS,
+                config.SQL_EXPLAIN_SAMPLE_RATE,
+                config.SQL_SLOW_LOG,
+            )
+        self._session_maker = async_sessionmaker(
             autoflush=False,
             autocommit=False,
             bind=self._engine,
             expire_on_commit=False,
         )
 
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._init_engine()
+        return self._engine
+
     @contextlib.asynccontextmanager
-    async def session(self) -> AsyncIterator[AsyncSession]:
+    async def session(self, raise_errors: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        The session function opens a session and closes it afterwards, rolling back on an error.
+            Request handlers get the error printed and swallowed; background jobs pass
+            raise_errors=True to see it.
+
+        :param self: Represent the instance of the class
+        :param raise_errors: bool: Re-raise the error after the rollback
+        :return: The session
+        :doc-author: Trelent
+        """
         if self._session_maker is None:
-            raise Exception("Session is not initialized")
+            self._init_engine()
         session = self._session_maker()
         try:
             yield session
         except Exception as err:
-            print(err)
             await session.rollback()
+            if raise_errors:
+                raise
+            print(err)
         finally:
             await session.close()
 
 
-sessionmanager = DatabaseSessionManager(DB_URL)
+sessionmanager = DatabaseSessionManager()
 
 
 async def get_db():
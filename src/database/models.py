@@ -1,21 +1,126 @@
-from datetime import date
-from sqlalchemy import String
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import DateTime, ForeignKey, Index, SmallInteger, String
 
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, validates
 from sqlalchemy.ext.declarative import declarative_base
 
 
 Base = declarative_base()
 
+NON_DIGITS = re.compile(r"\D")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def normalize_phone(phone: str | None) -> str:
+    """
+    The normalize_phone function reduces a free-form phone number to the digits used for lookups.
+        Separators like spaces, dashes, brackets and the leading "+" are dropped, and the
+        international Ukrainian prefix "380" is folded into the national "0" form, so
+        "+380 67 444 4441", "067-444-44-41" and "0674444441" all normalize to "0674444441".
+
+    :param phone: str | None: The phone number as entered by the user
+    :return: A string of digits, empty if the input has none
+    :doc-author: Trelent
+    """
+    digits = NON_DIGITS.sub("", phone or "")
+    if digits.startswith("380"):
+        digits = digits[2:]
+    return digits
+
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index(
+            "ix_contacts_phone_digits",
+            "phone_digits",
+            unique=True,
+            postgresql_ops={"phone_digits": "varchar_pattern_ops"},
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(40), nullable=False)
     email: Mapped[str] = mapped_column(String(50), unique=True)
     phone: Mapped[str] = mapped_column(String(13), unique=True)
+    phone_digits: Mapped[str] = mapped_column(String(13), nullable=False)
     birthday: Mapped[date] = mapped_column("birthday")
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     refresh_token: Mapped[str] = mapped_column(String(255), nullable=True)
     confirmed: Mapped[bool] = mapped_column(default=False)
     avatar: Mapped[str] = mapped_column(String(255), nullable=True, default=None)
+
+    @validates("phone")
+    def validate_phone(self, key, phone):
+        self.phone_digits = normalize_phone(phone)
+        return phone
+
+
+def birthday_month_day(birthday: date) -> int:
+    """
+    The birthday_month_day function encodes the month and day of a date as one sortable number, 1231 for December 31.
+        Upcoming birthdays are a range over this number whatever the year of birth.
+
+    :param birthday: date: The date of birth
+    :return: month * 100 + day
+    :doc-author: Trelent
+    """
+    return birthday.month * 100 + birthday.day
+
+
+class OwnedContact(Base):
+    """
+    An entry of the address book of an account. Every query filters on owner_id first, so its
+    cost depends on the size of one book, and each index leads with owner_id.
+    """
+
+    __tablename__ = "owned_contacts"
+    __table_args__ = (
+        Index("ix_owned_contacts_owner_id_id", "owner_id", "id"),
+        Index("ix_owned_contacts_owner_id_name", "owner_id", "name"),
+        Index("ix_owned_contacts_owner_id_email", "owner_id", "email"),
+        Index(
+            "ix_owned_contacts_owner_id_phone_digits",
+            "owner_id",
+            "phone_digits",
+            postgresql_ops={"phone_digits": "varchar_pattern_ops"},
+        ),
+        Index("ix_owned_contacts_owner_id_birthday_md", "owner_id", "birthday_md"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    name: Mapped[str] = mapped_column(String(40), nullable=False)
+    email: Mapped[str] = mapped_column(String(50), nullable=False)
+    phone: Mapped[str] = mapped_column(String(13), nullable=False)
+    phone_digits: Mapped[str] = mapped_column(String(13), nullable=False)
+    birthday: Mapped[date] = mapped_column(nullable=False)
+    birthday_md: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+
+    @validates("phone")
+    def validate_phone(self, key, phone):
+        self.phone_digits = normalize_phone(phone)
+        return phone
+
+    @validates("birthday")
+    def validate_birthday(self, key, birthday):
+        self.birthday_md = birthday_month_day(birthday)
+        return birthday
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    email: Mapped[str] = mapped_column(String(50), nullable=False)
+    username: Mapped[str] = mapped_column(String(40), nullable=False)
+    host: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(10), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    last_error: Mapped[str] = mapped_column(String(255), nullable=True)
@@ -0,0 +1,249 @@
+"""
+Opt-in slow query log (SQL_PROFILE_ENABLED).
+
+Statements slower than SQL_SLOW_THRESHOLD_MS are written to a rotating JSON-lines log
+(SQL_SLOW_LOG) and aggregated in memory by fingerprint, the statement with its literals
+and bind parameters replaced by "?". Bound parameter values are never logged or kept, since
+they include password hashes and refresh tokens; only the normalized statement is. On PostgreSQL a SQL_EXPLAIN_SAMPLE_RATE share of slow
+SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) and the plan is kept with the fingerprint.
+The EXPLAIN runs in a background task on a connection of its own, one at a time, so it
+neither delays the request nor touches its transaction.
+The aggregate is served by GET /api/admin/slow-queries.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+current_scope: contextvars.ContextVar[Scope | None] = contextvars.ContextVar(
+    "current_scope", default=None
+)
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|(?<![\w:]):\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    The normalize_statement function replaces the literals and bind parameters of a statement with "?".
+        IN lists of any length become "(?)", so they share one fingerprint.
+
+    :param statement: str: The SQL statement
+    :return: The normalized statement
+    :doc-author: Trelent
+    """
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def current_route() -> str | None:
+    scope = current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+class RouteContextMiddleware:
+    """
+    Makes the ASGI scope of the current request visible to the profiler, which runs
+    in SQLAlchemy event handlers with no access to the request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+class SlowQueryLog:
+    explain_dialects = ("postgresql",)
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        explain_sample_rate: float = 0.0,
+        log_path: str | None = None,
+        max_fingerprints: int = 500,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.max_fingerprints = max_fingerprints
+        self.stats: dict[str, dict] = {}
+        self._explaining: asyncio.Task | None = None
+        self.logger = logging.getLogger("slow_queries")
+        self.logger.propagate = False
+        if log_path and not self.logger.handlers:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self.logger.addHandler(
+                RotatingFileHandler(log_path, maxBytes=10 * 1024 * 1024, backupCount=5)
+            )
+            self.logger.setLevel(logging.INFO)
+
+    def install(self, engine: AsyncEngine):
+        """
+        The install function hooks the profiler into the cursor events of an engine.
+
+        :param self: Represent the instance of the class
+        :param engine: AsyncEngine: The engine to profile
+        :return: None
+        :doc-author: Trelent
+        """
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # kept on the execution context, so a statement that raises leaves nothing behind
+            context._profiler_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration_ms = (time.perf_counter() - context._profiler_started) * 1000
+            if duration_ms >= self.threshold_ms and not context.execution_options.get("slow_query_explain"):
+                key = self.record(statement, duration_ms, current_route())
+                if (
+                    not executemany
+                    and conn.dialect.name in self.explain_dialects
+                    and statement.lstrip()[:6].upper() == "SELECT"
+                    and (self._explaining is None or self._explaining.done())
+                    and random.random() < self.explain_sample_rate
+                ):
+                    # the handler runs on the event loop thread, inside the request's greenlet
+                    self._explaining = asyncio.get_running_loop().create_task(
+                        self.explain(engine, key, statement, parameters)
+                    )
+
+    async def explain(self, engine: AsyncEngine, key: str, statement: str, parameters):
+        """
+        The explain function re-runs a slow statement under EXPLAIN (ANALYZE, BUFFERS) and keeps the plan.
+            It uses a connection of its own, which is rolled back, so a failing EXPLAIN cannot
+            abort the transaction of the request that ran the statement.
+
+        :param self: Represent the instance of the class
+        :param engine: AsyncEngine: The profiled engine
+        :param key: str: The fingerprint of the statement
+        :param statement: str: The statement as sent to the driver
+        :param parameters: The values bound to it, used for the EXPLAIN only
+        :return: None
+        :doc-author: Trelent
+        """
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + statement,
+                    parameters,
+                    execution_options={"slow_query_explain": True},
+                )
+                plan = "\n".join(row[0] for row in result)
+        except Exception as err:
+            plan = f"EXPLAIN failed: {err}"
+        self.record_plan(key, plan)
+
+    def record(self, statement, duration_ms: float, route: str | None) -> str:
+        """
+        The record function logs one slow statement and adds it to the aggregate of its fingerprint.
+            Only the normalized statement is kept, never the values bound to it.
+
+        :param self: Represent the instance of the class
+        :param statement: str: The SQL statement
+        :param duration_ms: float: How long the statement took
+        :param route: str | None: The route that ran the statement
+        :return: The fingerprint of the statement
+        :doc-author: Trelent
+        """
+        normalized = normalize_statement(statement)
+        key = fingerprint(normalized)
+        self.logger.info(
+            json.dumps(
+                {
+                    "fingerprint": key,
+                    "statement": normalized,
+                    "duration_ms": round(duration_ms, 3),
+                    "route": route,
+                }
+            )
+        )
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= self.max_fingerprints:
+                del self.stats[min(self.stats, key=lambda k: self.stats[k]["total_ms"])]
+            stats = self.stats[key] = {
+                "fingerprint": key,
+                "statement": normalized,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": {},
+                "plan": None,
+            }
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        if route is not None:
+            stats["routes"][route] = stats["routes"].get(route, 0) + 1
+        return key
+
+    def record_plan(self, key: str, plan: str):
+        """
+        The record_plan function logs the sampled plan of a fingerprint and keeps it with its aggregate.
+
+        :param self: Represent the instance of the class
+        :param key: str: The fingerprint
+        :param plan: str: The EXPLAIN (ANALYZE, BUFFERS) output
+        :return: None
+        :doc-author: Trelent
+        """
+        self.logger.info(json.dumps({"fingerprint": key, "plan": plan}))
+        if key in self.stats:
+            self.stats[key]["plan"] = plan
+
+    def report(self) -> list[dict]:
+        """
+        The report function returns the aggregated slow statements, the most expensive first.
+
+        :param self: Represent the instance of the class
+        :return: A list of dicts, one per fingerprint
+        :doc-author: Trelent
+        """
+        return [
+            {**stats, "mean_ms": stats["total_ms"] / stats["count"]}
+            for stats in sorted(self.stats.values(), key=lambda s: s["total_ms"], reverse=True)
+        ]
+
+
+slow_query_log: SlowQueryLog | None = None
+
+
+def install_profiler(engine: AsyncEngine, threshold_ms: float, explain_sample_rate: float, log_path: str) -> SlowQueryLog:
+    global slow_query_log
+    slow_query_log = SlowQueryLog(threshold_ms, explain_sample_rate, log_path)
+    slow_query_log.install(engine)
+    return slow_query_log
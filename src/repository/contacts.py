@@ -1,43 +1,12 @@
-from sqlalchemy import or_, select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 from src.database.db import get_db
-from src.database.models import Contact
+from src.database.models import Contact, OwnedContact, normalize_phone
 from src.schemas import ContactSchema, UpdateSchema
-
-from validate_email import validate_email
-
-from datetime import datetime, timedelta
-
-
-async def get_contacts(offset: int, limit: int, db: AsyncSession):
-    """
-    The get_contacts function returns a list of contacts from the database.
-    
-    :param offset: int: Specify the offset of the first row to return
-    :param limit: int: Limit the number of contacts returned
-    :param db: AsyncSession: Pass the database session to the function
-    :return: A list of contact objects
-    :doc-author: Trelent
-    """
-    stmt = select(Contact).offset(offset).limit(limit)
-    contacts = await db.execute(stmt)
-    return contacts.scalars().all()
-
-
-async def get_contact(contact_id: int, db: AsyncSession):
-    """
-    The get_contact function returns a contact object from the database.
-    
-    :param contact_id: int: Specify the contact_id of the contact you want to get
-    :param db: AsyncSession: Pass in the database session
-    :return: A contact object
-    :doc-author: Trelent
-    """
-    stmt = select(Contact).filter_by(id=contact_id)
-    contact = await db.execute(stmt)
-    return contact.scalar_one_or_none()
+from src.services.invalidation import bus
+from src.services.single_flight import flights
 
 
 async def create_contact(body: ContactSchema, db: AsyncSession = Depends(get_db)):
@@ -52,6 +21,7 @@ async def create_contact(body: ContactSchema, db: AsyncSession = Depends(get_db)
     contact = Contact(**body.model_dump(exclude_unset=True))
     db.add(contact)
     await db.commit()
+    bus.publish("contact", contact.id)
     await db.refresh(contact)
     return contact
 
@@ -74,6 +44,7 @@ async def update_contact(contact_id: int, body:UpdateSchema , db: AsyncSession):
         contact.phone = body.phone
         contact.birthday = body.birthday
         await db.commit()
+        bus.publish("contact", contact.id)
         await db.refresh(contact)
     return contact
 
@@ -91,68 +62,15 @@ async def delete_contact(contact_id: int, db: AsyncSession):
     contact = await db.execute(stmt)
     contact = contact.scalar_one_or_none()
     if contact:
+        # owned_contacts.owner_id cascades on PostgreSQL; SQLite does not enforce foreign keys by default
+        await db.execute(delete(OwnedContact).where(OwnedContact.owner_id == contact.id))
         await db.delete(contact)
         await db.commit()
+        bus.publish("contact", contact.id)
     return contact
 
 
-async def search_contacts(field_search, offset: int, limit: int, db: AsyncSession):
-    """
-    The search_contacts function searches for contacts in the database.
-        It takes three arguments: field_search, offset and limit.
-        The field_search argument is a string that can be either an email or a name/phone number.
-        The offset argument is an integer that specifies where to start returning results from (useful for pagination).
-        The limit argument is an integer that specifies how many results to return (useful for pagination).
-    
-    :param field_search: Search for a contact by name or phone number
-    :param offset: int: Determine where to start the search
-    :param limit: int: Limit the number of contacts returned
-    :param db: AsyncSession: Pass the database connection to the function
-    :return: A list of objects
-    :doc-author: Trelent
-    """
-    if validate_email(field_search):
-        stmt = select(Contact).filter_by(email=field_search)
-        contacts = await db.execute(stmt)
-
-    else:
-        stmt = (
-            select(Contact)
-            .where(
-                or_(
-                    Contact.name.like(f"%{field_search}%"),
-                    (Contact.phone.like(f"%{field_search}%")),
-                )
-            )
-            .offset(offset)
-            .limit(limit)
-        )
-        contacts = await db.execute(stmt)
-    return contacts.scalars().all()
-
-
-async def search_contacts_coming_birthday(offset: int, limit: int, db: AsyncSession):
-    """
-    The search_contacts_coming_birthday function searches for contacts whose birthday is coming in the next 7 days.
-    
-    :param offset: int: Specify the number of records to skip
-    :param limit: int: Limit the number of results returned by the query
-    :param db: AsyncSession: Pass the database connection to the function
-    :return: A list of contact objects
-    :doc-author: Trelent
-    """
-    today = datetime.now().date()
-    end_date = today + timedelta(days=7)
-    stmt = (
-        select(Contact)
-        .filter(Contact.birthday.between(today, end_date))
-        .offset(offset)
-        .limit(limit)
-    )
-    contacts = await db.execute(stmt)
-    return contacts.scalars().all()
-
-
+@flights.coalesce
 async def get_contact_by_email(email: str, db: AsyncSession = Depends(get_db)):
     """
     The get_contact_by_email function returns a contact object from the database based on the email address provided.
@@ -173,6 +91,21 @@ async def get_contact_by_email(email: str, db: AsyncSession = Depends(get_db)):
     return contact
 
 
+async def get_contact_by_phone(phone: str, db: AsyncSession):
+    """
+    The get_contact_by_phone function returns the contact whose phone number normalizes to the same digits.
+
+    :param phone: str: The phone number in any format
+    :param db: AsyncSession: Pass in the database session to the function
+    :return: A contact object or none if the phone is not found
+    :doc-author: Trelent
+    """
+    stmt = select(Contact).filter_by(phone_digits=normalize_phone(phone))
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one_or_none()
+    return contact
+
+
 async def update_token(contact: Contact, token: str | None, db: AsyncSession):
     """
     The update_token function updates the refresh token for a given contact.
@@ -185,6 +118,7 @@ async def update_token(contact: Contact, token: str | None, db: AsyncSession):
     """
     contact.refresh_token = token
     await db.commit()
+    bus.publish("contact", contact.id)
 
 
 async def confirmed_email(email: str, db: AsyncSession) -> None:
@@ -199,6 +133,7 @@ async def confirmed_email(email: str, db: AsyncSession) -> None:
     contact = await get_contact_by_email(email, db)
     contact.confirmed = True
     await db.commit()
+    bus.publish("contact", contact.id)
 
 
 async def update_avatar(email: str, url: str, db: AsyncSession):
@@ -219,5 +154,6 @@ async def update_avatar(email: str, url: str, db: AsyncSession):
     contact = await get_contact_by_email(email, db)
     contact.avatar = url
     await db.commit()
+    bus.publish("contact", contact.id)
     await db.refresh(contact)
     return contact
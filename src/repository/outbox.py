@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox, utcnow
+
+from conf.config import config
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+
+async def enqueue_email(email: str, username: str, host: str, db: AsyncSession, commit: bool = True):
+    """
+    The enqueue_email function appends a confirmation email to the outbox.
+        The email itself is sent later by the outbox worker (worker.py), so the request
+        only pays for one insert. With commit=False the record is only added to the session,
+        so that it is committed in the same transaction as the change that needs the email.
+
+    :param email: str: The address to send the confirmation to
+    :param username: str: The name shown in the email
+    :param host: str: The base url used in the confirmation link
+    :param db: AsyncSession: Pass the database session to the function
+    :param commit: bool: Commit the record now, or leave it to the caller's transaction
+    :return: The outbox record
+    :doc-author: Trelent
+    """
+    record = EmailOutbox(email=email, username=username, host=host)
+    db.add(record)
+    if commit:
+        await db.commit()
+    return record
+
+
+async def claim_batch(limit: int, db: AsyncSession):
+    """
+    The claim_batch function takes up to limit pending records that are due for delivery.
+        Claimed records get a lease: their next_attempt_at is moved OUTBOX_LEASE seconds ahead and
+        their attempt counter is increased, so other workers skip them and a worker that dies
+        mid-batch only delays them until the lease runs out. On PostgreSQL rows locked by another
+        worker are skipped instead of waited for.
+
+    :param limit: int: The maximum number of records to claim
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list of outbox records
+    :doc-author: Trelent
+    """
+    now = utcnow()
+    stmt = (
+        select(EmailOutbox)
+        .where(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    records = (await db.execute(stmt)).scalars().all()
+    for record in records:
+        record.attempts += 1
+        record.next_attempt_at = now + timedelta(seconds=config.OUTBOX_LEASE)
+    await db.commit()
+    return records
+
+
+async def mark_sent(record_ids: list[int], db: AsyncSession) -> None:
+    """
+    The mark_sent function marks delivered records as sent.
+
+    :param record_ids: list[int]: The ids of the delivered records
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    :doc-author: Trelent
+    """
+    if not record_ids:
+        return
+    stmt = (
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(record_ids))
+        .values(status=SENT, last_error=None)
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    The retry_delay function returns the exponential backoff after a failed attempt, capped at one day.
+
+    :param attempts: int: The number of attempts made so far
+    :return: The time to wait before the next attempt
+    :doc-author: Trelent
+    """
+    return timedelta(seconds=min(config.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), 86400))
+
+
+async def mark_failed(record: EmailOutbox, error: str, db: AsyncSession) -> None:
+    """
+    The mark_failed function schedules a retry for a record whose delivery failed.
+        After OUTBOX_MAX_ATTEMPTS attempts the record is moved to the dead-letter state
+        and is no longer picked up by the worker.
+
+    :param record: EmailOutbox: The record that could not be delivered
+    :param error: str: The delivery error
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    :doc-author: Trelent
+    """
+    record.last_error = error[:255]
+    if record.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+        record.status = DEAD
+    else:
+        record.next_attempt_at = utcnow() + retry_delay(record.attempts)
+    await db.commit()
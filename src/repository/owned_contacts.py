@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import OwnedContact, birthday_month_day, normalize_phone
+from src.schemas import OwnedContactSchema
+from src.services import cache
+from src.services.invalidation import bus
+from src.services.single_flight import flights
+
+from validate_email import validate_email
+
+
+async def get_contacts(owner_id: int, offset: int, limit: int, db: AsyncSession):
+    """
+    The get_contacts function returns a page of the address book of an owner, in the order the entries were added.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param offset: int: Specify the offset of the first row to return
+    :param limit: int: Limit the number of contacts returned
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list of owned contact objects
+    :doc-author: Trelent
+    """
+    stmt = (
+        select(OwnedContact)
+        .filter_by(owner_id=owner_id)
+        .order_by(OwnedContact.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+@flights.coalesce
+async def get_contact(owner_id: int, contact_id: int, db: AsyncSession):
+    """
+    The get_contact function returns an entry of the address book of an owner.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param contact_id: int: The id of the entry
+    :param db: AsyncSession: Pass in the database session
+    :return: An owned contact object, or None when the owner has no such entry
+    :doc-author: Trelent
+    """
+    stmt = select(OwnedContact).filter_by(owner_id=owner_id, id=contact_id)
+    contact = await db.execute(stmt)
+    return contact.scalar_one_or_none()
+
+
+async def get_contacts_by_ids(owner_id: int, contact_ids: list[int], db: AsyncSession):
+    """
+    The get_contacts_by_ids function returns the entries of an owner with the given ids in one query.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param contact_ids: list[int]: The ids of the entries to load
+    :param db: AsyncSession: Pass in the database session
+    :return: A list of owned contact objects, in no particular order
+    :doc-author: Trelent
+    """
+    stmt = select(OwnedContact).where(OwnedContact.owner_id == owner_id, OwnedContact.id.in_(contact_ids))
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+async def create_contact(owner_id: int, body: OwnedContactSchema, db: AsyncSession):
+    """
+    The create_contact function adds an entry to the address book of an owner.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param body: OwnedContactSchema: Validate the request body
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The new owned contact object
+    :doc-author: Trelent
+    """
+    contact = OwnedContact(owner_id=owner_id, **body.model_dump())
+    db.add(contact)
+    await db.commit()
+    bus.publish("owned_contact", contact.id)
+    await db.refresh(contact)
+    await cache.invalidate_contact(owner_id, contact.id)
+    return contact
+
+
+async def update_contact(owner_id: int, contact_id: int, body: OwnedContactSchema, db: AsyncSession):
+    """
+    The update_contact function replaces the fields of an entry of the address book of an owner.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param contact_id: int: The id of the entry
+    :param body: OwnedContactSchema: Pass in the data from the request body
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The updated owned contact object, or None when the owner has no such entry
+    :doc-author: Trelent
+    """
+    stmt = select(OwnedContact).filter_by(owner_id=owner_id, id=contact_id)
+    result = await db.execute(stmt)
+    contact = result.scalar_one_or_none()
+    if contact:
+        contact.name = body.name
+        contact.email = body.email
+        contact.phone = body.phone
+        contact.birthday = body.birthday
+        await db.commit()
+        bus.publish("owned_contact", contact.id)
+        await db.refresh(contact)
+        await cache.invalidate_contact(owner_id, contact.id)
+    return contact
+
+
+async def delete_contact(owner_id: int, contact_id: int, db: AsyncSession):
+    """
+    The delete_contact function removes an entry from the address book of an owner.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param contact_id: int: The id of the entry
+    :param db: AsyncSession: Pass the database session into the function
+    :return: The deleted owned contact object, or None when the owner has no such entry
+    :doc-author: Trelent
+    """
+    stmt = select(OwnedContact).filter_by(owner_id=owner_id, id=contact_id)
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one_or_none()
+    if contact:
+        await db.delete(contact)
+        await db.commit()
+        bus.publish("owned_contact", contact.id)
+        await cache.invalidate_contact(owner_id, contact.id)
+    return contact
+
+
+@flights.coalesce
+async def search_contacts(owner_id: int, field_search: str, offset: int, limit: int, db: AsyncSession):
+    """
+    The search_contacts function searches the address book of an owner.
+        An email is matched exactly; anything else is matched against the name, and by prefix
+        against the normalized phone digits, so "067 444" and "+380674" find the same entries.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param field_search: str: An email, or a part of a name or a phone number
+    :param offset: int: Determine where to start the search
+    :param limit: int: Limit the number of contacts returned
+    :param db: AsyncSession: Pass the database connection to the function
+    :return: A list of owned contact objects
+    :doc-author: Trelent
+    """
+    if validate_email(field_search):
+        condition = OwnedContact.email == field_search
+    else:
+        condition = OwnedContact.name.like(f"%{field_search}%")
+        phone_digits = normalize_phone(field_search)
+        if phone_digits:
+            # prefix match on (owner_id, phone_digits) is a range scan within the owner's entries
+            condition = or_(condition, OwnedContact.phone_digits.like(f"{phone_digits}%"))
+    stmt = (
+        select(OwnedContact)
+        .where(OwnedContact.owner_id == owner_id, condition)
+        .order_by(OwnedContact.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+async def search_contacts_coming_birthday(owner_id: int, offset: int, limit: int, db: AsyncSession):
+    """
+    The search_contacts_coming_birthday function returns the entries of an owner whose birthday is in the next 7 days,
+        soonest first. It compares the birthday_md column, so the year of birth does not matter and
+        the week may run over the new year.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param offset: int: Specify the number of records to skip
+    :param limit: int: Limit the number of results returned by the query
+    :param db: AsyncSession: Pass the database connection to the function
+    :return: A list of owned contact objects
+    :doc-author: Trelent
+    """
+    today = datetime.now().date()
+    start = birthday_month_day(today)
+    end = birthday_month_day(today + timedelta(days=7))
+    if start <= end:
+        condition = OwnedContact.birthday_md.between(start, end)
+    else:
+        condition = or_(OwnedContact.birthday_md >= start, OwnedContact.birthday_md <= end)
+    stmt = (
+        select(OwnedContact)
+        .where(OwnedContact.owner_id == owner_id, condition)
+        .order_by(case((OwnedContact.birthday_md >= start, 0), else_=1), OwnedContact.birthday_md, OwnedContact.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
@@ -0,0 +1,60 @@
+import re
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from src.database import profiler
+from src.database.models import Contact
+from src.services.auth import auth_service
+
+from conf import messages
+from conf.config import config
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+async def get_admin(current_contact: Contact = Depends(auth_service.get_current_contact)) -> Contact:
+    """
+    The get_admin function is a dependency that lets through only the contacts listed in ADMIN_EMAILS.
+
+    :param current_contact: Contact: The authenticated contact
+    :return: The contact
+    :doc-author: Trelent
+    """
+    if current_contact.email not in config.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=messages.NOT_ENOUGH_PERMISSIONS)
+    return current_contact
+
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = 50, admin: Contact = Depends(get_admin)):
+    """
+    The slow_queries function returns the slow statements recorded by the SQL profiler,
+        aggregated by fingerprint and ordered by total time.
+
+    :param limit: int: The number of fingerprints to return
+    :param admin: Contact: The admin making the request
+    :return: A list of fingerprints with their counts, timings, routes and sampled plan
+    :doc-author: Trelent
+    """
+    if profiler.slow_query_log is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SQL profiling is disabled")
+    return profiler.slow_query_log.report()[:limit]
+
+
+@router.get("/profiles/{name}", response_class=PlainTextResponse)
+async def get_profile(name: str, admin: Contact = Depends(get_admin)):
+    """
+    The get_profile function returns a request profile in the folded stack format.
+        The name is the X-Profile-Report header of the profiled response.
+
+    :param name: str: The report file name
+    :param admin: Contact: The admin making the request
+    :return: The folded stacks, one "frame;frame;frame count" line per stack
+    :doc-author: Trelent
+    """
+    path = Path(config.PROFILE_DIR) / name
+    if not re.fullmatch(r"\d+-[0-9a-f]{8}\.folded", name) or not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return path.read_text(encoding="utf-8")
@@ -1,12 +1,12 @@
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     HTTPException,
     Depends,
     Request,
     status,
     Security,
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
@@ -17,8 +17,8 @@ from src.schemas import (
     RequestEmail,
 )
 from src.repository import contacts as repository_contacts
+from src.repository import outbox as repository_outbox
 from src.services.auth import auth_service
-from src.services.email import send_email
 
 from fastapi.security import (
     HTTPBearer,
@@ -38,7 +38,6 @@ get_refresh_token = HTTPBearer()
 @limiter.limit("5/minute")
 async def signup(
     body: ContactSchema,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -46,21 +45,31 @@ async def signup(
     The signup function creates a new user in the database.
     
     :param body: ContactSchema: Validate the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background queue
     :param request: Request: Get the base url of the request
     :param db: AsyncSession: Get the database connection
-    :param : Send an email to the user who has just signed up
+    :param : Queue a confirmation email for the user who has just signed up
     :return: The new user
     :doc-author: Trelent
     """
     exist_user = await repository_contacts.get_contact_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=messages.ACCOUNT_EXIST)
+    if await repository_contacts.get_contact_by_phone(body.phone, db):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=messages.PHONE_EXIST)
     body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_contacts.create_contact(body, db)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.name, str(request.base_url)
+    # the outbox record is committed together with the contact, so no signup loses its email
+    await repository_outbox.enqueue_email(
+        body.email, body.name, str(request.base_url), db, commit=False
     )
+    try:
+        new_user = await repository_contacts.create_contact(body, db)
+    except IntegrityError:
+        # a concurrent signup took the email or the phone digits after the checks above
+        await db.rollback()
+        detail = messages.ACCOUNT_EXIST
+        if not await repository_contacts.get_contact_by_email(body.email, db):
+            detail = messages.PHONE_EXIST
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
     return new_user
 
 
@@ -100,22 +109,20 @@ async def login(
     }
 
 
-router.post("/request_email")
+@router.post("/request_email")
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """
     The request_email function is used to send an email to the user with a link
-    to confirm their email address. The function takes in the body of the request,
-    the background tasks object, and a database session. It then uses these objects
-    to get information about the user from our database and sends them an email using 
-    our send_email function.
+    to confirm their email address. The function takes in the body of the request
+    and a database session. It then uses these objects to get information about
+    the user from our database and queues an email in the outbox, which the
+    outbox worker delivers.
     
     :param body: RequestEmail: Validate the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks
     :param request: Request: Get the base_url of the api
     :param db: AsyncSession: Get the database session
     :param : Get the email address from the user
@@ -124,11 +131,11 @@ async def request_email(
     """
     user = await repository_contacts.get_contact_by_email(body.email, db)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": messages.EMAIL_ALREADY_CONFIRMED}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.name, request.base_url
+        await repository_outbox.enqueue_email(
+            user.email, user.name, str(request.base_url), db
         )
     return {"message": messages.CHECK_EMAIL}
 
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Query, status
+
+from src.services.avatar import get_storage
+from src.services.storage import CACHE_FOREVER, LocalStorage, ZeroCopyFileResponse
+
+from conf.config import config
+from conf import messages
+
+router = APIRouter(prefix="/avatars", tags=["avatars"])
+
+
+@router.get("/{digest}.jpg", response_class=ZeroCopyFileResponse)
+async def get_avatar(digest: str, size: int | None = Query(default=None)):
+    """
+    The get_avatar function serves an avatar kept by the local avatar storage.
+        Avatar urls are content-hashed, so responses are cacheable forever.
+        Thumbnails in AVATAR_THUMBNAIL_SIZES are made on their first request and kept on disk.
+
+    :param digest: str: The content hash from the avatar url
+    :param size: int | None: The thumbnail size, the full avatar when omitted
+    :return: The avatar image
+    :doc-author: Trelent
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage) or (
+        size is not None
+        and size != config.AVATAR_SIZE
+        and size not in config.AVATAR_THUMBNAIL_SIZES
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.AVATAR_NOT_FOUND
+        )
+    path = await storage.path_for(digest, size)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.AVATAR_NOT_FOUND
+        )
+    return ZeroCopyFileResponse(
+        path, media_type="image/jpeg", headers={"Cache-Control": CACHE_FOREVER}
+    )
@@ -1,3 +1,4 @@
+import os
 from typing import List
 
 from fastapi import (
@@ -11,16 +12,21 @@ from fastapi import (
     Query,
     Request,
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact
 from src.database.db import get_db
-from src.schemas import UpdateSchema, ContactResponse
+from src.schemas import (
+    UpdateSchema,
+    ContactResponse,
+    OwnedContactSchema,
+    OwnedContactResponse,
+)
 from src.repository import contacts as repository_contacts
+from src.repository import owned_contacts as repository_owned_contacts
 from src.services.auth import auth_service
-
-import cloudinary
-import cloudinary.uploader
+from src.services import avatar, cache
 
 from my_limiter import limiter
 
@@ -29,14 +35,8 @@ from conf import messages
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
-cloudinary.config(
-    cloud_name=config.CLOUD_NAME,
-    api_key=config.CLOUD_API_KEY,
-    api_secret=config.CLOUD_API_SECRET,
-)
-
 
-@router.get("/", response_model=List[ContactResponse])
+@router.get("/", response_model=List[OwnedContactResponse])
 @limiter.limit("5/minute")
 async def get_contacts(
     request: Request,
@@ -46,7 +46,7 @@ async def get_contacts(
     cur_contact: Contact = Depends(auth_service.get_current_contact),
 ):
     """
-    The get_contacts function returns a list of contacts.
+    The get_contacts function returns a page of the address book of the current contact.
     
     :param request: Request: Get the request object
     :param offset: int: Specify the offset of the contacts to be returned
@@ -60,27 +60,102 @@ async def get_contacts(
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repository_contacts.get_contacts(offset, limit, db)
+    contacts = await repository_owned_contacts.get_contacts(
+        cur_contact.id, offset, limit, db
+    )
     return contacts
 
 
-@router.get("/{contact_id}", response_model=ContactResponse)
+@router.get("/{contact_id}", response_model=OwnedContactResponse)
 async def get_contact(
     contact_id: int = Path(ge=1),
     db: AsyncSession = Depends(get_db),
     cur_contact: Contact = Depends(auth_service.get_current_contact),
 ):
     """
-    The get_contact function is used to retrieve a contact from the database.
+    The get_contact function is used to retrieve an entry of the address book of the current contact.
     
     :param contact_id: int: Get the contact_id from the url
     :param db: AsyncSession: Pass the database session to the function
     :param cur_contact: Contact: Get the current contact object
     :param : Get the contact id from the url path
-    :return: A contact object
+    :return: An owned contact object
+    :doc-author: Trelent
+    """
+    contact = await repository_owned_contacts.get_contact(cur_contact.id, contact_id, db)
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.CONTACT_NOT_FOUND
+        )
+    return contact
+
+
+@router.post(
+    "/", response_model=OwnedContactResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_contact(
+    body: OwnedContactSchema,
+    db: AsyncSession = Depends(get_db),
+    cur_contact: Contact = Depends(auth_service.get_current_contact),
+):
+    """
+    The create_contact function adds an entry to the address book of the current contact.
+
+    :param body: OwnedContactSchema: Validate the data sent in the request body
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param cur_contact: Contact: Get the current contact
+    :return: The new owned contact object
+    :doc-author: Trelent
+    """
+    contact = await repository_owned_contacts.create_contact(cur_contact.id, body, db)
+    return contact
+
+
+@router.put("/{contact_id}", response_model=OwnedContactResponse)
+async def update_owned_contact(
+    body: OwnedContactSchema,
+    contact_id: int = Path(ge=1),
+    db: AsyncSession = Depends(get_db),
+    cur_contact: Contact = Depends(auth_service.get_current_contact),
+):
+    """
+    The update_owned_contact function replaces an entry of the address book of the current contact.
+
+    :param body: OwnedContactSchema: Validate the data sent in the request body
+    :param contact_id: int: Get the id of the entry from the url
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param cur_contact: Contact: Get the current contact
+    :return: The updated owned contact object
+    :doc-author: Trelent
+    """
+    contact = await repository_owned_contacts.update_contact(
+        cur_contact.id, contact_id, body, db
+    )
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.CONTACT_NOT_FOUND
+        )
+    return contact
+
+
+@router.delete("/{contact_id}", response_model=OwnedContactResponse)
+async def delete_owned_contact(
+    contact_id: int = Path(ge=1),
+    db: AsyncSession = Depends(get_db),
+    cur_contact: Contact = Depends(auth_service.get_current_contact),
+):
+    """
+    The delete_owned_contact function removes an entry from the address book of the current contact.
+
+    :param contact_id: int: Get the id of the entry from the url
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param cur_contact: Contact: Get the current contact
+    :return: The deleted owned contact object
     :doc-author: Trelent
     """
-    contact = await repository_contacts.get_contact(contact_id, db)
+    contact = await repository_owned_contacts.delete_contact(
+        cur_contact.id, contact_id, db
+    )
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.CONTACT_NOT_FOUND
@@ -106,7 +181,19 @@ async def update_contact(
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = await repository_contacts.update_contact(cur_contact.id, body, db)
+    phone_owner = await repository_contacts.get_contact_by_phone(body.phone, db)
+    if phone_owner is not None and phone_owner.id != cur_contact.id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.PHONE_EXIST
+        )
+    try:
+        contact = await repository_contacts.update_contact(cur_contact.id, body, db)
+    except IntegrityError:
+        # a concurrent signup or update took the phone digits after the check above
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.PHONE_EXIST
+        )
     if cur_contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -134,7 +221,7 @@ async def delete_contact(
     return contact
 
 
-@router.get("/search/{field_search}", response_model=List[ContactResponse])
+@router.get("/search/{field_search}", response_model=List[OwnedContactResponse])
 async def search_contact(
     field_search: str,
     offset: int = Query(default=0, ge=0),
@@ -143,9 +230,9 @@ async def search_contact(
     cur_contact: Contact = Depends(auth_service.get_current_contact),
 ):
     """
-    The search_contact function searches for contacts in the database.
-        The search is performed on the first_name, last_name and email fields of a contact.
-        The function returns a list of contacts that match the search criteria.
+    The search_contact function searches the address book of the current contact.
+        The search is performed on the name, phone and email fields of the entries.
+        The function returns a list of entries that match the search criteria.
     
     :param field_search: str: Search a contact by name or email
     :param offset: int: Specify the number of records to skip before returning results
@@ -159,13 +246,33 @@ async def search_contact(
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repository_contacts.search_contacts(
-        field_search, offset, limit, db
+    field_search = cache.normalize_search(field_search)
+    generation, ids = await cache.get_search_ids(
+        cur_contact.id, field_search, offset, limit
+    )
+    if ids is not None:
+        return await cache.hydrate_contacts(
+            ids,
+            lambda missing: repository_owned_contacts.get_contacts_by_ids(
+                cur_contact.id, missing, db
+            ),
+        )
+    contacts = await repository_owned_contacts.search_contacts(
+        cur_contact.id, field_search, offset, limit, db
+    )
+    await cache.set_search_ids(
+        cur_contact.id,
+        field_search,
+        offset,
+        limit,
+        generation,
+        [contact.id for contact in contacts],
     )
+    await cache.set_contacts(contacts)
     return contacts
 
 
-@router.get("/coming-birthday/", response_model=list[ContactResponse])
+@router.get("/coming-birthday/", response_model=list[OwnedContactResponse])
 async def search_coming_birthdays(
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=10, le=100),
@@ -173,7 +280,7 @@ async def search_coming_birthdays(
     cur_contact: Contact = Depends(auth_service.get_current_contact),
 ):
     """
-    The search_coming_birthdays function searches for contacts with birthdays coming up.
+    The search_coming_birthdays function searches the address book of the current contact for birthdays coming up.
     
     :param offset: int: Determine the offset of the query
     :param ge: Set a minimum value for the offset parameter
@@ -186,8 +293,8 @@ async def search_coming_birthdays(
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repository_contacts.search_contacts_coming_birthday(
-        offset, limit, db
+    contacts = await repository_owned_contacts.search_contacts_coming_birthday(
+        cur_contact.id, offset, limit, db
     )
     return contacts
 
@@ -201,6 +308,10 @@ async def update_avatar_contact(
 
     """
     The update_avatar_contact function updates the avatar of a contact.
+        Uploads over AVATAR_MAX_BYTES are refused with 413 (see avatar.UploadLimitMiddleware);
+        the file is copied to a temporary file, cropped and resized
+        locally and sent to the image host off the event loop. Re-uploading the current avatar
+        or any image seen before skips the image host, see avatar.store_avatar.
         Args:
             file (UploadFile): The uploaded image file.
             current_contact (Contact): The currently logged in user's contact object.
@@ -213,12 +324,13 @@ async def update_avatar_contact(
     :return: The updated contact object
     :doc-author: Trelent
     """
-    r = cloudinary.uploader.upload(
-        file.file, public_id=f"NotesApp/{current_contact.name}", overwrite=True
-    )
-    src_url = cloudinary.CloudinaryImage(f"NotesApp/{current_contact.name}").build_url(
-        width=250, height=250, crop="fill", version=r.get("version")
-    )
+    path, digest = await avatar.spool_upload(file, config.AVATAR_MAX_BYTES)
+    try:
+        if current_contact.avatar and digest in current_contact.avatar:
+            return current_contact
+        src_url = await avatar.store_avatar(path, digest)
+    finally:
+        os.unlink(path)
     contact = await repository_contacts.update_avatar(
         current_contact.email, src_url, db
     )
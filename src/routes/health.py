@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.services.health import get_health_prober
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def liveness():
+    """
+    The liveness function tells the orchestrator that the worker process is running.
+        It never touches the database, Redis or any other I/O.
+
+    :return: A dict with the status
+    :doc-author: Trelent
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    The readiness function reports whether the worker can serve traffic.
+        The database, Redis, connection pool saturation and mail outbox checks come from the
+        background prober's cached results, each with its own latency. The mail outbox check
+        is reported only and does not make the worker unready.
+
+    :return: The readiness report, with status 503 if any check fails
+    :doc-author: Trelent
+    """
+    report = await get_health_prober().snapshot()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
@@ -26,6 +26,22 @@ class ContactResponse(BaseModel):
     model_config = ConfigDict(from_attributes = True)
 
 
+class OwnedContactSchema(BaseModel):
+    name: str = Field(min_length=3, max_length=40)
+    email: EmailStr
+    phone: str = Field(min_length=10, max_length=13)
+    birthday: date
+
+
+class OwnedContactResponse(BaseModel):
+    id: int = 1
+    name: str
+    email: EmailStr
+    phone: str
+    birthday: date
+    model_config = ConfigDict(from_attributes = True)
+
+
 class TokenSchema(BaseModel):
     access_token: str
     refresh_token: str
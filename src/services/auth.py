@@ -10,20 +10,29 @@ from fastapi.security import OAuth2PasswordBearer
 
 from src.database.db import get_db
 from src.repository import contacts as repository_contacts
+from src.services import metrics
 
 from conf.config import config
 from conf import messages
 
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    SECRET_KEY = config.SECRET_KEY_JWT
-    ALGORITHM = config.ALGORITHM
+
+    @property
+    def SECRET_KEY(self) -> str:
+        return config.SECRET_KEY_JWT
+
+    @property
+    def ALGORITHM(self) -> str:
+        return config.ALGORITHM
 
     def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+        with metrics.BCRYPT_VERIFY.time():
+            return self.pwd_context.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+        with metrics.BCRYPT_HASH.time():
+            return self.pwd_context.hash(password)
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 
@@ -50,9 +59,10 @@ class Auth:
         to_encode.update(
             {"iat": datetime.now(timezone.utc), "exp": expire, "scope": "access_token"}
         )
-        encoded_access_token = jwt.encode(
-            to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
-        )
+        with metrics.JWT_ENCODE.time():
+            encoded_access_token = jwt.encode(
+                to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
+            )
         return encoded_access_token
 
     async def create_refresh_token(
@@ -78,9 +88,10 @@ class Auth:
         to_encode.update(
             {"iat": datetime.now(timezone.utc), "exp": expire, "scope": "refresh_token"}
         )
-        encoded_refresh_token = jwt.encode(
-            to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
-        )
+        with metrics.JWT_ENCODE.time():
+            encoded_refresh_token = jwt.encode(
+                to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
+            )
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
@@ -96,9 +107,10 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
-            )
+            with metrics.JWT_DECODE.time():
+                payload = jwt.decode(
+                    refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+                )
             if payload["scope"] == "refresh_token":
                 email = payload["sub"]
                 return email
@@ -134,7 +146,8 @@ class Auth:
         )
 
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            with metrics.JWT_DECODE.time():
+                payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -162,7 +175,8 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.now(timezone.utc) + timedelta(days=1)
         to_encode.update({"iat": datetime.now(timezone.utc), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        with metrics.JWT_ENCODE.time():
+            token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return token
     
     async def get_email_from_token(self, token: str):
@@ -177,7 +191,8 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            with metrics.JWT_DECODE.time():
+                payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             email = payload["sub"]
             return email
         except JWTError as e:
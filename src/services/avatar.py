@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services import cache
+from src.services.storage import AvatarStorage, CloudinaryStorage, LocalStorage
+
+from conf.config import config
+from conf import messages
+
+CHUNK_SIZE = 64 * 1024
+# room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """
+    Pure ASGI middleware rejecting avatar uploads larger than AVATAR_MAX_BYTES with 413 while they are received.
+    Starlette reads the whole multipart body into a spooled file before the route runs, so the limit
+    has to be applied here: a Content-Length over the limit is refused before any of the body is read,
+    and a body without one is cut off as soon as it passes the limit.
+    """
+
+    def __init__(self, app: ASGIApp, paths: tuple[str, ...] = ("/api/contacts/avatar",)):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        limit = config.AVATAR_MAX_BYTES + MULTIPART_OVERHEAD
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(
+                {"detail": messages.FILE_TOO_LARGE},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                headers={"Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # raised inside the form parsing of the route, so it is answered as a 413
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=messages.FILE_TOO_LARGE,
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+@lru_cache
+def get_image_executor() -> ThreadPoolExecutor:
+    """
+    The get_image_executor function creates the thread pool that decodes and resizes avatars on first use.
+        It also applies the AVATAR_MAX_PIXELS decompression bomb limit to Pillow.
+
+    :return: The image processing thread pool
+    :doc-author: Trelent
+    """
+    Image.MAX_IMAGE_PIXELS = config.AVATAR_MAX_PIXELS
+    return ThreadPoolExecutor(
+        max_workers=config.AVATAR_PROCESS_WORKERS, thread_name_prefix="avatar-image"
+    )
+
+
+def _spool(source, max_bytes: int) -> tuple[str, str]:
+    spool = tempfile.NamedTemporaryFile(prefix="avatar-", delete=False)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=messages.FILE_TOO_LARGE,
+                )
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        os.unlink(spool.name)
+        raise
+    spool.close()
+    return spool.name, digest.hexdigest()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> tuple[str, str]:
+    """
+    The spool_upload function copies an uploaded file to a named temporary file and hashes it on the way.
+        By the time it runs Starlette has received the whole body, which UploadLimitMiddleware
+        keeps under the limit; this enforces max_bytes on the file itself, with 413.
+        The copy runs in the thread pool, so its disk reads and writes do not block the event loop.
+
+    :param file: UploadFile: The uploaded file
+    :param max_bytes: int: The largest accepted size
+    :return: The path of the temporary file, the caller removes it, and the sha256 of its content
+    :doc-author: Trelent
+    """
+    await file.seek(0)
+    return await run_in_threadpool(_spool, file.file, max_bytes)
+
+
+def process_avatar(path: str, size: int) -> bytes:
+    """
+    The process_avatar function decodes an image, crops and resizes it to a size x size square and re-encodes it as JPEG.
+        The EXIF orientation is applied first; EXIF and every other metadata block is dropped
+        because the image is re-encoded without it. Runs in the image executor, see get_image_executor.
+
+    :param path: str: The spooled upload
+    :param size: int: The side of the square avatar
+    :return: The JPEG bytes
+    :doc-author: Trelent
+    """
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image.convert("RGB"), (size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+@lru_cache
+def get_storage() -> AvatarStorage:
+    """
+    The get_storage function returns the avatar storage selected by AVATAR_STORAGE ("cloudinary" or "local").
+
+    :return: The avatar storage
+    :doc-author: Trelent
+    """
+    if config.AVATAR_STORAGE == "local":
+        return LocalStorage(config.AVATAR_LOCAL_DIR, get_image_executor())
+    return CloudinaryStorage(config.AVATAR_UPLOAD_WORKERS)
+
+
+async def store_avatar(path: str, digest: str) -> str:
+    """
+    The store_avatar function turns a spooled upload into an avatar url.
+        Images are keyed by the hash of their content: an image that was already processed
+        and saved to the current storage is not processed or saved again.
+
+    :param path: str: The spooled upload
+    :param digest: str: The sha256 of the upload
+    :return: The url of the avatar
+    :doc-author: Trelent
+    """
+    storage = get_storage()
+    url = await cache.get_avatar_url(storage.namespace, digest)
+    if url is not None:
+        return url
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(
+            get_image_executor(), process_avatar, path, config.AVATAR_SIZE
+        )
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_IMAGE
+        )
+    url = await storage.save(digest, data)
+    await cache.set_avatar_url(storage.namespace, digest, url)
+    return url
@@ -0,0 +1,197 @@
+import json
+from typing import Awaitable, Callable, Iterable, Sequence
+
+from src.database.models import OwnedContact
+from src.schemas import OwnedContactResponse
+from src.services.invalidation import bus
+from src.services.redis_client import RedisService, get_redis
+
+from conf.config import config
+
+def _redis() -> RedisService:
+    return get_redis()
+
+
+def contact_key(contact_id: int) -> str:
+    # address book entries, kept apart from the "contact:" keys the accounts were cached under
+    return f"owned_contact:{contact_id}"
+
+
+def search_generation_key(owner_id: int) -> str:
+    return f"search:generation:{owner_id}"
+
+
+def search_key(owner_id: int, field_search: str, offset: int, limit: int) -> str:
+    return f"search:{owner_id}:{offset}:{limit}:{field_search}"
+
+
+@bus.subscribe
+def evict_local(entity: str | None, contact_id: int | None):
+    """
+    The evict_local function drops a changed address book entry from the client-side cache of this worker,
+        or the whole client-side cache when invalidation events may have been lost.
+        Accounts ("contact" events) are not in the contact cache.
+
+    :param entity: str | None: The changed entity
+    :param contact_id: int | None: Its id, None to evict everything
+    :return: None
+    :doc-author: Trelent
+    """
+    if contact_id is None:
+        _redis().local.clear()
+    elif entity == "owned_contact":
+        _redis().local.delete(contact_key(contact_id))
+
+
+def avatar_key(namespace: str, digest: str) -> str:
+    return f"avatar:{namespace}:{digest}"
+
+
+def normalize_search(field_search: str) -> str:
+    """
+    The normalize_search function turns a raw search string into the form used both for the query and the cache key,
+        so "  Test   Name " and "Test Name" share one cache entry.
+
+    :param field_search: str: The search string from the url
+    :return: The search string with collapsed whitespace
+    :doc-author: Trelent
+    """
+    return " ".join(field_search.split())
+
+
+async def get_search_ids(
+    owner_id: int, field_search: str, offset: int, limit: int
+) -> tuple[str | None, list[int] | None]:
+    """
+    The get_search_ids function returns the cached contact ids for a search page of an owner.
+        Entries are stored as "<generation>:<id>,<id>,..." and the owner's current generation is read
+        in the same MGET, so an entry written before the owner's last contact write is a miss.
+        The generation is returned as well so that a miss can be filled with set_search_ids
+        under the generation that was current before the database was queried.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param field_search: str: The normalized search string
+    :param offset: int: The offset of the page
+    :param limit: int: The size of the page
+    :return: The current generation and the ids (None on a miss)
+    :doc-author: Trelent
+    """
+    generation, entry = await _redis().mget(
+        [search_generation_key(owner_id), search_key(owner_id, field_search, offset, limit)]
+    )
+    generation = generation or "0"
+    if entry is None:
+        return generation, None
+    entry_generation, _, ids = entry.partition(":")
+    if entry_generation != generation:
+        return generation, None
+    return generation, [int(contact_id) for contact_id in ids.split(",") if contact_id]
+
+
+async def set_search_ids(
+    owner_id: int, field_search: str, offset: int, limit: int, generation: str, ids: Sequence[int]
+):
+    """
+    The set_search_ids function stores the contact ids of a search page.
+
+    :param owner_id: int: The id of the account that owns the address book
+    :param field_search: str: The normalized search string
+    :param offset: int: The offset of the page
+    :param limit: int: The size of the page
+    :param generation: str: The search generation read before the database was queried
+    :param ids: Sequence[int]: The ids of the contacts on the page, in order
+    :return: None
+    :doc-author: Trelent
+    """
+    await _redis().set(
+        search_key(owner_id, field_search, offset, limit),
+        f"{generation}:{','.join(map(str, ids))}",
+        ex=config.SEARCH_CACHE_TTL,
+    )
+
+
+async def set_contacts(contacts: Iterable[OwnedContact]):
+    """
+    The set_contacts function puts serialized contacts into the contact cache.
+
+    :param contacts: Iterable[OwnedContact]: The contacts to cache
+    :return: None
+    :doc-author: Trelent
+    """
+    async with _redis().batch() as batch:
+        for contact in contacts:
+            batch.set(
+                contact_key(contact.id),
+                OwnedContactResponse.model_validate(contact).model_dump_json(),
+                ex=config.CONTACT_CACHE_TTL,
+            )
+
+
+async def hydrate_contacts(
+    ids: Sequence[int], load: Callable[[list[int]], Awaitable[Sequence[OwnedContact]]]
+) -> list[OwnedContactResponse]:
+    """
+    The hydrate_contacts function turns a list of contact ids into contacts.
+        Contacts are read from the contact cache in one MGET, the misses are loaded with the load callable
+        and written back, and the result keeps the order of ids. Contacts deleted in the meantime are skipped.
+
+    :param ids: Sequence[int]: The contact ids to hydrate
+    :param load: Callable: Load the missing contacts from the database
+    :return: A list of contacts
+    :doc-author: Trelent
+    """
+    if not ids:
+        return []
+    found = {}
+    cached = await _redis().mget([contact_key(contact_id) for contact_id in ids])
+    for contact_id, value in zip(ids, cached):
+        if value is not None:
+            found[contact_id] = OwnedContactResponse(**json.loads(value))
+    missing = [contact_id for contact_id in ids if contact_id not in found]
+    if missing:
+        loaded = await load(missing)
+        await set_contacts(loaded)
+        for contact in loaded:
+            found[contact.id] = OwnedContactResponse.model_validate(contact)
+    return [found[contact_id] for contact_id in ids if contact_id in found]
+
+
+async def invalidate_contact(owner_id: int, contact_id: int):
+    """
+    The invalidate_contact function is called after every write to an address book.
+        It drops the cached contact and bumps the owner's search generation,
+        which makes every cached search page of that owner stale at once.
+
+    :param owner_id: int: The id of the account that owns the contact
+    :param contact_id: int: The id of the contact that changed
+    :return: None
+    :doc-author: Trelent
+    """
+    async with _redis().batch() as batch:
+        batch.delete(contact_key(contact_id))
+        batch.incr(search_generation_key(owner_id))
+
+
+async def get_avatar_url(namespace: str, digest: str) -> str | None:
+    """
+    The get_avatar_url function returns the url of an avatar that was already uploaded for the same image content.
+
+    :param namespace: str: The namespace of the avatar storage, see AvatarStorage
+    :param digest: str: The sha256 of the uploaded image
+    :return: The avatar url, or None when the image has not been seen by this storage
+    :doc-author: Trelent
+    """
+    return await _redis().get(avatar_key(namespace, digest))
+
+
+async def set_avatar_url(namespace: str, digest: str, url: str):
+    """
+    The set_avatar_url function remembers the avatar url for an image content hash.
+
+    :param namespace: str: The namespace of the avatar storage, see AvatarStorage
+    :param digest: str: The sha256 of the uploaded image
+    :param url: str: The url of the processed and uploaded avatar
+    :return: None
+    :doc-author: Trelent
+    """
+    await _redis().set(avatar_key(namespace, digest), url, ex=config.AVATAR_DEDUP_TTL)
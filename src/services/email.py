@@ -1,31 +1,81 @@
+from functools import lru_cache
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
+from src.services.email_render import TemplatedEmail
+from src.services.mail_transport import SMTPPool
 
 from conf.config import config
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=config.MAIL_USERNAME,
-    MAIL_PASSWORD=config.MAIL_PASSWORD,
-    MAIL_FROM=config.MAIL_FROM,
-    MAIL_PORT=config.MAIL_PORT,
-    MAIL_SERVER=config.MAIL_SERVER,
-    MAIL_FROM_NAME="Auth contact",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+MAIL_FROM_NAME = "Auth contact"
+
+
+@lru_cache
+def get_mail_config() -> ConnectionConfig:
+    """
+    The get_mail_config function builds the fastapi-mail connection settings on first use.
+
+    :return: The connection settings of the SMTP server
+    :doc-author: Trelent
+    """
+    return ConnectionConfig(
+        MAIL_USERNAME=config.MAIL_USERNAME,
+        MAIL_PASSWORD=config.MAIL_PASSWORD,
+        MAIL_FROM=config.MAIL_FROM,
+        MAIL_PORT=config.MAIL_PORT,
+        MAIL_SERVER=config.MAIL_SERVER,
+        MAIL_FROM_NAME=MAIL_FROM_NAME,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+    )
+
+
+@lru_cache
+def get_mail_pool() -> SMTPPool:
+    """
+    The get_mail_pool function creates the process-wide SMTP session pool on first use.
+
+    :return: The SMTPPool shared by every send in the process
+    :doc-author: Trelent
+    """
+    return SMTPPool(
+        get_mail_config(), size=config.MAIL_POOL_SIZE, idle_timeout=config.MAIL_POOL_IDLE_TIMEOUT
+    )
+
+
+@lru_cache
+def get_confirmation_email() -> TemplatedEmail:
+    """
+    The get_confirmation_email function compiles the confirmation email templates on first use and keeps them in memory.
+        It is called from the application lifespan, so the templates are compiled at startup.
+
+    :return: The compiled confirmation email
+    :doc-author: Trelent
+    """
+    return TemplatedEmail(
+        TEMPLATE_FOLDER,
+        "email_template.html",
+        "email_template.txt",
+        fields=("username", "host", "token"),
+        subject="Confirm your email ",
+        sender_address=config.MAIL_FROM,
+        sender_name=MAIL_FROM_NAME,
+    )
 
 
 async def send_email(email: EmailStr, username: str, host: str):
     """
     The send_email function sends an email to the user with a link to confirm their email address.
+        The message is rendered from the precompiled templates (see TemplatedEmail)
+        and goes out over a pooled SMTP session, see SMTPPool.
+        Delivery errors are raised as ConnectionErrors so that the outbox worker can retry them.
         The function takes in three arguments:
             -email: the user's email address, which is used as a unique identifier for each account.
             -username: the username of the account that was just created. This is displayed in 
@@ -39,20 +89,8 @@ async def send_email(email: EmailStr, username: str, host: str):
     :return: A coroutine object
     :doc-author: Trelent
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = auth_service.create_email_token({"sub": email})
+    message = get_confirmation_email().prepare(
+        email, username=username, host=str(host), token=token_verification
+    )
+    await get_mail_pool().send_prepared(message)
@@ -0,0 +1,152 @@
+import html
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from pathlib import Path
+from typing import Callable, Sequence
+
+from jinja2 import Environment, FileSystemLoader
+
+MARKER = re.compile("\x00(\\d+)\x00")
+
+
+class CompiledTemplate:
+    """
+    A Jinja2 template rendered once with marker values and cut into its static parts.
+
+    Rendering a message then only joins the cached static parts with the per-message
+    values, both as str and as pre-encoded UTF-8 bytes. This works for templates that
+    use the fields as plain ``{{field}}`` substitutions; anything else (filters, loops or
+    conditions on a field) is detected at compile time and raises ValueError.
+    """
+
+    def __init__(self, env: Environment, name: str, fields: Sequence[str], escape: bool):
+        self.name = name
+        self.fields = tuple(fields)
+        self.escape: Callable[[str], str] = html.escape if escape else str
+        template = env.get_template(name)
+        rendered = template.render(
+            **{field: f"\x00{index}\x00" for index, field in enumerate(self.fields)}
+        )
+        parts = MARKER.split(rendered)
+        self.static = parts[0::2]
+        self.order = [self.fields[int(index)] for index in parts[1::2]]
+        self.static_bytes = [part.encode("utf-8") for part in self.static]
+
+        sample = {field: f"<{field} sample & value>" for field in self.fields}
+        expected = template.render(**{field: self.escape(value) for field, value in sample.items()})
+        if self.render(**sample) != expected:
+            raise ValueError(f"{name} uses its fields in a way that cannot be precompiled")
+
+    def render(self, **values: str) -> str:
+        escaped = [self.escape(str(values[field])) for field in self.order]
+        out = [self.static[0]]
+        for value, static in zip(escaped, self.static[1:]):
+            out.append(value)
+            out.append(static)
+        return "".join(out)
+
+    def render_bytes(self, **values: str) -> bytes:
+        escaped = [self.escape(str(values[field])).encode("utf-8") for field in self.order]
+        out = [self.static_bytes[0]]
+        for value, static in zip(escaped, self.static_bytes[1:]):
+            out.append(value)
+            out.append(static)
+        return b"".join(out)
+
+
+@dataclass
+class PreparedMessage:
+    sender: str
+    recipients: list[str]
+    data: bytes
+    build_message: Callable[[], EmailMessage]
+
+
+class TemplatedEmail:
+    """
+    A multipart/alternative (text and HTML) email built from two precompiled templates.
+
+    Everything that does not depend on the recipient — the templates, the MIME skeleton with
+    its boundary and part headers, the sender and subject headers — is built and encoded once.
+    prepare() only renders the per-user fields and the To, Date and Message-ID headers.
+    The bytes use 8bit transfer encoding; build_message() gives an equivalent EmailMessage
+    for servers without 8BITMIME.
+    """
+
+    def __init__(
+        self,
+        template_folder: Path,
+        html_template: str,
+        text_template: str,
+        fields: Sequence[str],
+        subject: str,
+        sender_address: str,
+        sender_name: str | None = None,
+    ):
+        env = Environment(loader=FileSystemLoader(template_folder))
+        self.html = CompiledTemplate(env, html_template, fields, escape=True)
+        self.text = CompiledTemplate(env, text_template, fields, escape=False)
+        self.subject = subject
+        self.sender_address = sender_address
+        sender = f"{sender_name} <{sender_address}>" if sender_name else sender_address
+        self.sender = sender
+        self._domain = make_msgid().rsplit("@", 1)[1].rstrip(">")
+        boundary = f"=={uuid.uuid4().hex}=="
+        self._head = (
+            f"From: {sender}\r\n"
+            f"Subject: {subject}\r\n"
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+        ).encode("utf-8")
+        self._text_part = (
+            f"\r\n--{boundary}\r\n"
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: 8bit\r\n\r\n"
+        ).encode("ascii")
+        self._html_part = (
+            f"\r\n--{boundary}\r\n"
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: 8bit\r\n\r\n"
+        ).encode("ascii")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+
+    def prepare(self, recipient: str, **values: str) -> PreparedMessage:
+        """
+        The prepare function renders the email for one recipient.
+
+        :param self: Represent the instance of the class
+        :param recipient: str: The address to send the email to
+        :param values: str: The per-user template fields
+        :return: A PreparedMessage with the encoded message
+        :doc-author: Trelent
+        """
+        date = formatdate(time.time(), localtime=True)
+        msg_id = make_msgid(domain=self._domain)
+        data = b"".join(
+            (
+                self._head,
+                f"To: {recipient}\r\nDate: {date}\r\nMessage-ID: {msg_id}\r\n".encode("utf-8"),
+                self._text_part,
+                self.text.render_bytes(**values),
+                self._html_part,
+                self.html.render_bytes(**values),
+                self._tail,
+            )
+        )
+
+        def build_message() -> EmailMessage:
+            message = EmailMessage()
+            message["From"] = self.sender
+            message["To"] = recipient
+            message["Subject"] = self.subject
+            message["Date"] = date
+            message["Message-ID"] = msg_id
+            message.set_content(self.text.render(**values))
+            message.add_alternative(self.html.render(**values), subtype="html")
+            return message
+
+        return PreparedMessage(self.sender_address, [recipient], data, build_message)
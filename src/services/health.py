@@ -0,0 +1,192 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, select, text
+
+from src.database.db import sessionmanager
+from src.database.models import EmailOutbox, utcnow
+from src.services.redis_client import get_redis
+
+from conf.config import config
+
+
+class ProbeFailed(Exception):
+    pass
+
+
+@dataclass
+class ProbeResult:
+    ok: bool
+    latency_ms: float
+    detail: str | None = None
+
+
+async def probe_database() -> str | None:
+    async with sessionmanager.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return None
+
+
+async def probe_redis() -> str | None:
+    redis = get_redis()
+    await redis.ping()
+    return None if redis.available else "serving from the in-process fallback"
+
+
+async def probe_db_pool() -> str | None:
+    pool = sessionmanager.engine.pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return f"{type(pool).__name__} has no size limit"
+    # the engine is built with DB_MAX_OVERFLOW, see DatabaseSessionManager
+    capacity = pool.size() + max(config.DB_MAX_OVERFLOW, 0)
+    saturation = pool.checkedout() / capacity if capacity else 0.0
+    detail = f"{pool.checkedout()}/{capacity} connections checked out"
+    if saturation >= config.HEALTH_POOL_SATURATION:
+        raise ProbeFailed(detail)
+    return detail
+
+
+async def probe_mail_outbox() -> str | None:
+    # only emails due now count: one undeliverable address waiting out its backoff is not a backlog
+    now = utcnow()
+    async with sessionmanager.engine.connect() as conn:
+        oldest, due = (
+            await conn.execute(
+                select(func.min(EmailOutbox.created_at), func.count()).where(
+                    EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now
+                )
+            )
+        ).one()
+    detail = f"{due} due"
+    if oldest is not None and now - oldest > timedelta(seconds=config.HEALTH_OUTBOX_MAX_AGE):
+        raise ProbeFailed(f"{detail}, oldest queued at {oldest.isoformat()}")
+    return detail
+
+
+async def probe_warmup() -> str | None:
+    from src.services.warmup import warmup_state
+
+    if not warmup_state.done:
+        raise ProbeFailed("warming up")
+    detail = f"warmed up in {warmup_state.duration * 1000:.0f} ms"
+    if warmup_state.error:
+        detail += f" with an error: {warmup_state.error}"
+    return detail
+
+
+class HealthProber:
+    """
+    Runs the readiness probes in the background and keeps their last results.
+
+    Readiness requests read the cached results instead of touching the dependencies, so
+    frequent orchestrator probes across many workers cost one round of probes per
+    ``interval`` per worker. Probes in ``report_only`` are shown but do not make the worker
+    unready. When the cached results are older than two intervals (the
+    prober is not running, e.g. in tests) a request runs the probes itself; concurrent
+    requests share that run.
+    """
+
+    def __init__(
+        self,
+        probes: dict[str, Callable[[], Awaitable[str | None]]],
+        interval: float,
+        timeout: float,
+        report_only: frozenset[str] = frozenset(),
+    ):
+        self.probes = probes
+        self.report_only = report_only
+        self.interval = interval
+        self.timeout = timeout
+        self.results: dict[str, ProbeResult] = {}
+        self.checked_at: float | None = None
+        self._task: asyncio.Task | None = None
+        self._running: asyncio.Task | None = None
+
+    async def _probe(self, probe: Callable[[], Awaitable[str | None]]) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(probe(), self.timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timed out after {self.timeout}s"
+        except Exception as err:
+            ok, detail = False, str(err) or type(err).__name__
+        return ProbeResult(ok, round((time.perf_counter() - started) * 1000, 3), detail)
+
+    async def _run_once(self):
+        results = await asyncio.gather(*(self._probe(probe) for probe in self.probes.values()))
+        self.results = dict(zip(self.probes, results))
+        self.checked_at = time.monotonic()
+
+    async def run_once(self):
+        """
+        The run_once function runs every probe concurrently and stores the results.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        if self._running is None or self._running.done():
+            self._running = asyncio.ensure_future(self._run_once())
+        await asyncio.shield(self._running)
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def snapshot(self) -> dict:
+        """
+        The snapshot function returns the readiness report, probing first if the cached results are stale.
+
+        :param self: Represent the instance of the class
+        :return: A dict with the overall status, the age of the results and the per-dependency results
+        :doc-author: Trelent
+        """
+        if self.checked_at is None or time.monotonic() - self.checked_at > 2 * self.interval:
+            await self.run_once()
+        return {
+            "ready": all(result.ok for name, result in self.results.items() if name not in self.report_only),
+            "age_s": round(time.monotonic() - self.checked_at, 3),
+            "checks": {name: asdict(result) for name, result in self.results.items()},
+        }
+
+
+@lru_cache
+def get_health_prober() -> HealthProber:
+    """
+    The get_health_prober function creates the process-wide prober of the readiness checks on first use.
+
+    :return: The HealthProber of the database, Redis, pool and outbox checks; the outbox is
+        delivered by worker.py, so a backlog there is reported without taking the web workers out
+    :doc-author: Trelent
+    """
+    return HealthProber(
+        {
+            "database": probe_database,
+            "redis": probe_redis,
+            "db_pool": probe_db_pool,
+            "mail_outbox": probe_mail_outbox,
+            "warmup": probe_warmup,
+        },
+        interval=config.HEALTH_PROBE_INTERVAL,
+        timeout=config.HEALTH_PROBE_TIMEOUT,
+        report_only=frozenset({"mail_outbox"}),
+    )
@@ -0,0 +1,228 @@
+"""
+Cross-worker invalidation of in-process caches.
+
+Every worker keeps state that other workers cannot see: the flights of single_flight and
+the client-side cache of the Redis service. When a repository write commits it calls
+bus.publish(entity, id). The caches of the writing worker are evicted at once. The event
+is also sent over the Redis pub/sub channel INVALIDATION_CHANNEL, and the subscriber in
+every other worker, on any node, evicts its own caches. Caches register what to evict
+with bus.subscribe.
+
+A message carries the origin worker, the publish time and one or more events
+"entity:id:version", where version is the origin's sequence number. Pub/sub delivers at
+most once. A subscriber that (re)connects, or that sees the version of an origin jump,
+cannot tell what it missed, so it evicts everything. Publishing never waits on Redis:
+events are queued, a background task sends what has accumulated in one message, and
+events that cannot be sent are retried every REDIS_RETRY_INTERVAL seconds. The queue is
+bounded; when old events are dropped, the gap makes the peers evict everything.
+
+The bus shows in invalidation_events_total{direction, entity},
+invalidation_lag_seconds (from sending a message to evicting its events in another worker;
+across nodes it includes their clock skew), invalidation_queue_size and
+invalidation_resyncs_total{reason}.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from collections import OrderedDict, deque
+from typing import Callable
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import RedisError
+
+from src.services.metrics import INVALIDATION_EVENTS, INVALIDATION_LAG, INVALIDATION_QUEUE, INVALIDATION_RESYNCS
+from src.services.redis_client import get_redis
+
+from conf.config import config
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_MESSAGE = 500
+MAX_ORIGINS = 1000
+
+Handler = Callable[[str | None, int | None], None]
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.origin: str | None = None
+        self.version = 0
+        self.handlers: list[tuple[frozenset[str], Handler]] = []
+        self.queue: deque[str] = deque()
+        self.seen: OrderedDict[str, int] = OrderedDict()
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def subscribe(self, handler: Handler, *entities: str):
+        """
+        The subscribe function registers a local cache to evict on changes.
+            The handler gets the entity and its id, or (None, None) when everything may be stale.
+
+        :param self: Represent the instance of the class
+        :param handler: Handler: Evict the cached state of a changed entity
+        :param *entities: str: The entities the handler caches; none means all of them
+        :return: The handler, so that subscribe can be used as a decorator
+        :doc-author: Trelent
+        """
+        self.handlers.append((frozenset(entities), handler))
+        return handler
+
+    def evict(self, entity: str, entity_id: int):
+        for entities, handler in self.handlers:
+            if not entities or entity in entities:
+                try:
+                    handler(entity, entity_id)
+                except Exception:
+                    logger.exception("Invalidation handler failed for %s:%s", entity, entity_id)
+
+    def resync(self, reason: str):
+        """
+        The resync function evicts every local cache, after events may have been missed.
+
+        :param self: Represent the instance of the class
+        :param reason: str: Why, for the metric
+        :return: None
+        :doc-author: Trelent
+        """
+        INVALIDATION_RESYNCS.labels(reason).inc()
+        for _, handler in self.handlers:
+            try:
+                handler(None, None)
+            except Exception:
+                logger.exception("Invalidation handler failed to evict everything")
+
+    def publish(self, entity: str, entity_id: int):
+        """
+        The publish function announces that an entity changed. Repositories call it right after the commit.
+            Local caches are evicted before it returns; other workers are told in the background.
+
+        :param self: Represent the instance of the class
+        :param entity: str: The kind of entity, e.g. "contact"
+        :param entity_id: int: Its primary key
+        :return: None
+        :doc-author: Trelent
+        """
+        self.evict(entity, entity_id)
+        INVALIDATION_EVENTS.labels("published", entity).inc()
+        if self._wakeup is None:
+            return
+        self.version += 1
+        if len(self.queue) >= config.INVALIDATION_QUEUE_SIZE:
+            self.queue.popleft()
+        self.queue.append(f"{entity}:{entity_id}:{self.version}")
+        INVALIDATION_QUEUE.set(len(self.queue))
+        self._wakeup.set()
+
+    def receive(self, data: str):
+        """
+        The receive function applies a message of another worker.
+
+        :param self: Represent the instance of the class
+        :param data: str: The message, "<origin> <published at> <entity>:<id>:<version> ..."
+        :return: None
+        :doc-author: Trelent
+        """
+        try:
+            origin, published, *events = data.split(" ")
+            events = [event.rsplit(":", 2) for event in events]
+            events = [(entity, int(entity_id), int(version)) for entity, entity_id, version in events]
+            published = float(published)
+        except ValueError:
+            logger.warning("Malformed invalidation message: %r", data)
+            self.resync("malformed")
+            return
+        if origin == self.origin or not events:
+            return
+        last = self.seen.pop(origin, None)
+        if last is not None and events[0][2] != last + 1:
+            self.resync("gap")
+        self.seen[origin] = events[-1][2]
+        while len(self.seen) > MAX_ORIGINS:
+            self.seen.popitem(last=False)
+        for entity, entity_id, _ in events:
+            INVALIDATION_EVENTS.labels("received", entity).inc()
+            self.evict(entity, entity_id)
+        INVALIDATION_LAG.observe(max(time.time() - published, 0.0))
+
+    async def _send(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.queue:
+                count = min(len(self.queue), MAX_EVENTS_PER_MESSAGE)
+                events = [self.queue.popleft() for _ in range(count)]
+                message = f"{self.origin} {time.time():.6f} {' '.join(events)}"
+                try:
+                    await get_redis().client.publish(config.INVALIDATION_CHANNEL, message)
+                except (RedisError, OSError) as err:
+                    logger.warning("Invalidation events not published, retrying: %s", err)
+                    room = config.INVALIDATION_QUEUE_SIZE - len(self.queue)
+                    if room > 0:
+                        self.queue.extendleft(reversed(events[-room:]))
+                    INVALIDATION_QUEUE.set(len(self.queue))
+                    await asyncio.sleep(config.REDIS_RETRY_INTERVAL)
+                    continue
+                INVALIDATION_QUEUE.set(len(self.queue))
+
+    async def _receive(self, pubsub):
+        pinged = False
+        while True:
+            message = await pubsub.get_message(timeout=max(config.REDIS_RETRY_INTERVAL, 1.0))
+            if message is None:
+                if pinged:
+                    raise RedisConnectionError("no answer from the invalidation subscription")
+                await pubsub.ping()
+                pinged = True
+                continue
+            pinged = False
+            if message["type"] == "message":
+                self.receive(message["data"])
+
+    async def _listen(self):
+        while True:
+            pubsub = get_redis().client.pubsub()
+            try:
+                await pubsub.subscribe(config.INVALIDATION_CHANNEL)
+                # anything published while this worker was not subscribed is lost
+                self.seen.clear()
+                self.resync("connect")
+                await self._receive(pubsub)
+            except (RedisError, OSError) as err:
+                logger.warning("Invalidation subscription lost: %s", err)
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(config.REDIS_RETRY_INTERVAL)
+
+    def start(self):
+        """
+        The start function starts the subscriber and the publisher; the lifespan calls it in every worker.
+            The origin is chosen here, after the worker has forked.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        if self._tasks:
+            return
+        self.origin = f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(4)}"
+        self.version = 0
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._send())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._wakeup = None
+        self.queue.clear()
+        INVALIDATION_QUEUE.set(0)
+
+
+bus = InvalidationBus()
@@ -0,0 +1,126 @@
+"""
+Event loop lag monitor.
+
+A task sleeps for LOOP_LAG_INTERVAL seconds in a loop and records how late it wakes up in
+the event_loop_lag_seconds histogram. Lateness is time the loop spent running something else
+without yielding, such as bcrypt, a synchronous HTTP call or a large print.
+
+The task also stamps a heartbeat on every wake-up. A watchdog thread checks the heartbeat
+and, when the loop has been stuck for longer than LOOP_LAG_THRESHOLD, captures the loop
+thread's stack while the blocking code is still running and logs it. Captures are limited
+to one per LOOP_LAG_CAPTURE_INTERVAL seconds so a slow endpoint under load cannot flood the log.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from functools import lru_cache
+from typing import Callable
+
+from src.services.metrics import LOOP_BLOCKED, LOOP_LAG
+
+from conf.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.1,
+        capture_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.capture_interval = capture_interval
+        self.clock = clock
+        self.captures: deque[dict] = deque(maxlen=20)
+        self._beat = clock()
+        self._captured_beat: float | None = None
+        self._last_capture: float | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - due, 0.0)
+            self._beat = self.clock()
+            LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                LOOP_BLOCKED.inc()
+
+    def check(self):
+        """
+        The check function is one round of the watchdog: it captures the loop thread's stack
+            if the loop has missed its heartbeat by more than the threshold.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        beat = self._beat
+        now = self.clock()
+        blocked = now - beat - self.interval
+        if blocked <= self.threshold or beat == self._captured_beat:
+            return
+        if self._last_capture is not None and now - self._last_capture < self.capture_interval:
+            return
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        self._captured_beat, self._last_capture = beat, now
+        self.captures.append({"blocked_s": round(blocked, 3), "stack": stack})
+        logger.warning("Event loop blocked for %.3fs in:\n%s", blocked, stack)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            self.check()
+
+    def start(self):
+        """
+        The start function starts the lag task on the running loop and the watchdog thread.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = self.clock()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._watchdog.join()
+        self._task = self._watchdog = None
+
+
+@lru_cache
+def get_loop_monitor() -> LoopLagMonitor:
+    return LoopLagMonitor(
+        interval=config.LOOP_LAG_INTERVAL,
+        threshold=config.LOOP_LAG_THRESHOLD,
+        capture_interval=config.LOOP_LAG_CAPTURE_INTERVAL,
+    )
@@ -0,0 +1,190 @@
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig, MessageSchema
+from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail.fastmail import email_dispatched
+from fastapi_mail.msg import MailMsg
+
+from src.services.email_render import PreparedMessage
+
+
+class _PooledConnection:
+    def __init__(self, conf: ConnectionConfig):
+        self.conf = conf
+        self.smtp: aiosmtplib.SMTP | None = None
+        self.last_used = 0.0
+        self.sent = 0
+
+    async def connect(self):
+        self.smtp = aiosmtplib.SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            timeout=self.conf.TIMEOUT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+        )
+        await self.smtp.connect()
+        if self.conf.USE_CREDENTIALS:
+            await self.smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD)
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    async def close(self):
+        if self.smtp is not None and self.smtp.is_connected:
+            try:
+                await self.smtp.quit()
+            except aiosmtplib.SMTPException:
+                self.smtp.close()
+        self.smtp = None
+
+    def is_stale(self, idle_timeout: float, max_messages: int) -> bool:
+        return (
+            self.smtp is None
+            or not self.smtp.is_connected
+            or time.monotonic() - self.last_used > idle_timeout
+            or self.sent >= max_messages
+        )
+
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP sessions shared by every send in the process.
+
+    fastapi-mail opens a new connection, with the TLS handshake and login, for each message.
+    SMTPPool keeps up to ``size`` sessions open and sends many messages per session.
+    A session that has been idle longer than ``idle_timeout`` seconds, or that has sent
+    ``max_messages`` messages, is closed and reopened before the next send, because most
+    servers drop idle clients and cap the number of messages per session.
+    """
+
+    def __init__(
+        self,
+        conf: ConnectionConfig,
+        size: int = 2,
+        idle_timeout: float = 30,
+        max_messages: int = 100,
+    ):
+        self.conf = conf
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle: list[_PooledConnection] = []
+        self._semaphore: asyncio.Semaphore | None = None
+        self._templates = None
+        self.connects = 0
+
+    @property
+    def sender(self) -> str:
+        if self.conf.MAIL_FROM_NAME is not None:
+            return f"{self.conf.MAIL_FROM_NAME} <{self.conf.MAIL_FROM}>"
+        return self.conf.MAIL_FROM
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """
+        The connection function checks a live session out of the pool for the duration of the block.
+
+        :param self: Represent the instance of the class
+        :return: A connected and authenticated aiosmtplib.SMTP client
+        :doc-author: Trelent
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        async with self._semaphore:
+            conn = self._idle.pop() if self._idle else _PooledConnection(self.conf)
+            try:
+                if conn.is_stale(self.idle_timeout, self.max_messages):
+                    await conn.close()
+                    await conn.connect()
+                    self.connects += 1
+                yield conn.smtp
+                conn.sent += 1
+                conn.last_used = time.monotonic()
+            except BaseException:
+                await conn.close()
+                raise
+            finally:
+                if conn.smtp is not None:
+                    self._idle.append(conn)
+
+    async def send_message(self, message: MessageSchema, template_name: str | None = None):
+        """
+        The send_message function renders the message the same way FastMail does and sends it over a pooled session.
+            A session the server has dropped is reopened once and the message is retried on it.
+
+        :param self: Represent the instance of the class
+        :param message: MessageSchema: The message to send
+        :param template_name: str | None: The template in TEMPLATE_FOLDER that renders template_body
+        :return: None
+        :doc-author: Trelent
+        """
+        if template_name and self.conf.TEMPLATE_FOLDER and message.template_body is not None:
+            if self._templates is None:
+                self._templates = self.conf.template_engine()
+            template = self._templates.get_template(template_name)
+            message.template_body = template.render(**message.template_body)
+        msg = await MailMsg(message)._message(self.sender)
+
+        async def deliver(smtp):
+            await smtp.send_message(msg)
+
+        await self._deliver(deliver)
+        email_dispatched.send(msg)
+
+    async def send_prepared(self, prepared: PreparedMessage):
+        """
+        The send_prepared function sends an already encoded message, see TemplatedEmail.
+            The 8bit bytes are handed to the server as they are when it supports 8BITMIME,
+            otherwise the message is rebuilt with the email package.
+
+        :param self: Represent the instance of the class
+        :param prepared: PreparedMessage: The message to send
+        :return: None
+        :doc-author: Trelent
+        """
+        async def deliver(smtp):
+            if smtp.supports_extension("8bitmime"):
+                await smtp.sendmail(
+                    prepared.sender,
+                    prepared.recipients,
+                    prepared.data,
+                    mail_options=["BODY=8BITMIME"],
+                )
+            else:
+                await smtp.send_message(prepared.build_message())
+
+        await self._deliver(deliver)
+        email_dispatched.send(prepared)
+
+    async def _deliver(self, deliver):
+        if self.conf.SUPPRESS_SEND:
+            return
+        try:
+            for attempt in range(2):
+                try:
+                    async with self.connection() as smtp:
+                        await deliver(smtp)
+                    return
+                except aiosmtplib.SMTPServerDisconnected:
+                    if attempt:
+                        raise
+        except (aiosmtplib.SMTPException, OSError) as error:
+            raise ConnectionErrors(
+                f"Exception raised {error}, check your credentials or email service configuration"
+            )
+
+    async def close(self):
+        """
+        The close function quits every idle session. It is called on application shutdown.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        while self._idle:
+            await self._idle.pop().close()
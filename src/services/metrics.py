@@ -0,0 +1,205 @@
+"""
+Prometheus metrics.
+
+Metric objects are module globals and updates are plain in-memory increments. When the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable points to an empty directory shared by
+all uvicorn workers (and the outbox worker), prometheus_client keeps the values in
+memory-mapped files in that directory and /metrics aggregates every process.
+"""
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+REQUESTS = Counter(
+    "http_requests_total", "HTTP responses by status", ["method", "route", "status"]
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum"
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement latency", ["operation"]
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Redis command latency", ["command"]
+)
+AUTH_LATENCY = Histogram(
+    "auth_operation_duration_seconds",
+    "bcrypt and JWT operation latency",
+    ["operation"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+BCRYPT_HASH = AUTH_LATENCY.labels("bcrypt_hash")
+BCRYPT_VERIFY = AUTH_LATENCY.labels("bcrypt_verify")
+JWT_ENCODE = AUTH_LATENCY.labels("jwt_encode")
+JWT_DECODE = AUTH_LATENCY.labels("jwt_decode")
+EMAILS = Counter("email_send_total", "Outbox email deliveries by outcome", ["outcome"])
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a timer was due and when the event loop ran it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+FIRST_REQUEST_LATENCY = Histogram(
+    "http_first_request_duration_seconds",
+    "Latency of the first request to each route in a worker, by whether warm-up had finished",
+    ["route", "warmed"],
+)
+WARMUP_DURATION = Gauge("warmup_duration_seconds", "Duration of the startup warm-up")
+LOOP_BLOCKED = Counter("event_loop_blocked_total", "Event loop lag spikes over LOOP_LAG_THRESHOLD")
+SINGLE_FLIGHT = Counter(
+    "single_flight_calls_total", "Repository reads that ran their query or shared an identical one in flight",
+    ["operation", "result"],
+)
+REDIS_LOCAL_CACHE = Counter(
+    "redis_local_cache_total", "Reads of tracked Redis keys served by the client-side cache", ["result"]
+)
+REDIS_FALLBACK = Gauge(
+    "redis_fallback_active", "1 while Redis is unreachable and the in-process fallback is used",
+    multiprocess_mode="max",
+)
+INVALIDATION_EVENTS = Counter(
+    "invalidation_events_total", "Cache invalidation events published by or received from workers",
+    ["direction", "entity"],
+)
+INVALIDATION_LAG = Histogram(
+    "invalidation_lag_seconds",
+    "Delay between publishing an invalidation event and evicting it in another worker",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+INVALIDATION_QUEUE = Gauge(
+    "invalidation_queue_size", "Invalidation events waiting to be published", multiprocess_mode="livemax"
+)
+INVALIDATION_RESYNCS = Counter(
+    "invalidation_resyncs_total", "Full evictions of the local caches after invalidation events may have been lost",
+    ["reason"],
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, in-flight requests and status per route.
+    The route label is the path template (e.g. /api/contacts/{contact_id}), never the raw path.
+    The first request to each route is also recorded separately, see src.services.warmup.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.seen_routes: set[str] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            elapsed = time.perf_counter() - started
+            REQUEST_LATENCY.labels(scope["method"], route).observe(elapsed)
+            REQUESTS.labels(scope["method"], route, str(status)).inc()
+            if route not in self.seen_routes:
+                from src.services.warmup import warmup_state
+
+                self.seen_routes.add(route)
+                FIRST_REQUEST_LATENCY.labels(route, "true" if warmup_state.done else "false").observe(elapsed)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    The instrument_engine function times every SQL statement of an engine by its operation (SELECT, INSERT, ...).
+
+    :param engine: AsyncEngine: The engine to instrument
+    :return: None
+    :doc-author: Trelent
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # kept on the execution context, so a statement that raises leaves nothing behind
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = context._query_started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+
+def instrument_redis(client):
+    """
+    The instrument_redis function times the commands and pipelines sent through a redis.asyncio client.
+
+    :param client: redis.asyncio.Redis: The client to instrument
+    :return: The same client
+    :doc-author: Trelent
+    """
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def timed_execute_command(*args, **options):
+        started = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - started)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await execute(*args, **kwargs)
+            finally:
+                REDIS_COMMAND_LATENCY.labels("PIPELINE").observe(time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+    return client
+
+
+def metrics_response() -> Response:
+    """
+    The metrics_response function renders the metrics in the Prometheus text format.
+
+    :return: A response with the metrics of this process, or of all processes in multiprocess mode
+    :doc-author: Trelent
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,200 @@
+"""
+On-demand sampling profiler for a single request.
+
+A request carrying a valid ``X-Profile: <expires>:<signature>`` header, where the signature
+is the HMAC-SHA256 of ``"<METHOD> <path> <expires>"`` with PROFILE_SECRET, is profiled by a
+thread that samples the request's task every PROFILE_INTERVAL seconds. While the task runs,
+the sample is the event loop thread's stack; while it is suspended, the sample is the chain of
+coroutines it is awaiting, ending in ``<await>``. Either way the time lands on the route
+handler, the dependencies, the repository calls and the serialization that were on the stack.
+
+The samples are written to PROFILE_DIR in the folded format read by flamegraph.pl and
+speedscope, and the file name is returned in the ``X-Profile-Report`` response header.
+Without the header the middleware only scans the request headers.
+
+Sign a request with ``python -m src.services.profiling GET /api/contacts``.
+"""
+import asyncio
+import hashlib
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from conf.config import config
+
+PROFILE_HEADER = b"x-profile"
+REPORT_HEADER = b"x-profile-report"
+
+
+def sign(secret: str, method: str, path: str, expires: int) -> str:
+    """
+    The sign function computes the X-Profile header value for one request.
+
+    :param secret: str: PROFILE_SECRET
+    :param method: str: The HTTP method of the request
+    :param path: str: The path of the request
+    :param expires: int: The unix time after which the signature is rejected
+    :return: The header value
+    :doc-author: Trelent
+    """
+    digest = hmac.new(
+        secret.encode("utf-8"), f"{method.upper()} {path} {expires}".encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+    return f"{expires}:{digest}"
+
+
+def verify(secret: str, method: str, path: str, value: str) -> bool:
+    expires, _, _ = value.partition(":")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(value, sign(secret, method, path, int(expires)))
+
+
+def _qualname(frame) -> str:
+    """
+    The _qualname function names the function of a frame, with its class for methods.
+        code.co_qualname only exists from Python 3.11; runtime.txt pins 3.10.
+
+    :param frame: The frame
+    :return: The qualified name of the function
+    :doc-author: Trelent
+    """
+    code = frame.f_code
+    qualname = getattr(code, "co_qualname", None)
+    if qualname is not None:
+        return qualname
+    owner = frame.f_locals.get("self", frame.f_locals.get("cls"))
+    if owner is not None:
+        cls = owner if isinstance(owner, type) else type(owner)
+        return f"{cls.__qualname__}.{code.co_name}"
+    return code.co_name
+
+
+def _label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{_qualname(frame)}"
+
+
+def _awaited_frames(coro) -> list:
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class RequestSampler:
+    """
+    Samples the stack of one asyncio task from a background thread.
+    Only the frames below ``root`` (the profiler middleware) are kept.
+    """
+
+    def __init__(self, task: asyncio.Task, thread_id: int, root, interval: float):
+        self.task = task
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _stack(self) -> list | None:
+        coro = self.task.get_coro()
+        if getattr(coro, "cr_running", False):
+            frames = []
+            frame = sys._current_frames().get(self.thread_id)
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            leaf = None
+        else:
+            frames = _awaited_frames(coro)
+            leaf = "<await>"
+        try:
+            frames = frames[frames.index(self.root) + 1:]
+        except ValueError:
+            return None
+        # the middleware starting or stopping the sampler, not the request
+        if any(frame.f_code in (RequestSampler.start.__code__, RequestSampler.stop.__code__) for frame in frames):
+            return None
+        stack = [_label(frame) for frame in frames]
+        if leaf is not None:
+            stack.append(leaf)
+        return stack
+
+    def sample(self):
+        stack = self._stack()
+        if stack:
+            self.samples[";".join(stack)] += 1
+
+    def _run(self):
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling the requests that carry a signed X-Profile header.
+    """
+
+    def __init__(self, app: ASGIApp, secret: str | None = None, interval: float = 0.001, directory: str = "logs/profiles"):
+        self.app = app
+        self.secret = secret
+        self.interval = interval
+        self.directory = Path(directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.secret:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+        if not verify(self.secret, scope["method"], scope["path"], value.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        report = f"{int(time.time())}-{uuid.uuid4().hex[:8]}.folded"
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REPORT_HEADER, report.encode("latin-1"))]
+            await send(message)
+
+        sampler = RequestSampler(asyncio.current_task(), threading.get_ident(), sys._getframe(), self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / report).write_text(sampler.folded(), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or not config.PROFILE_SECRET:
+        sys.exit("usage: PROFILE_SECRET=... python -m src.services.profiling METHOD PATH")
+    print(f"X-Profile: {sign(config.PROFILE_SECRET, sys.argv[1], sys.argv[2], int(time.time()) + 300)}")
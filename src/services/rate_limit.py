@@ -0,0 +1,266 @@
+"""
+Rate limiting shared by all the workers of a deployment, without a Redis round trip per request.
+
+The slowapi limiter keeps its decorator API (``@limiter.limit("5/minute")``) and uses the
+"two-tier" strategy with the ``twotier://`` storage defined here. Windows are fixed and
+aligned to the clock, so every worker counts the same window. Each worker admits
+requests from its local share of the window's budget:
+
+    allowance = ceil((limit - global count at the last reconciliation) / workers)
+
+and a background task reconciles every RATELIMIT_SYNC_INTERVAL seconds: one pipeline
+adds each key's local admissions to its Redis counter and reads back the global count.
+A worker admits at most one allowance per interval on a view that is at most one
+interval old, so a window can exceed its limit only by what the workers admitted on
+stale views: at most workers * ceil(limit / workers) requests, and fewer than the
+number of workers when their traffic is even. With one worker the limit is exact.
+When Redis is unreachable the counters live in the in-process fallback of the Redis
+service and each worker enforces the limit on its own.
+
+Limits are keyed per user, by the subject of a valid access token, and per client IP
+otherwise. The client IP is read from X-Forwarded-For only when the connection comes
+from one of TRUSTED_PROXIES, walking the header from the right past trusted hops.
+"""
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+from functools import lru_cache
+
+from fastapi import Request
+from jose import JWTError, jwt
+from limits import RateLimitItem
+from limits.storage import Storage
+from limits.strategies import STRATEGIES, RateLimiter
+from limits.util import WindowStats
+from redis.exceptions import RedisError
+
+from src.services.redis_client import get_redis
+
+from conf.config import config
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+
+
+@lru_cache
+def trusted_networks() -> tuple:
+    return tuple(ipaddress.ip_network(network, strict=False) for network in config.TRUSTED_PROXIES)
+
+
+def is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_networks())
+
+
+def client_ip(request: Request) -> str:
+    """
+    The client_ip function returns the address of the client that sent the request.
+        Behind trusted proxies it is the rightmost X-Forwarded-For entry that is not a trusted proxy,
+        since entries to its left were written by the client and can be forged.
+
+    :param request: Request: The incoming request
+    :return: The client IP address
+    :doc-author: Trelent
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not is_trusted(peer):
+        return peer
+    forwarded = [
+        address.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for address in header.split(",")
+        if address.strip()
+    ]
+    for address in reversed(forwarded):
+        if not is_trusted(address):
+            return address
+    return forwarded[0] if forwarded else peer
+
+
+def ip_key(request: Request) -> str:
+    return f"ip:{client_ip(request)}"
+
+
+def user_or_ip_key(request: Request) -> str:
+    """
+    The user_or_ip_key function keys a limit by the contact of a valid access token, or by client IP without one.
+        An authenticated user keeps one budget across addresses, and users behind one NAT do not share it.
+
+    :param request: Request: The incoming request
+    :return: The rate limit key
+    :doc-author: Trelent
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(token, config.SECRET_KEY_JWT, algorithms=[config.ALGORITHM])
+        except JWTError:
+            payload = {}
+        if payload.get("scope") == "access_token" and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    return ip_key(request)
+
+
+class Window:
+    __slots__ = ("start", "expiry", "known", "pending", "synced")
+
+    def __init__(self, start: int, expiry: int):
+        self.start = start
+        self.expiry = expiry
+        self.known = 0
+        self.pending = 0
+        self.synced = False
+
+
+class TwoTierStorage(Storage):
+    STORAGE_SCHEME = ["twotier"]
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions, **options)
+        self.workers = max(config.WEB_CONCURRENCY or 1, 1)
+        self.windows: dict[str, Window] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def base_exceptions(self):
+        return RedisError
+
+    def _window(self, key: str, expiry: int) -> Window:
+        start = int(time.time() // expiry * expiry)
+        window = self.windows.get(key)
+        if window is None or window.start != start:
+            window = self.windows[key] = Window(start, expiry)
+        return window
+
+    def allowance(self, key: str, amount: int, expiry: int) -> int:
+        """
+        The allowance function returns how many more requests this worker may admit in the current window.
+
+        :param self: Represent the instance of the class
+        :param key: str: The rate limit key
+        :param amount: int: The limit of the window
+        :param expiry: int: The length of the window in seconds
+        :return: The number of requests this worker may still admit before the next reconciliation
+        :doc-author: Trelent
+        """
+        window = self._window(key, expiry)
+        remaining = amount - window.known
+        share = math.ceil(remaining / self.workers) if remaining > 0 else 0
+        return share - window.pending
+
+    def acquire(self, key: str, amount: int, expiry: int, cost: int = 1) -> bool:
+        if self.allowance(key, amount, expiry) < cost:
+            return False
+        self.windows[key].pending += cost
+        return True
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        window = self._window(key, expiry)
+        window.pending += amount
+        return window.known + window.pending
+
+    def get(self, key: str) -> int:
+        window = self.windows.get(key)
+        if window is None or window.start + window.expiry <= time.time():
+            return 0
+        return window.known + window.pending
+
+    def get_expiry(self, key: str) -> int:
+        window = self.windows.get(key)
+        return window.start + window.expiry if window is not None else int(time.time())
+
+    def check(self) -> bool:
+        return True
+
+    def reset(self) -> int:
+        count = len(self.windows)
+        self.windows.clear()
+        return count
+
+    def clear(self, key: str):
+        self.windows.pop(key, None)
+
+    async def sync(self):
+        """
+        The sync function reconciles the local windows with the global counters in one pipeline.
+            Local admissions are added to the Redis counter of their window and the global count
+            read back becomes the base of the next allowance. Ended windows are dropped.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        now = time.time()
+        self.windows = {key: window for key, window in self.windows.items() if window.start + window.expiry > now}
+        if not self.windows:
+            return
+        flushed = []
+        async with get_redis().batch() as batch:
+            for key, window in self.windows.items():
+                redis_key = f"{KEY_PREFIX}{key}:{window.start}"
+                batch.incrby(redis_key, window.pending)
+                if not window.synced:
+                    batch.expire(redis_key, window.expiry + 1)
+                flushed.append(window)
+                window.pending = 0
+        totals = iter(batch.results)
+        for window in flushed:
+            window.known = int(next(totals))
+            if not window.synced:
+                next(totals)
+                window.synced = True
+
+    async def _reconcile(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Rate limit reconciliation failed")
+
+    def start(self):
+        """
+        The start function starts the reconciliation task; the lifespan calls it in every worker.
+            The number of workers is read here, after serve.py has set it.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.workers = max(config.WEB_CONCURRENCY or 1, 1)
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile(config.RATELIMIT_SYNC_INTERVAL))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.sync()
+
+
+class TwoTierRateLimiter(RateLimiter):
+    storage: TwoTierStorage
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self.storage.acquire(item.key_for(*identifiers), item.amount, item.get_expiry(), cost)
+
+    def test(self, item: RateLimitItem, *identifiers: str) -> bool:
+        return self.storage.allowance(item.key_for(*identifiers), item.amount, item.get_expiry()) > 0
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        key = item.key_for(*identifiers)
+        return WindowStats(self.storage.get_expiry(key), max(0, item.amount - self.storage.get(key)))
+
+
+STRATEGIES["two-tier"] = TwoTierRateLimiter
@@ -0,0 +1,466 @@
+"""
+The Redis client shared by the caches and limiters of a worker.
+
+All commands go through one connection pool of at most REDIS_MAX_CONNECTIONS
+connections. Multi-key work is sent in one round trip with mget or a batch:
+
+    async with get_redis().batch() as batch:
+        batch.delete("contact:1")
+        batch.incr("search:generation")
+
+Client-side caching: keys under REDIS_TRACKED_PREFIXES are kept in a small in-process
+cache after the first read, so hot keys such as the search generation cost no round
+trip. Redis tells the worker when another client changes them: a dedicated connection
+subscribes to __redis__:invalidate and a second one registers
+CLIENT TRACKING ON REDIRECT <id> BCAST for the prefixes, and every invalidation message
+evicts the keys it names. While that connection is down the local cache is not used.
+
+Fallback: when a command fails, Redis is considered down for REDIS_RETRY_INTERVAL
+seconds and commands run against an in-process store instead, so the caches keep
+working within the worker. Keys written during the outage are deleted, and counters
+incremented, in Redis when it is back, so no entry cached before the outage outlives
+a write made during it. Counters changed with incrby, the rate limit windows, are
+replayed with the amount added during the outage and the TTL last set on them, and are
+queued apart so that they cannot crowd out the deletes and increments the caches rely on.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Iterable, Sequence
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.services.metrics import REDIS_FALLBACK, REDIS_LOCAL_CACHE, instrument_redis
+
+from conf.config import config
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+MAX_PENDING = 10000
+
+
+class LocalStore:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        """
+        The lookup function returns whether a key is stored, and its value.
+            Unlike get it tells a stored None apart from a missing key.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key to look up
+        :return: A tuple of a found flag and the value
+        :doc-author: Trelent
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key: str) -> Any:
+        return self.lookup(key)[1]
+
+    def set(self, key: str, value: Any, ex: float | None = None):
+        ttl = self.ttl if ex is None else min(ex, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        value = int(self.get(key) or 0) + amount
+        self.set(key, str(value))
+        return value
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class Batch:
+    """
+    Commands collected to be sent in one pipeline. Reads in a batch bypass the client-side cache.
+    """
+
+    def __init__(self, service: "RedisService"):
+        self.service = service
+        self.commands: list[tuple[str, tuple, dict]] = []
+        self.results: list = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.execute()
+        return False
+
+    def get(self, key: str):
+        self.commands.append(("get", (key,), {}))
+
+    def set(self, key: str, value: Any, ex: int | None = None):
+        self.commands.append(("set", (key, value), {"ex": ex}))
+
+    def delete(self, *keys: str):
+        self.commands.append(("delete", keys, {}))
+
+    def incr(self, key: str):
+        self.commands.append(("incr", (key,), {}))
+
+    def incrby(self, key: str, amount: int):
+        self.commands.append(("incrby", (key, amount), {}))
+
+    def expire(self, key: str, seconds: int):
+        self.commands.append(("expire", (key, seconds), {}))
+
+    async def execute(self) -> list:
+        """
+        The execute function sends the collected commands in one non-transactional pipeline.
+
+        :param self: Represent the instance of the class
+        :return: The result of every command, in order
+        :doc-author: Trelent
+        """
+        if not self.commands:
+            return []
+        for name, args, _ in self.commands:
+            if name not in ("get", "expire"):
+                self.service.local.delete(*(args if name == "delete" else args[:1]))
+
+        async def remote():
+            async with self.service.client.pipeline(transaction=False) as pipe:
+                for name, args, kwargs in self.commands:
+                    getattr(pipe, name)(*args, **kwargs)
+                return await pipe.execute()
+
+        def local():
+            return [
+                getattr(self.service, f"_fallback_{name}")(*args, **kwargs)
+                for name, args, kwargs in self.commands
+            ]
+
+        self.results = await self.service._run(remote, local)
+        self.commands = []
+        return self.results
+
+
+class RedisService:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db: int = 0,
+        max_connections: int = 50,
+        socket_timeout: float = 1.0,
+        retry_interval: float = 5.0,
+        tracked_prefixes: Iterable[str] = (),
+        local_size: int = 10000,
+        local_ttl: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.retry_interval = retry_interval
+        self.tracked_prefixes = tuple(tracked_prefixes)
+        self.local = LocalStore(local_size, local_ttl)
+        self.fallback = LocalStore(local_size, local_ttl)
+        self.tracking = False
+        self._pool: redis.ConnectionPool | None = None
+        self._client: redis.Redis | None = None
+        self._down_until: float | None = None
+        self._pending_deletes: set[str] = set()
+        self._pending_incrs: set[str] = set()
+        self._pending_counters: dict[str, list[int | None]] = {}
+        self._invalidations = 0
+        self._listener: asyncio.Task | None = None
+
+    @property
+    def client(self) -> redis.Redis:
+        """
+        The client property returns the redis.asyncio client, creating the connection pool on first use.
+            Callers that need commands this class does not wrap can use it directly;
+            they get no fallback and handle RedisError themselves.
+
+        :param self: Represent the instance of the class
+        :return: The instrumented client
+        :doc-author: Trelent
+        """
+        if self._client is None:
+            self._pool = redis.ConnectionPool(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                max_connections=self.max_connections,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_timeout,
+                encoding="utf-8",
+                decode_responses=True,
+            )
+            self._client = instrument_redis(redis.Redis(connection_pool=self._pool))
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        return self._down_until is None
+
+    def _failed(self, err: Exception):
+        if self._down_until is None:
+            logger.warning("Redis is unavailable, using the in-process fallback: %s", err)
+            self.local.clear()
+            REDIS_FALLBACK.set(1)
+        self._down_until = time.monotonic() + self.retry_interval
+
+    async def _replay(self):
+        async with self.client.pipeline(transaction=False) as pipe:
+            if self._pending_deletes:
+                pipe.delete(*self._pending_deletes)
+            for key in self._pending_incrs:
+                pipe.incr(key)
+            for key, (amount, ttl) in self._pending_counters.items():
+                pipe.incrby(key, amount)
+                if ttl is not None:
+                    pipe.expire(key, ttl)
+            await pipe.execute()
+        self._pending_deletes.clear()
+        self._pending_incrs.clear()
+        self._pending_counters.clear()
+
+    async def _run(self, command: Callable[[], Awaitable], fallback: Callable[[], Any]):
+        """
+        The _run function runs a command against Redis, or against the fallback store while Redis is down.
+            After the retry interval the next command tries Redis again, first replaying the writes
+            made during the outage.
+
+        :param self: Represent the instance of the class
+        :param command: Callable: Send the command to Redis
+        :param fallback: Callable: Run the command on the fallback store
+        :return: The result of the command
+        :doc-author: Trelent
+        """
+        if self._down_until is not None:
+            if time.monotonic() < self._down_until:
+                return fallback()
+            try:
+                await self._replay()
+            except RedisError as err:
+                self._failed(err)
+                return fallback()
+            logger.warning("Redis is available again")
+            self._down_until = None
+            self.fallback.clear()
+            REDIS_FALLBACK.set(0)
+        try:
+            return await command()
+        except RedisError as err:
+            self._failed(err)
+            return fallback()
+
+    def _pending(self, keys: Iterable[str], pending: set[str]):
+        for key in keys:
+            if len(pending) < MAX_PENDING:
+                pending.add(key)
+            else:
+                logger.warning("Too many writes during the Redis outage, %s stays stale until it expires", key)
+
+    def _fallback_get(self, key: str):
+        return self.fallback.get(key)
+
+    def _fallback_set(self, key: str, value: Any, ex: int | None = None):
+        self._pending([key], self._pending_deletes)
+        self.fallback.set(key, value, ex)
+        return True
+
+    def _fallback_delete(self, *keys: str):
+        self._pending(keys, self._pending_deletes)
+        return self.fallback.delete(*keys)
+
+    def _fallback_incr(self, key: str):
+        self._pending([key], self._pending_incrs)
+        return self.fallback.incr(key)
+
+    def _fallback_incrby(self, key: str, amount: int):
+        counter = self._pending_counters.get(key)
+        if counter is not None:
+            counter[0] += amount
+        elif len(self._pending_counters) < MAX_PENDING:
+            self._pending_counters[key] = [amount, None]
+        else:
+            logger.warning("Too many counters during the Redis outage, %s is not added to Redis", key)
+        return self.fallback.incr(key, amount)
+
+    def _fallback_expire(self, key: str, seconds: int):
+        found, value = self.fallback.lookup(key)
+        if found:
+            self.fallback.set(key, value, seconds)
+            if key in self._pending_counters:
+                self._pending_counters[key][1] = seconds
+        return found
+
+    def _tracked(self, key: str) -> bool:
+        return self.tracking and key.startswith(self.tracked_prefixes)
+
+    async def mget(self, keys: Sequence[str]) -> list:
+        """
+        The mget function reads several keys in one round trip.
+            Tracked keys found in the client-side cache are not sent at all.
+
+        :param self: Represent the instance of the class
+        :param keys: Sequence[str]: The keys to read
+        :return: The values in the order of keys, None for missing keys
+        :doc-author: Trelent
+        """
+        values = {}
+        remote = []
+        for key in keys:
+            if self._tracked(key):
+                found, value = self.local.lookup(key)
+                REDIS_LOCAL_CACHE.labels("hit" if found else "miss").inc()
+                if found:
+                    values[key] = value
+                    continue
+            remote.append(key)
+        if remote:
+            invalidations = self._invalidations
+            fetched = await self._run(
+                lambda: self.client.mget(remote), lambda: [self.fallback.get(key) for key in remote]
+            )
+            # a value read before an invalidation arrived may already be stale
+            cacheable = self.available and invalidations == self._invalidations
+            for key, value in zip(remote, fetched):
+                values[key] = value
+                if cacheable and self._tracked(key):
+                    self.local.set(key, value)
+        return [values[key] for key in keys]
+
+    async def get(self, key: str) -> Any:
+        return (await self.mget([key]))[0]
+
+    async def set(self, key: str, value: Any, ex: int | None = None):
+        self.local.delete(key)
+        await self._run(lambda: self.client.set(key, value, ex=ex), lambda: self._fallback_set(key, value, ex))
+
+    async def delete(self, *keys: str) -> int:
+        self.local.delete(*keys)
+        return await self._run(lambda: self.client.delete(*keys), lambda: self._fallback_delete(*keys))
+
+    async def incr(self, key: str) -> int:
+        self.local.delete(key)
+        return await self._run(lambda: self.client.incr(key), lambda: self._fallback_incr(key))
+
+    def batch(self) -> Batch:
+        return Batch(self)
+
+    async def ping(self):
+        """
+        The ping function checks that Redis itself answers. It does not fall back, so health checks see outages.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        await self.client.ping()
+
+    async def _receive(self, listener):
+        pinged = False
+        while True:
+            message = await listener.read_response(timeout=max(self.retry_interval, 1.0))
+            if message is None:
+                if pinged:
+                    raise redis.ConnectionError("no answer from the invalidation connection")
+                await listener.send_command("PING")
+                pinged = True
+                continue
+            pinged = False
+            if message[0] == "message" and message[1] == INVALIDATE_CHANNEL:
+                self._invalidations += 1
+                if message[2] is None:
+                    self.local.clear()
+                else:
+                    self.local.delete(*message[2])
+
+    async def _listen(self):
+        while True:
+            listener = tracker = None
+            try:
+                pool = self.client.connection_pool
+                listener = pool.make_connection()
+                await listener.connect()
+                await listener.send_command("CLIENT", "ID")
+                client_id = await listener.read_response()
+                await listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+                await listener.read_response()
+                tracker = pool.make_connection()
+                await tracker.connect()
+                prefixes = [part for prefix in self.tracked_prefixes for part in ("PREFIX", prefix)]
+                await tracker.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes)
+                await tracker.read_response()
+                self.local.clear()
+                self.tracking = True
+                await self._receive(listener)
+            except (RedisError, OSError) as err:
+                logger.warning("Redis invalidation connection lost: %s", err)
+            finally:
+                self.tracking = False
+                self.local.clear()
+                for connection in (listener, tracker):
+                    if connection is not None:
+                        await connection.disconnect()
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        """
+        The start function starts the invalidation listener that enables the client-side cache.
+            Without tracked prefixes it does nothing and every read goes to Redis.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        if self.tracked_prefixes and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = self._pool = None
+
+
+@lru_cache
+def get_redis() -> RedisService:
+    return RedisService(
+        host=config.REDIS_DOMAIN,
+        port=config.REDIS_PORT,
+        db=config.REDIS_DB,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        retry_interval=config.REDIS_RETRY_INTERVAL,
+        tracked_prefixes=config.REDIS_TRACKED_PREFIXES,
+        local_size=config.REDIS_LOCAL_CACHE_SIZE,
+        local_ttl=config.REDIS_LOCAL_CACHE_TTL,
+    )
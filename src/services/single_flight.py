@@ -0,0 +1,163 @@
+"""
+Single-flight coalescing of identical concurrent repository reads.
+
+When several requests of a worker run the same read at the same time (the auth lookup
+of a popular token, the same contact page, the same search), only the first one queries
+the database; the others wait for its result. Every caller still gets objects bound
+to its own session: the rows of the first caller are copied into the session of each
+waiter as clean persistent objects, without a query, or the object already in that
+session is returned, as a query would.
+
+Writes publish on the invalidation bus after they commit, which calls SingleFlight.forget
+in this worker at once and in the other workers when the event arrives, so a read that
+starts after a commit never joins a flight that started before it.
+
+Coalescing shows in single_flight_calls_total{operation, result}, where result is
+"executed" for reads that ran the query and "coalesced" for reads that shared one.
+"""
+import asyncio
+import functools
+import inspect
+from typing import Any, Hashable
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.services.invalidation import bus
+from src.services.metrics import SINGLE_FLIGHT
+
+
+class Abandoned(Exception):
+    """
+    The first caller failed or was cancelled; waiters run the read themselves.
+    """
+
+
+class Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+
+
+def snapshot(result: Any) -> Any:
+    """
+    The snapshot function copies the loaded column values of ORM objects, in lists or alone.
+
+    :param result: Any: A mapped object, a list of them or None
+    :return: The same structure with (class, values) pairs in place of the objects
+    :doc-author: Trelent
+    """
+    if result is None:
+        return None
+    if isinstance(result, (list, tuple)):
+        return [snapshot(item) for item in result]
+    state = sa_inspect(result)
+    values = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+    return state.mapper.class_, values
+
+
+def restore(copy: Any, db: AsyncSession) -> Any:
+    """
+    The restore function turns a snapshot into objects of the given session without a query.
+
+    :param copy: Any: What snapshot returned
+    :param db: AsyncSession: The session of the waiting caller
+    :return: The result as if the caller had run the query in its session
+    :doc-author: Trelent
+    """
+    if copy is None:
+        return None
+    if isinstance(copy, list):
+        return [restore(item, db) for item in copy]
+    cls, values = copy
+    mapper = sa_inspect(cls)
+    identity = mapper.identity_key_from_primary_key(
+        [values[mapper.get_property_by_column(column).key] for column in mapper.primary_key]
+    )
+    existing = db.sync_session.identity_map.get(identity)
+    if existing is not None:
+        return existing
+    instance = mapper.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    db.add(instance)
+    return instance
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict[Hashable, Flight] = {}
+
+    def forget(self):
+        self._flights.clear()
+
+    async def run(self, operation: str, key: Hashable, db: AsyncSession, read):
+        """
+        The run function runs read, or waits for the identical read already in flight and shares its result.
+
+        :param self: Represent the instance of the class
+        :param operation: str: The name of the read, used in the metric and the key
+        :param key: Hashable: The arguments that make two reads identical
+        :param db: AsyncSession: The session of this caller
+        :param read: Callable: Run the query in the session of this caller
+        :return: The result of the read, bound to db
+        :doc-author: Trelent
+        """
+        flight_key = (operation, key)
+        while (flight := self._flights.get(flight_key)) is not None:
+            flight.waiters += 1
+            try:
+                # shielded: a waiter that is cancelled must not cancel the flight for the others
+                copy = await asyncio.shield(flight.future)
+            except Abandoned:
+                continue
+            SINGLE_FLIGHT.labels(operation, "coalesced").inc()
+            return restore(copy, db)
+
+        flight = self._flights[flight_key] = Flight()
+        try:
+            result = await read()
+        except BaseException:
+            flight.future.set_exception(Abandoned())
+            flight.future.exception()
+            raise
+        else:
+            flight.future.set_result(snapshot(result) if flight.waiters else None)
+        finally:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+        SINGLE_FLIGHT.labels(operation, "executed").inc()
+        return result
+
+    def coalesce(self, func):
+        """
+        The coalesce function decorates a repository read whose session argument is named db.
+            Reads with equal other arguments are coalesced.
+
+        :param self: Represent the instance of the class
+        :param func: The repository function
+        :return: The decorated function
+        :doc-author: Trelent
+        """
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            db = arguments.pop("db")
+            return await self.run(
+                func.__name__, tuple(arguments.values()), db, lambda: func(*bound.args, **bound.kwargs)
+            )
+
+        return wrapper
+
+
+flights = SingleFlight()
+bus.subscribe(lambda entity, entity_id: flights.forget())
@@ -0,0 +1,178 @@
+import abc
+import asyncio
+import os
+import re
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from conf.config import config
+
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+CACHE_FOREVER = "public, max-age=31536000, immutable"
+
+
+class AvatarStorage(abc.ABC):
+    """
+    Where processed avatars are kept. Avatars are addressed by the sha256 of the uploaded
+    image, so their urls never change content and can be cached forever.
+
+    The namespace names the place the avatars are kept in; a url remembered for one
+    storage is never handed out by another.
+    """
+
+    namespace: str
+
+    @abc.abstractmethod
+    async def save(self, digest: str, data: bytes) -> str:
+        """
+        The save function stores a processed avatar.
+
+        :param self: Represent the instance of the class
+        :param digest: str: The sha256 of the uploaded image
+        :param data: bytes: The processed JPEG avatar
+        :return: The url of the avatar
+        :doc-author: Trelent
+        """
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Avatars on Cloudinary. The blocking upload runs in a bounded thread pool, and at most
+    twice its number of workers uploads are waiting for it at any time.
+    """
+
+    def __init__(self, workers: int):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=config.CLOUD_NAME,
+            api_key=config.CLOUD_API_KEY,
+            api_secret=config.CLOUD_API_SECRET,
+        )
+        self.namespace = f"cloudinary:{config.CLOUD_NAME}"
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="avatar-upload"
+        )
+        self._slots: asyncio.Semaphore | None = None
+
+    @staticmethod
+    def _upload(data: bytes, public_id: str) -> str:
+        import cloudinary
+        import cloudinary.uploader
+
+        r = cloudinary.uploader.upload(data, public_id=public_id, overwrite=True)
+        return cloudinary.CloudinaryImage(public_id).build_url(version=r.get("version"))
+
+    async def save(self, digest: str, data: bytes) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(2 * self.workers)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._upload, data, f"NotesApp/avatars/{digest}"
+            )
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Avatars on the local filesystem, served by the /api/avatars route.
+
+    The processed avatar is written once as <root>/<digest>.jpg. Thumbnails in
+    AVATAR_THUMBNAIL_SIZES are made from it on their first request and kept as
+    <root>/<size>/<digest>.jpg. The files are on this node only, so the namespace
+    includes the host name.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        executor: ThreadPoolExecutor,
+        url_prefix: str = "/api/avatars",
+    ):
+        self.root = Path(root)
+        self.executor = executor
+        self.url_prefix = url_prefix
+        self.namespace = f"local:{socket.gethostname()}:{self.root.resolve()}"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+
+    def _thumbnail(self, source: Path, target: Path, size: int):
+        with Image.open(source) as image:
+            image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=target.parent, suffix=".jpg", delete=False) as tmp:
+            image.save(tmp, format="JPEG", quality=85)
+        os.replace(tmp.name, target)
+
+    async def save(self, digest: str, data: bytes) -> str:
+        path = self.root / f"{digest}.jpg"
+        if not path.exists():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._write, path, data)
+        return f"{self.url_prefix}/{digest}.jpg"
+
+    async def path_for(self, digest: str, size: int | None = None) -> Path | None:
+        """
+        The path_for function returns the file to serve for an avatar, making the thumbnail on first request.
+
+        :param self: Represent the instance of the class
+        :param digest: str: The sha256 of the uploaded image
+        :param size: int | None: The thumbnail size, None for the full avatar
+        :return: The path of the file, or None if there is no such avatar
+        :doc-author: Trelent
+        """
+        source = self.root / f"{digest}.jpg"
+        if not DIGEST.match(digest) or not source.exists():
+            return None
+        if size is None or size == config.AVATAR_SIZE:
+            return source
+        target = self.root / str(size) / f"{digest}.jpg"
+        if not target.exists():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._thumbnail, source, target, size)
+        return target
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    A FileResponse that lets the server send the file itself when it supports the ASGI
+    ``http.response.pathsend`` or ``http.response.zerocopysend`` extensions (sendfile),
+    and streams it in chunks like FileResponse otherwise.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions") or {}
+        if self.send_header_only or not (
+            "http.response.pathsend" in extensions
+            or "http.response.zerocopysend" in extensions
+        ):
+            await super().__call__(scope, receive, send)
+            return
+        if self.stat_result is None:
+            self.set_stat_headers(os.stat(self.path))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file})
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,126 @@
+"""
+Startup warm-up of a worker.
+
+Without it the first requests on a fresh worker pay for opening database and Redis
+connections, compiling the SQL of every repository query, building pydantic serializers
+and loading the bcrypt backend. The lifespan runs warm_up in the background right after
+startup; the readiness probe reports the worker as not ready until it has finished, so
+the orchestrator only routes traffic to warm workers.
+
+The first request to each route records its latency in
+http_first_request_duration_seconds, labelled with whether warm-up had finished.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import date
+
+from pydantic import TypeAdapter
+from sqlalchemy import text
+
+from src.database.db import sessionmanager
+from src.database.models import Contact, OwnedContact
+from src.repository import contacts as repository_contacts
+from src.repository import owned_contacts as repository_owned_contacts
+from src.schemas import ContactResponse, OwnedContactResponse
+from src.services.auth import auth_service
+from src.services.metrics import WARMUP_DURATION
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+WARMUP_EMAIL = "warmup@example.com"
+
+
+class WarmupState:
+    def __init__(self):
+        self.done = False
+        self.duration: float | None = None
+        self.error: str | None = None
+
+
+warmup_state = WarmupState()
+
+
+async def warm_pool(connections: int):
+    """
+    The warm_pool function opens connections database connections at once and returns them to the pool.
+
+    :param connections: int: How many connections to open, at most the pool size
+    :return: None
+    :doc-author: Trelent
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        opened = await asyncio.gather(
+            *(stack.enter_async_context(sessionmanager.engine.connect()) for _ in range(connections))
+        )
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in opened))
+
+
+async def warm_redis():
+    await get_redis().ping()
+
+
+async def warm_statements():
+    """
+    The warm_statements function runs every hot repository query once with parameters that match nothing,
+        which fills the engine's compiled statement cache. A failing query is raised to warm_up.
+
+    :return: None
+    :doc-author: Trelent
+    """
+    async with sessionmanager.session(raise_errors=True) as db:
+        await repository_contacts.get_contact_by_email(WARMUP_EMAIL, db)
+        await repository_contacts.get_contact_by_phone("0000000000", db)
+        await repository_owned_contacts.get_contacts(0, 0, 1, db)
+        await repository_owned_contacts.get_contact(0, 0, db)
+        await repository_owned_contacts.get_contacts_by_ids(0, [0], db)
+        await repository_owned_contacts.search_contacts(0, WARMUP_EMAIL, 0, 1, db)
+        await repository_owned_contacts.search_contacts(0, "warmup 000", 0, 1, db)
+        await repository_owned_contacts.search_contacts_coming_birthday(0, 0, 1, db)
+
+
+def warm_serialization():
+    contact = Contact(
+        id=0, name="warmup", email=WARMUP_EMAIL, phone="0000000000", birthday=date.today(), avatar=None
+    )
+    ContactResponse.model_validate(contact).model_dump_json()
+    TypeAdapter(list[ContactResponse]).dump_json([ContactResponse.model_validate(contact)])
+    entry = OwnedContact(id=0, owner_id=0, name="warmup", email=WARMUP_EMAIL, phone="0000000000", birthday=date.today())
+    TypeAdapter(list[OwnedContactResponse]).dump_json([OwnedContactResponse.model_validate(entry)])
+
+
+async def warm_auth():
+    auth_service.pwd_context.handler("bcrypt").get_backend()
+    token = await auth_service.create_access_token(data={"sub": WARMUP_EMAIL})
+    await auth_service.get_email_from_token(auth_service.create_email_token({"sub": WARMUP_EMAIL}))
+    return token
+
+
+async def warm_up(connections: int) -> float:
+    """
+    The warm_up function prepares the worker for traffic and marks it ready.
+        Each step runs even if an earlier one failed; failures are logged and do not keep
+        the worker out of rotation forever: the worker is marked ready either way, and the
+        readiness probes of the dependencies still report what is actually down.
+
+    :param connections: int: How many database connections to pre-open
+    :return: The duration of the warm-up in seconds
+    :doc-author: Trelent
+    """
+    started = time.perf_counter()
+    errors = []
+    for step in (lambda: warm_pool(connections), warm_redis, warm_statements, warm_serialization, warm_auth):
+        try:
+            result = step()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as err:
+            errors.append(str(err) or type(err).__name__)
+            logger.warning("Warm-up step failed: %s", errors[-1])
+    warmup_state.error = "; ".join(errors) or None
+    warmup_state.duration = time.perf_counter() - started
+    warmup_state.done = True
+    WARMUP_DURATION.set(warmup_state.duration)
+    return warmup_state.duration
@@ -1,6 +1,11 @@
 import asyncio
+import json
+import threading
 
 from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cloudinary
 
 import pytest
 import pytest_asyncio
@@ -98,3 +103,41 @@ def client():
 async def get_token():
     token = await auth_service.create_access_token(data={"sub": test_contact1["email"]})
     return token
+
+
+@pytest_asyncio.fixture()
+async def get_token2():
+    token = await auth_service.create_access_token(data={"sub": test_contact2["email"]})
+    return token
+
+
+@pytest.fixture()
+def image_host():
+    """
+    A local stand-in for the Cloudinary upload API. Uploads are recorded
+    and answered with a minimal upload response.
+    """
+    uploads = []
+
+    class UploadHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            uploads.append({"path": self.path, "body": body})
+            response = json.dumps({"version": len(uploads), "public_id": "NotesApp/test"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UploadHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    upload_prefix = cloudinary.config().upload_prefix
+    cloudinary.config(upload_prefix=f"http://127.0.0.1:{server.server_port}")
+    yield uploads
+    cloudinary.config(upload_prefix=upload_prefix)
+    server.shutdown()
@@ -1,10 +1,11 @@
 from datetime import date
-from unittest.mock import Mock
+from unittest.mock import AsyncMock
 
 import pytest
 from sqlalchemy import select
 
-from src.database.models import Contact
+from src.database.models import Contact, EmailOutbox
+from src.repository import contacts as repository_contacts
 from tests.conftest import TestingSessionLocal
 from conf import messages
 
@@ -24,9 +25,7 @@ contact_data2 = {
     "password": "12345678",
 }
 
-def test_signup(client, monkeypatch):
-    mock_send_email = Mock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_signup(client):
     response = client.post("api/auth/signup", json=contact_data)
     assert response.status_code == 201, response.text
     data = response.json()
@@ -37,15 +36,56 @@ def test_signup(client, monkeypatch):
     assert "password" not in data
 
 
-def test_repeat_signup(client, monkeypatch):
-    mock_send_email = Mock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+@pytest.mark.asyncio
+async def test_signup_enqueues_email(client):
+    async with TestingSessionLocal() as session:
+        outbox = await session.execute(
+            select(EmailOutbox).where(EmailOutbox.email == contact_data.get("email"))
+        )
+        outbox = outbox.scalars().all()
+    assert len(outbox) == 1
+    assert outbox[0].status == "pending"
+    assert outbox[0].username == contact_data["name"]
+
+
+def test_request_email(client):
+    response = client.post(
+        "api/auth/request_email", json={"email": contact_data.get("email")}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == messages.CHECK_EMAIL
+
+
+@pytest.mark.asyncio
+async def test_signup_phone_taken_concurrently(client, monkeypatch):
+    # the phone check passes, as it would for two concurrent signups; the unique index still refuses
+    monkeypatch.setattr(repository_contacts, "get_contact_by_phone", AsyncMock(return_value=None))
+    body = {**contact_data2, "phone": "+380674444444"}
+    response = client.post("api/auth/signup", json=body)
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"] == messages.PHONE_EXIST
+    async with TestingSessionLocal() as session:
+        outbox = await session.execute(select(EmailOutbox).where(EmailOutbox.email == body["email"]))
+        assert outbox.scalars().all() == []
+
+
+def test_repeat_signup(client):
     response = client.post("api/auth/signup", json=contact_data)
     assert response.status_code == 409, response.text
     data = response.json()
     assert data["detail"] == messages.ACCOUNT_EXIST
 
 
+def test_repeat_phone_signup(client):
+    response = client.post(
+        "api/auth/signup",
+        json={**contact_data2, "email": "test3email@ukr.net", "phone": "+380674444444"},
+    )
+    assert response.status_code == 409, response.text
+    data = response.json()
+    assert data["detail"] == messages.PHONE_EXIST
+
+
 def test_not_confirmed_login(client):
     response = client.post(
         "api/auth/login",
@@ -113,9 +153,7 @@ def test_validation_error_login(client):
     assert "detail" in data
 
 
-def test_signup2(client, monkeypatch):
-    mock_send_email = Mock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_signup2(client):
     response = client.post("api/auth/signup", json=contact_data2)
     assert response.status_code == 201, response.text
     data = response.json()
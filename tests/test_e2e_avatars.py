@@ -0,0 +1,75 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.services.avatar import get_storage
+from conf import messages
+from conf.config import config
+
+
+@pytest.fixture()
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "AVATAR_STORAGE", "local")
+    monkeypatch.setattr(config, "AVATAR_LOCAL_DIR", str(tmp_path))
+    get_storage.cache_clear()
+    yield tmp_path
+    get_storage.cache_clear()
+
+
+def avatar_image(color="blue"):
+    out = BytesIO()
+    Image.new("RGB", (400, 300), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_upload_and_serve_avatar(client, get_token, local_storage):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    files = {"file": ("avatar.png", avatar_image(), "image/png")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 200, response.text
+    avatar_url = response.json()["avatar"]
+    assert avatar_url.startswith("/api/avatars/")
+
+    response = client.get(avatar_url)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    assert Image.open(BytesIO(response.content)).size == (250, 250)
+
+
+def test_serve_thumbnail(client, get_token, local_storage):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    files = {"file": ("avatar.png", avatar_image("green"), "image/png")}
+    avatar_url = client.patch("api/contacts/avatar", files=files, headers=headers).json()["avatar"]
+    digest = avatar_url.rsplit("/", 1)[1].removesuffix(".jpg")
+    assert not (local_storage / "64" / f"{digest}.jpg").exists()
+
+    response = client.get(avatar_url, params={"size": 64})
+    assert response.status_code == 200, response.text
+    assert Image.open(BytesIO(response.content)).size == (64, 64)
+    assert (local_storage / "64" / f"{digest}.jpg").exists()
+
+
+def test_wrong_avatar(client, local_storage):
+    response = client.get(f"api/avatars/{'0' * 64}.jpg")
+    assert response.status_code == 404, response.text
+    assert response.json()["detail"] == messages.AVATAR_NOT_FOUND
+    response = client.get(f"api/avatars/{'0' * 64}.jpg", params={"size": 999})
+    assert response.status_code == 404, response.text
+
+
+def test_known_image_is_saved_to_a_new_storage(client, get_token, local_storage, monkeypatch):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    for color in ("red", "yellow"):
+        files = {"file": ("avatar.png", avatar_image(color), "image/png")}
+        assert client.patch("api/contacts/avatar", files=files, headers=headers).status_code == 200
+    other = local_storage / "other-node"
+    monkeypatch.setattr(config, "AVATAR_LOCAL_DIR", str(other))
+    get_storage.cache_clear()
+
+    files = {"file": ("avatar.png", avatar_image("red"), "image/png")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 200, response.text
+    digest = response.json()["avatar"].rsplit("/", 1)[1]
+    assert (other / digest).exists()
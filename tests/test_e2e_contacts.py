@@ -1,10 +1,48 @@
+from io import BytesIO
+from unittest.mock import AsyncMock
+
+from PIL import Image
+
+from src.repository import contacts as repository_contacts
+from src.services import avatar
+
+from conf import messages
+from conf.config import config
+
+
+owned_contact1 = {
+    "name": "Owned Name",
+    "email": "owned1@ukr.net",
+    "phone": "0674444443",
+    "birthday": "1990-05-05",
+}
+
+owned_contact2 = {
+    "name": "Other Name",
+    "email": "owned2@ukr.net",
+    "phone": "+380674444444",
+    "birthday": "1985-06-06",
+}
+
+
+def test_create_contact(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    for body in (owned_contact1, owned_contact2):
+        response = client.post("api/contacts/", json=body, headers=headers)
+        assert response.status_code == 201, response.text
+        data = response.json()
+        assert data["name"] == body["name"]
+        assert data["email"] == body["email"]
+
+
 def test_get_contacts(client, get_token):
     tocken = get_token
     headers = {"Authorization": f"Bearer {tocken}"}
     response = client.get("api/contacts", headers=headers)
     assert response.status_code == 200, response.text
     data = response.json()
-    assert len(data) == 2
+    assert [contact["name"] for contact in data] == ["Owned Name", "Other Name"]
 
 
 def test_get_contact(client, get_token):
@@ -29,6 +67,26 @@ def test_get_wrong_contact(client, get_token):
     assert response.status_code == 404, response.text
 
 
+def test_get_contact_of_other_owner(client, get_token, get_token2):
+    headers = {"Authorization": f"Bearer {get_token2}"}
+    response = client.get("api/contacts/1", headers=headers)
+    assert response.status_code == 404, response.text
+    response = client.get("api/contacts/search/067444", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+
+def test_update_owned_contact(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {**owned_contact1, "name": "Owned Renamed"}
+    response = client.put("api/contacts/1", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == "Owned Renamed"
+    response = client.put("api/contacts/3", json=body, headers=headers)
+    assert response.status_code == 404, response.text
+
+
 def test_update_contact(client, get_token):
     token = get_token
     headers = {"Authorization": f"Bearer {token}"}
@@ -45,6 +103,16 @@ def test_update_contact(client, get_token):
     assert updated_contact["birthday"] == update_data["birthday"]
 
 
+def test_update_contact_phone_taken_concurrently(client, get_token, monkeypatch):
+    # the phone check passes, as it would for two concurrent updates; the unique index still refuses
+    monkeypatch.setattr(repository_contacts, "get_contact_by_phone", AsyncMock(return_value=None))
+    headers = {"Authorization": f"Bearer {get_token}"}
+    update_data = {"name": "Updated Name", "phone": "+380674444442", "birthday": "1990-01-01"}
+    response = client.put("api/contacts/", json=update_data, headers=headers)
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"] == messages.PHONE_EXIST
+
+
 def test_search_contact(client, get_token):
     tocken = get_token
     headers = {"Authorization": f"Bearer {tocken}"}
@@ -55,6 +123,115 @@ def test_search_contact(client, get_token):
     assert len(data) == 2
 
 
+def test_search_contact_formatted_phone(client, get_token):
+    tocken = get_token
+    headers = {"Authorization": f"Bearer {tocken}"}
+    field_search = "+38 067 444"
+    response = client.get(f"api/contacts/search/{field_search}", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 2
+
+
+def avatar_image(color="red"):
+    image = Image.new("RGB", (600, 400), color)
+    exif = Image.Exif()
+    exif[0x010F] = "Test Camera"
+    out = BytesIO()
+    image.save(out, format="JPEG", exif=exif)
+    return out.getvalue()
+
+
+def uploaded_image(upload):
+    body = upload["body"]
+    return Image.open(BytesIO(body[body.index(b"\xff\xd8"):]))
+
+
+def test_update_avatar(client, get_token, image_host):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    files = {"file": ("avatar.jpg", avatar_image(), "image/jpeg")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(image_host) == 1
+    assert image_host[0]["path"].endswith("/image/upload")
+    image = uploaded_image(image_host[0])
+    assert image.size == (250, 250)
+    assert not image.getexif()
+    data = response.json()
+    assert "NotesApp/avatars/" in data["avatar"]
+
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["avatar"] == data["avatar"]
+    assert len(image_host) == 1
+
+
+def test_update_avatar_invalid_image(client, get_token, image_host):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    files = {"file": ("avatar.png", b"\x89PNG avatar bytes", "image/png")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == messages.INVALID_IMAGE
+    assert image_host == []
+
+
+def test_update_avatar_too_large(client, get_token, image_host, monkeypatch):
+    monkeypatch.setattr(config, "AVATAR_MAX_BYTES", 8)
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    files = {"file": ("avatar.png", b"\x89PNG avatar bytes", "image/png")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 413, response.text
+    assert response.json()["detail"] == messages.FILE_TOO_LARGE
+    assert image_host == []
+
+
+def test_update_avatar_too_large_is_refused_before_reading(client, get_token, image_host, monkeypatch):
+    monkeypatch.setattr(config, "AVATAR_MAX_BYTES", 8)
+    monkeypatch.setattr(avatar, "spool_upload", None)
+    headers = {"Authorization": f"Bearer {get_token}"}
+    files = {"file": ("avatar.png", b"\x89PNG" + bytes(avatar.MULTIPART_OVERHEAD), "image/png")}
+    response = client.patch("api/contacts/avatar", files=files, headers=headers)
+    assert response.status_code == 413, response.text
+    assert response.json()["detail"] == messages.FILE_TOO_LARGE
+
+
+def test_update_avatar_too_large_without_content_length(client, get_token, image_host, monkeypatch):
+    monkeypatch.setattr(config, "AVATAR_MAX_BYTES", 8)
+    monkeypatch.setattr(avatar, "spool_upload", None)
+    headers = {
+        "Authorization": f"Bearer {get_token}",
+        "Content-Type": "multipart/form-data; boundary=limit",
+    }
+    body = (
+        b'--limit\r\nContent-Disposition: form-data; name="file"; filename="avatar.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + bytes(avatar.MULTIPART_OVERHEAD) + b"\r\n--limit--\r\n"
+    )
+
+    def chunks():
+        for start in range(0, len(body), avatar.CHUNK_SIZE):
+            yield body[start:start + avatar.CHUNK_SIZE]
+
+    response = client.patch("api/contacts/avatar", content=chunks(), headers=headers)
+    assert response.status_code == 413, response.text
+    assert response.json()["detail"] == messages.FILE_TOO_LARGE
+
+
+def test_delete_owned_contact(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.delete("api/contacts/2", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == 2
+    response = client.get("api/contacts/2", headers=headers)
+    assert response.status_code == 404, response.text
+    response = client.get("api/contacts/search/067444", headers=headers)
+    assert response.status_code == 200, response.text
+    assert [contact["id"] for contact in response.json()] == [1]
+
+
 def test_delete_contact(client, get_token):
     token = get_token
     headers = {"Authorization": f"Bearer {token}"}
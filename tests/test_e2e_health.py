@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.database.db import sessionmanager
+from src.services.health import HealthProber, ProbeFailed, get_health_prober, probe_db_pool
+
+from conf.config import get_settings
+
+
+def test_liveness(client):
+    response = client.get("api/health/live")
+    assert response.status_code == 200, response.text
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.fixture()
+def probes(monkeypatch):
+    """
+    Replaces every readiness probe with one answering its own name, and drops cached results.
+    """
+    prober = get_health_prober()
+
+    def stub(name):
+        async def probe():
+            return name
+
+        return probe
+
+    for name in list(prober.probes):
+        monkeypatch.setitem(prober.probes, name, stub(name))
+    monkeypatch.setattr(prober, "checked_at", None)
+    yield prober.probes
+    prober.checked_at = None
+
+
+def test_readiness(client, probes):
+    response = client.get("api/health/ready")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["ready"] is True
+    assert set(data["checks"]) == {"database", "redis", "db_pool", "mail_outbox", "warmup"}
+    for name, check in data["checks"].items():
+        assert check["ok"] is True
+        assert check["detail"] == name
+        assert check["latency_ms"] >= 0
+
+
+def test_readiness_failed_check(client, probes):
+    async def probe_redis():
+        raise ProbeFailed("connection refused")
+
+    probes["redis"] = probe_redis
+    response = client.get("api/health/ready")
+    assert response.status_code == 503, response.text
+    data = response.json()
+    assert data["ready"] is False
+    assert data["checks"]["redis"]["ok"] is False
+    assert data["checks"]["redis"]["detail"] == "connection refused"
+    assert data["checks"]["database"]["ok"] is True
+
+
+def test_outbox_backlog_does_not_fail_readiness(client, probes):
+    async def probe_mail_outbox():
+        raise ProbeFailed("3 due, oldest queued at 2024-01-01T00:00:00")
+
+    probes["mail_outbox"] = probe_mail_outbox
+    response = client.get("api/health/ready")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["ready"] is True
+    assert data["checks"]["mail_outbox"]["ok"] is False
+
+
+class TestHealthProber(unittest.IsolatedAsyncioTestCase):
+
+    async def test_probe_db_pool(self):
+        pool = MagicMock(spec=["size", "checkedout"])
+        pool.size.return_value = 5
+        engine = MagicMock(pool=pool)
+        with patch.object(sessionmanager, "_engine", engine), patch.object(get_settings(), "DB_MAX_OVERFLOW", 5):
+            pool.checkedout.return_value = 2
+            self.assertEqual(await probe_db_pool(), "2/10 connections checked out")
+            pool.checkedout.return_value = 10
+            with self.assertRaises(ProbeFailed):
+                await probe_db_pool()
+
+    async def test_snapshot_caches_results(self):
+        calls = []
+
+        async def probe_ok():
+            calls.append("ok")
+            return "fine"
+
+        async def probe_failed():
+            raise ProbeFailed("down")
+
+        async def probe_slow():
+            await asyncio.sleep(1)
+
+        prober = HealthProber(
+            {"ok": probe_ok, "failed": probe_failed, "slow": probe_slow},
+            interval=60,
+            timeout=0.01,
+        )
+        report = await prober.snapshot()
+        self.assertFalse(report["ready"])
+        self.assertEqual(report["checks"]["ok"]["detail"], "fine")
+        self.assertEqual(report["checks"]["failed"]["detail"], "down")
+        self.assertIn("timed out", report["checks"]["slow"]["detail"])
+
+        await prober.snapshot()
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.metrics import instrument_engine
+
+
+def test_metrics(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    client.get("api/contacts/1", headers=headers)
+    response = client.get("metrics")
+    assert response.status_code == 200, response.text
+    assert 'http_requests_total{method="GET",route="/api/contacts/{contact_id}",status="200"}' in response.text
+    assert 'auth_operation_duration_seconds_count{operation="jwt_decode"}' in response.text
+    assert "http_requests_in_flight" in response.text
+
+
+@pytest.mark.asyncio
+async def test_instrument_engine(client):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    await engine.dispose()
+    response = client.get("metrics")
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_instrument_engine_failed_statement(client):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    async with engine.connect() as conn:
+        with pytest.raises(Exception):
+            await conn.execute(text("SELECT * FROM missing_table"))
+        await conn.execute(text("SELECT 1"))
+        assert "query_started" not in conn.sync_connection.info
+    await engine.dispose()
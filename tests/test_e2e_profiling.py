@@ -0,0 +1,58 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.services.profiling import ProfilerMiddleware, RequestSampler, _label, sign, verify
+
+
+def test_verify():
+    expires = int(time.time()) + 60
+    value = sign("secret", "GET", "/api/contacts", expires)
+    assert verify("secret", "get", "/api/contacts", value)
+    assert not verify("other", "GET", "/api/contacts", value)
+    assert not verify("secret", "GET", "/api/contacts/1", value)
+    assert not verify("secret", "GET", "/api/contacts", sign("secret", "GET", "/api/contacts", int(time.time()) - 1))
+
+
+def test_label_without_co_qualname():
+    class Service:
+        pass
+
+    globals_ = {"__name__": "src.services.example"}
+    method = SimpleNamespace(f_code=SimpleNamespace(co_name="run"), f_globals=globals_, f_locals={"self": Service()})
+    function = SimpleNamespace(f_code=SimpleNamespace(co_name="helper"), f_globals=globals_, f_locals={})
+    assert _label(method).endswith(":test_label_without_co_qualname.<locals>.Service.run")
+    assert _label(function) == "src.services.example:helper"
+
+
+def test_sample_while_stopping_is_dropped():
+    task = SimpleNamespace(get_coro=lambda: SimpleNamespace(cr_running=True))
+    sampler = RequestSampler(task, threading.get_ident(), sys._getframe(), 0.001)
+    stacks = []
+    # a sample taken while the middleware waits for the sampler thread to finish
+    sampler._thread = SimpleNamespace(join=lambda: stacks.append(sampler._stack()))
+    sampler.stop()
+    assert stacks == [None]
+
+
+def test_profiled_request(client, get_token, tmp_path):
+    profiled = TestClient(ProfilerMiddleware(app, secret="secret", interval=0.0005, directory=str(tmp_path)))
+    headers = {"Authorization": f"Bearer {get_token}"}
+
+    response = profiled.get("api/contacts/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert "x-profile-report" not in response.headers
+
+    headers["X-Profile"] = sign("secret", "GET", "/api/contacts/", int(time.time()) + 60)
+    response = profiled.get("api/contacts/", headers=headers)
+    assert response.status_code == 200, response.text
+    report = tmp_path / response.headers["x-profile-report"]
+    lines = report.read_text().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert all(line.startswith("fastapi.applications:FastAPI.__call__;") for line in lines)
+    assert all("RequestSampler" not in line for line in lines)
@@ -0,0 +1,58 @@
+import pytest
+
+from src.services import warmup
+from src.services.health import probe_warmup, ProbeFailed
+
+
+@pytest.fixture()
+def fresh_state(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "warmup_state", state)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_warm_up_marks_ready(client, fresh_state, monkeypatch):
+    async def no_redis():
+        pass
+
+    # there is no Redis server in the test environment
+    monkeypatch.setattr(warmup, "warm_redis", no_redis)
+    with pytest.raises(ProbeFailed):
+        await probe_warmup()
+
+    duration = await warmup.warm_up(connections=2)
+
+    assert fresh_state.done
+    assert fresh_state.error is None
+    assert duration > 0
+    assert "warmed up" in await probe_warmup()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failure_still_marks_ready(client, fresh_state, monkeypatch):
+    async def broken():
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(warmup, "warm_statements", broken)
+    await warmup.warm_up(connections=1)
+    assert fresh_state.done
+    assert "database is down" in await probe_warmup()
+
+
+@pytest.mark.asyncio
+async def test_failed_statement_is_reported(client, fresh_state, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("no such table: contacts")
+
+    monkeypatch.setattr(warmup, "warm_redis", lambda: None)
+    monkeypatch.setattr(warmup.repository_contacts, "get_contact_by_phone", broken)
+    await warmup.warm_up(connections=1)
+    assert fresh_state.done
+    assert "no such table: contacts" in await probe_warmup()
+
+
+def test_first_request_metric(client):
+    client.get("api/health/live")
+    response = client.get("metrics")
+    assert 'http_first_request_duration_seconds_count{route="/api/health/live",warmed=' in response.text
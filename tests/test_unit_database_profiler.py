@@ -0,0 +1,92 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.profiler import SlowQueryLog, current_scope, normalize_statement
+
+
+class TestNormalizeStatement(unittest.TestCase):
+
+    def test_literals_and_parameters(self):
+        self.assertEqual(
+            normalize_statement("SELECT * FROM contacts\n WHERE id = 5 AND name = 'O''Neil' AND email = $1"),
+            "SELECT * FROM contacts WHERE id = ? AND name = ? AND email = ?",
+        )
+
+    def test_in_lists_share_a_fingerprint(self):
+        self.assertEqual(
+            normalize_statement("SELECT id FROM contacts WHERE id IN (?, ?, ?)"),
+            normalize_statement("SELECT id FROM contacts WHERE id IN (%(id_1)s)"),
+        )
+
+    def test_casts_are_kept(self):
+        self.assertEqual(normalize_statement("SELECT :name::text"), "SELECT ?::text")
+
+
+class TestSlowQueryLog(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.log = SlowQueryLog(threshold_ms=0)
+        self.log.install(self.engine)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_aggregates_by_fingerprint(self):
+        async with self.engine.connect() as conn:
+            for value in (1, 2, 3):
+                await conn.execute(text(f"SELECT {value}"))
+        report = self.log.report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]["statement"], "SELECT ?")
+        self.assertEqual(report[0]["count"], 3)
+        self.assertIsNone(report[0]["plan"])
+
+    async def test_records_route(self):
+        class Route:
+            path = "/api/contacts/{contact_id}"
+
+        token = current_scope.set({"method": "GET", "path": "/api/contacts/1", "route": Route()})
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT :id"), {"id": 1})
+        finally:
+            current_scope.reset(token)
+        self.assertEqual(self.log.report()[0]["routes"], {"GET /api/contacts/{contact_id}": 1})
+
+    async def test_parameters_are_not_kept(self):
+        with self.assertLogs("slow_queries", "INFO") as logs:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT :token"), {"token": "secret-refresh-token"})
+        self.assertNotIn("secret-refresh-token", "".join(logs.output))
+        self.assertNotIn("secret-refresh-token", repr(self.log.report()))
+
+    async def test_failed_statements_leave_no_timing(self):
+        async with self.engine.connect() as conn:
+            with self.assertRaises(Exception):
+                await conn.execute(text("SELECT * FROM missing_table"))
+            await conn.execute(text("SELECT 1"))
+            self.assertNotIn("profiler_started", conn.sync_connection.info)
+        self.assertEqual(self.log.report()[0]["statement"], "SELECT ?")
+
+    async def test_explain_runs_apart_from_the_request(self):
+        self.log.explain_dialects = ("sqlite",)
+        self.log.explain_sample_rate = 1.0
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            explaining = self.log._explaining
+            # SQLite has no EXPLAIN (ANALYZE, BUFFERS); the failure stays on the EXPLAIN connection
+            await explaining
+            self.assertEqual((await conn.execute(text("SELECT 2"))).scalar(), 2)
+        await self.log._explaining
+        report = self.log.report()
+        self.assertEqual(len(report), 1)
+        self.assertTrue(report[0]["plan"].startswith("EXPLAIN failed"))
+
+    async def test_threshold(self):
+        self.log.threshold_ms = 60_000
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        self.assertEqual(self.log.report(), [])
@@ -5,12 +5,11 @@ from datetime import date
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Contact
+from src.database.models import Contact, normalize_phone
 from src.schemas import ContactSchema, UpdateSchema
 from src.repository.contacts import (
-    get_contact,
-    get_contacts,
     get_contact_by_email,
+    get_contact_by_phone,
     create_contact,
     delete_contact,
     update_contact,
@@ -32,30 +31,28 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         self.session = AsyncMock(spec=AsyncSession)
         print("Start Test")
 
-    async def test_get_contacts(self):
-        contacts = [Contact(), Contact(), Contact()]
-        mocked_contact = MagicMock()
-        mocked_contact.scalars.return_value.all.return_value = contacts
-        self.session.execute.return_value = mocked_contact
-        result = await get_contacts(offset=0, limit=10, db=self.session)
-        self.assertEqual(result, contacts)
-
-    async def test_get_contact(self):
+    async def test_get_contact_by_email(self):
         contact = Contact()
         mocked_contact = MagicMock()
         mocked_contact.scalar_one_or_none.return_value = contact
         self.session.execute.return_value = mocked_contact
-        result = await get_contact(contact_id=self.id, db=self.session)
+        result = await get_contact_by_email(email=self.contact.email, db=self.session)
         self.assertEqual(result, contact)
 
-    async def test_get_contact_by_email(self):
+    async def test_get_contact_by_phone(self):
         contact = Contact()
         mocked_contact = MagicMock()
         mocked_contact.scalar_one_or_none.return_value = contact
         self.session.execute.return_value = mocked_contact
-        result = await get_contact_by_email(email=self.contact.email, db=self.session)
+        result = await get_contact_by_phone(phone="+380 67 444 4444", db=self.session)
         self.assertEqual(result, contact)
 
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("+380 (67) 444-44-44"), "0674444444")
+        self.assertEqual(normalize_phone("067 444"), "067444")
+        self.assertEqual(normalize_phone("Test Name"), "")
+        self.assertEqual(self.contact.phone_digits, "0674444444")
+
     async def test_create_contact(self):
         body = ContactSchema(
             name="test_name",
@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox, utcnow
+from src.repository.outbox import (
+    DEAD,
+    PENDING,
+    claim_batch,
+    enqueue_email,
+    mark_failed,
+    retry_delay,
+)
+import worker
+from src.database.db import DatabaseSessionManager
+from worker import process_batch
+
+from conf.config import config, get_settings
+
+
+class TestAsyncOutbox(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = AsyncMock(spec=AsyncSession)
+        self.records = [
+            EmailOutbox(id=1, email="testemail1@ukr.net", username="test1_name", host="http://test/",
+                        status=PENDING, attempts=0, next_attempt_at=utcnow()),
+            EmailOutbox(id=2, email="testemail2@ukr.net", username="test2_name", host="http://test/",
+                        status=PENDING, attempts=0, next_attempt_at=utcnow()),
+        ]
+        mocked_records = MagicMock()
+        mocked_records.scalars.return_value.all.return_value = self.records
+        self.session.execute.return_value = mocked_records
+
+    async def test_enqueue_email(self):
+        result = await enqueue_email("testemail@ukr.net", "test_name", "http://test/", self.session)
+        self.session.add.assert_called_once_with(result)
+        self.session.commit.assert_called_once()
+        self.assertEqual(result.email, "testemail@ukr.net")
+
+    async def test_enqueue_email_in_callers_transaction(self):
+        result = await enqueue_email("testemail@ukr.net", "test_name", "http://test/", self.session, commit=False)
+        self.session.add.assert_called_once_with(result)
+        self.session.commit.assert_not_called()
+
+    async def test_claim_batch_leases_records(self):
+        result = await claim_batch(10, self.session)
+        self.assertEqual(result, self.records)
+        for record in result:
+            self.assertEqual(record.attempts, 1)
+            self.assertGreater(record.next_attempt_at, utcnow() + timedelta(seconds=config.OUTBOX_LEASE - 5))
+
+    async def test_mark_failed_backs_off(self):
+        record = self.records[0]
+        record.attempts = 2
+        await mark_failed(record, "ConnectionErrors()", self.session)
+        self.assertEqual(record.status, PENDING)
+        self.assertEqual(record.last_error, "ConnectionErrors()")
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+
+    async def test_mark_failed_dead_letters(self):
+        record = self.records[0]
+        record.attempts = config.OUTBOX_MAX_ATTEMPTS
+        await mark_failed(record, "ConnectionErrors()", self.session)
+        self.assertEqual(record.status, DEAD)
+
+    async def test_process_batch(self):
+        async def send(email, username, host):
+            if email == "testemail2@ukr.net":
+                raise ConnectionError("refused")
+
+        result = await process_batch(self.session, send=send)
+        self.assertEqual(result, 2)
+        self.assertEqual(self.records[0].last_error, None)
+        self.assertIn("refused", self.records[1].last_error)
+
+
+    async def test_run_survives_a_failing_batch(self):
+        stop = asyncio.Event()
+        calls = []
+
+        async def failing_batch(db):
+            calls.append(db)
+            if len(calls) == 2:
+                stop.set()
+            raise RuntimeError("database is gone")
+
+        with patch.object(worker, "process_batch", failing_batch), \
+                patch.object(worker, "sessionmanager", DatabaseSessionManager("sqlite+aiosqlite://")), \
+                patch.object(worker, "get_mail_pool", MagicMock(return_value=AsyncMock())), \
+                patch.object(get_settings(), "OUTBOX_POLL_INTERVAL", 0.01), \
+                self.assertLogs("worker", "ERROR") as logs:
+            await worker.run(stop)
+        self.assertEqual(len(calls), 2)
+        self.assertIn("Outbox batch failed", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
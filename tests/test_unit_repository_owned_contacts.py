@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from datetime import date, datetime
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, OwnedContact, birthday_month_day
+from src.schemas import OwnedContactSchema
+from src.repository import owned_contacts
+from src.repository.contacts import delete_contact as delete_account
+
+
+class TestAsyncOwnedContacts(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/owned.db")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        async with self.sessions() as session:
+            owners = [
+                Contact(
+                    name=f"Owner {number}",
+                    email=f"owner{number}@example.com",
+                    phone=f"067000000{number}",
+                    birthday=date(1990, 1, 1),
+                    password="hash",
+                )
+                for number in range(2)
+            ]
+            session.add_all(owners)
+            await session.flush()
+            self.owner, self.other = owners[0].id, owners[1].id
+            session.add_all(
+                OwnedContact(
+                    owner_id=owner.id,
+                    name=f"Entry {owner.id}-{number}",
+                    email=f"entry{owner.id}{number}@example.com",
+                    phone=f"+38067444444{number}",
+                    birthday=birthday,
+                )
+                for owner in owners
+                for number, birthday in enumerate((date(1980, 12, 30), date(1985, 1, 2), date(1990, 6, 1)))
+            )
+            await session.commit()
+        self.invalidate = patch.object(owned_contacts.cache, "invalidate_contact", AsyncMock()).start()
+
+    async def asyncTearDown(self):
+        patch.stopall()
+        await self.engine.dispose()
+
+    def test_birthday_month_day(self):
+        self.assertEqual(birthday_month_day(date(1980, 12, 30)), 1230)
+        entry = OwnedContact(phone="+38 (067) 444-44-40", birthday=date(1985, 1, 2))
+        self.assertEqual(entry.birthday_md, 102)
+        self.assertEqual(entry.phone_digits, "0674444440")
+
+    async def test_get_contacts_of_owner(self):
+        async with self.sessions() as session:
+            result = await owned_contacts.get_contacts(self.owner, 0, 10, session)
+        self.assertEqual([contact.name for contact in result], [f"Entry {self.owner}-{n}" for n in range(3)])
+
+    async def test_get_contact_of_other_owner(self):
+        async with self.sessions() as session:
+            entry = (await owned_contacts.get_contacts(self.other, 0, 1, session))[0]
+            self.assertIsNone(await owned_contacts.get_contact(self.owner, entry.id, session))
+            self.assertEqual(await owned_contacts.get_contacts_by_ids(self.owner, [entry.id], session), [])
+            self.assertIsNone(await owned_contacts.delete_contact(self.owner, entry.id, session))
+            self.assertEqual((await owned_contacts.get_contact(self.other, entry.id, session)).id, entry.id)
+
+    async def test_search_contacts_by_phone_prefix(self):
+        async with self.sessions() as session:
+            result = await owned_contacts.search_contacts(self.owner, "067 444", 0, 10, session)
+            self.assertEqual(len(result), 3)
+            self.assertTrue(all(contact.owner_id == self.owner for contact in result))
+            result = await owned_contacts.search_contacts(self.owner, f"entry{self.owner}1@example.com", 0, 10, session)
+            self.assertEqual([contact.name for contact in result], [f"Entry {self.owner}-1"])
+
+    async def test_coming_birthday_wraps_the_new_year(self):
+        now = MagicMock(return_value=datetime(2024, 12, 28, 12))
+        with patch.object(owned_contacts, "datetime", MagicMock(now=now)):
+            async with self.sessions() as session:
+                result = await owned_contacts.search_contacts_coming_birthday(self.owner, 0, 10, session)
+        self.assertEqual([contact.birthday for contact in result], [date(1980, 12, 30), date(1985, 1, 2)])
+
+    async def test_create_update_delete_contact(self):
+        body = OwnedContactSchema(
+            name="New Entry", email="new@example.com", phone="0675555555", birthday=date(2000, 3, 4)
+        )
+        async with self.sessions() as session:
+            contact = await owned_contacts.create_contact(self.owner, body, session)
+            self.assertEqual((contact.owner_id, contact.birthday_md), (self.owner, 304))
+            self.invalidate.assert_awaited_with(self.owner, contact.id)
+
+            body.birthday = date(2000, 7, 8)
+            updated = await owned_contacts.update_contact(self.owner, contact.id, body, session)
+            self.assertEqual(updated.birthday_md, 708)
+            self.assertIsNone(await owned_contacts.update_contact(self.other, contact.id, body, session))
+
+            deleted = await owned_contacts.delete_contact(self.owner, contact.id, session)
+            self.assertEqual(deleted.id, contact.id)
+            self.assertIsNone(await owned_contacts.get_contact(self.owner, contact.id, session))
+
+    async def test_deleting_an_account_deletes_its_book(self):
+        async with self.sessions() as session:
+            await delete_account(self.owner, session)
+            self.assertEqual(await owned_contacts.get_contacts(self.owner, 0, 10, session), [])
+            self.assertEqual(len(await owned_contacts.get_contacts(self.other, 0, 10, session)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.models import Base, normalize_phone
+from seed import ContactGenerator, existing_keys, load, load_owned, newest_ids
+
+
+class TestContactGenerator(unittest.TestCase):
+
+    def test_reproducible(self):
+        first = list(ContactGenerator(7, ["hash"]).batches(500, 100))
+        second = list(ContactGenerator(7, ["hash"]).batches(500, 100))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, list(ContactGenerator(8, ["hash"]).batches(500, 100)))
+
+    def test_unique_and_valid(self):
+        generator = ContactGenerator(1, ["a", "b"])
+        rows = [row for batch in generator.batches(20_000, 5000) for row in batch]
+        self.assertEqual(len({row[1] for row in rows}), len(rows))
+        self.assertEqual(len({row[3] for row in rows}), len(rows))
+        self.assertGreater(generator.email_collisions, 0)
+        for name, email, phone, digits, birthday, password, confirmed in rows[:1000]:
+            self.assertLessEqual(len(name), 40)
+            self.assertLessEqual(len(email), 50)
+            self.assertLessEqual(len(phone), 13)
+            self.assertEqual(normalize_phone(phone), digits)
+            self.assertIn(password, ("a", "b"))
+
+    def test_avoids_existing_rows(self):
+        rows = list(ContactGenerator(3, ["hash"]).batches(100, 100))[0]
+        generator = ContactGenerator(3, ["hash"], emails=[row[1] for row in rows], phone_digits=[row[3] for row in rows])
+        again = list(generator.batches(100, 100))[0]
+        self.assertFalse({row[1] for row in rows} & {row[1] for row in again})
+        self.assertFalse({row[3] for row in rows} & {row[3] for row in again})
+        self.assertGreater(generator.phone_collisions, 0)
+
+
+class TestLoad(unittest.IsolatedAsyncioTestCase):
+
+    async def test_load_sqlite(self):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.assertEqual(await load(engine, ContactGenerator(1, ["hash"]), 2500, 1000), 2500)
+        emails, phone_digits = await existing_keys(engine)
+        self.assertEqual(len(set(emails)), 2500)
+        generator = ContactGenerator(1, ["hash"], emails, phone_digits)
+        self.assertEqual(await load(engine, generator, 500, 1000), 500)
+        async with engine.connect() as conn:
+            self.assertEqual(await conn.scalar(text("SELECT count(*) FROM contacts")), 3000)
+        await engine.dispose()
+
+    async def test_load_owned_sqlite(self):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        generator = ContactGenerator(1, ["hash"])
+        await load(engine, generator, 10, 1000)
+        owner_ids = await newest_ids(engine, 3)
+        self.assertEqual(owner_ids, [8, 9, 10])
+        self.assertEqual(await load_owned(engine, generator, owner_ids, 250, 100), 750)
+        async with engine.connect() as conn:
+            counts = await conn.execute(
+                text("SELECT owner_id, count(*) FROM owned_contacts GROUP BY owner_id ORDER BY owner_id")
+            )
+            self.assertEqual(counts.all(), [(8, 250), (9, 250), (10, 250)])
+            row = (await conn.execute(text("SELECT phone, phone_digits, birthday, birthday_md FROM owned_contacts"))).first()
+        self.assertEqual(normalize_phone(row[0]), row[1])
+        self.assertEqual(int(row[2][5:7]) * 100 + int(row[2][8:10]), row[3])
+        await engine.dispose()
@@ -0,0 +1,64 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.database.db import sessionmanager
+from src.services.redis_client import get_redis
+from conf.config import get_settings
+from serve import check_shared_state, on_reload, pool_sizes
+
+
+class TestPoolSizes(unittest.TestCase):
+
+    def test_without_budget_keeps_configured_sizes(self):
+        self.assertEqual(pool_sizes(4, None, 5, 10), (5, 10))
+
+    def test_budget_is_split_between_workers(self):
+        size, overflow = pool_sizes(4, 100, 5, 10)
+        self.assertEqual((size, overflow), (12, 13))
+        self.assertLessEqual(4 * (size + overflow), 100)
+
+    def test_one_connection_per_worker(self):
+        self.assertEqual(pool_sizes(4, 4, 5, 10), (1, 0))
+
+    def test_budget_smaller_than_workers_is_refused(self):
+        with self.assertRaises(ValueError):
+            pool_sizes(8, 4, 5, 10)
+
+
+class TestOnReload(unittest.TestCase):
+
+    def test_reload_reads_settings_again(self):
+        self.addCleanup(get_settings.cache_clear)
+        get_settings.cache_clear()
+        env = {"DB_MAX_CONNECTIONS": "40", "DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "10"}
+        with patch.dict(os.environ, env):
+            stale = get_settings()
+            stale.DB_POOL_SIZE, stale.DB_MAX_OVERFLOW = 1, 1
+            os.environ["DB_MAX_CONNECTIONS"] = "80"
+            on_reload(SimpleNamespace(cfg=SimpleNamespace(workers=4)))
+            settings = get_settings()
+        self.assertIsNot(settings, stale)
+        self.assertEqual((settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW), (10, 10))
+        self.assertEqual(settings.WEB_CONCURRENCY, 4)
+
+
+class TestCheckSharedState(unittest.TestCase):
+
+    def setUp(self):
+        # other tests create the engine and the Redis client in this process, as the master would
+        for created in (patch.object(sessionmanager, "_engine", None), patch.object(get_redis(), "_client", None)):
+            created.start()
+            self.addCleanup(created.stop)
+
+    def test_fresh_master_is_safe_with_many_workers(self):
+        self.assertEqual(check_shared_state(4), [])
+
+    def test_redis_client_created_in_master(self):
+        with patch.object(get_redis(), "_client", object()):
+            self.assertIn("Redis", check_shared_state(1)[0])
+
+    def test_engine_created_in_master(self):
+        with patch.object(sessionmanager, "_engine", object()):
+            self.assertIn("database engine", check_shared_state(1)[0])
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from datetime import date
+
+from src.database.models import OwnedContact
+from src.services import cache
+from src.services.redis_client import RedisService
+
+from conf.config import config
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        if len(keys) == 1 and isinstance(keys[0], list):
+            keys = keys[0]
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, "0")) + 1)
+        return int(self.data[key])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        service = RedisService("localhost", 6379)
+        service._client = self.redis
+        self.original_redis = cache._redis
+        cache._redis = lambda: service
+        self.contacts = [
+            OwnedContact(
+                id=contact_id,
+                owner_id=1,
+                name=f"Test Name {contact_id}",
+                email=f"testemail{contact_id}@ukr.net",
+                phone=f"067444444{contact_id}",
+                birthday=date(1975, 12, 12),
+            )
+            for contact_id in (1, 2)
+        ]
+
+    def tearDown(self):
+        cache._redis = self.original_redis
+
+    def test_contact_key_is_tracked(self):
+        self.assertEqual(cache.contact_key(1), "owned_contact:1")
+        self.assertTrue(cache.contact_key(1).startswith(tuple(config.REDIS_TRACKED_PREFIXES)))
+
+    def test_only_generations_of_searches_are_tracked(self):
+        tracked = tuple(config.REDIS_TRACKED_PREFIXES)
+        self.assertTrue(cache.search_generation_key(1).startswith(tracked))
+        self.assertFalse(cache.search_key(1, "Test", 0, 10).startswith(tracked))
+
+    def test_normalize_search(self):
+        self.assertEqual(cache.normalize_search("  Test   Name "), "Test Name")
+
+    async def test_search_ids_roundtrip(self):
+        generation, ids = await cache.get_search_ids(1, "Test", 0, 10)
+        self.assertEqual((generation, ids), ("0", None))
+        await cache.set_search_ids(1, "Test", 0, 10, generation, [2, 1])
+        self.assertEqual(await cache.get_search_ids(1, "Test", 0, 10), ("0", [2, 1]))
+        self.assertEqual(await cache.get_search_ids(2, "Test", 0, 10), ("0", None))
+
+    async def test_invalidate_contact_bumps_generation(self):
+        await cache.set_search_ids(1, "Test", 0, 10, "0", [1])
+        await cache.set_search_ids(2, "Test", 0, 10, "0", [3])
+        await cache.set_contacts(self.contacts)
+        await cache.invalidate_contact(1, 1)
+        self.assertEqual(await cache.get_search_ids(1, "Test", 0, 10), ("1", None))
+        self.assertEqual(await cache.get_search_ids(2, "Test", 0, 10), ("0", [3]))
+        self.assertIsNone(self.redis.data.get(cache.contact_key(1)))
+        self.assertIsNotNone(self.redis.data.get(cache.contact_key(2)))
+
+    async def test_hydrate_contacts(self):
+        await cache.set_contacts(self.contacts[1:])
+        load = AsyncMock(return_value=self.contacts[:1])
+        result = await cache.hydrate_contacts([2, 1], load)
+        load.assert_awaited_once_with([1])
+        self.assertEqual([contact.id for contact in result], [2, 1])
+        self.assertIsNotNone(self.redis.data.get(cache.contact_key(1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
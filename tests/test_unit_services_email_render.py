@@ -0,0 +1,53 @@
+import unittest
+
+from jinja2 import DictLoader, Environment
+
+from src.services.email import TEMPLATE_FOLDER
+from src.services.email_render import CompiledTemplate, TemplatedEmail
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment(loader=DictLoader({
+            "plain.html": "<p>Hi {{username}},</p><a href=\"{{host}}confirm/{{token}}\">{{username}}</a>",
+            "filtered.html": "<p>Hi {{username|upper}}</p>",
+        }))
+
+    def test_render_matches_jinja(self):
+        template = CompiledTemplate(self.env, "plain.html", ("username", "host", "token"), escape=True)
+        values = {"username": "test <name>", "host": "http://test/", "token": "token"}
+        self.assertEqual(
+            template.render(**values),
+            '<p>Hi test &lt;name&gt;,</p><a href="http://test/confirm/token">test &lt;name&gt;</a>',
+        )
+        self.assertEqual(template.render_bytes(**values), template.render(**values).encode("utf-8"))
+
+    def test_rejects_filtered_fields(self):
+        with self.assertRaises(ValueError):
+            CompiledTemplate(self.env, "filtered.html", ("username",), escape=True)
+
+
+class TestTemplatedEmail(unittest.TestCase):
+
+    def test_prepare(self):
+        templated = TemplatedEmail(
+            TEMPLATE_FOLDER,
+            "email_template.html",
+            "email_template.txt",
+            fields=("username", "host", "token"),
+            subject="Confirm your email ",
+            sender_address="testemail@ukr.net",
+            sender_name="Auth contact",
+        )
+        prepared = templated.prepare("test2email@ukr.net", username="test_name", host="http://test/", token="token")
+        self.assertEqual(prepared.sender, "testemail@ukr.net")
+        self.assertIn(b"To: test2email@ukr.net\r\n", prepared.data)
+        self.assertIn(b"http://test/api/auth/confirmed_email/token", prepared.data)
+        message = prepared.build_message()
+        self.assertEqual(message["From"], "Auth contact <testemail@ukr.net>")
+        self.assertTrue(message.is_multipart())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from redis.exceptions import ConnectionError
+
+from src.services import cache, invalidation
+from src.services.invalidation import InvalidationBus, bus
+from src.services.single_flight import flights
+
+from conf.config import get_settings
+
+
+def sample(name: str, labels: dict | None = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    async def subscribe(self, channel):
+        if self.broker.down:
+            raise ConnectionError("down")
+        self.broker.subscribers.setdefault(channel, []).append(self)
+
+    async def get_message(self, timeout=None):
+        try:
+            message = await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    async def ping(self):
+        if not self.broker.down:
+            self.messages.put_nowait({"type": "pong", "data": ""})
+
+    async def aclose(self):
+        self.closed = True
+        for subscribers in self.broker.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+
+
+class FakeBroker:
+    def __init__(self):
+        self.down = False
+        self.subscribers: dict[str, list[FakePubSub]] = {}
+        self.published = 0
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, message):
+        if self.down:
+            raise ConnectionError("down")
+        self.published += 1
+        for pubsub in self.subscribers.get(channel, []):
+            pubsub.messages.put_nowait({"type": "message", "data": message})
+        return len(self.subscribers.get(channel, []))
+
+    def disconnect(self):
+        self.down = True
+        for subscribers in self.subscribers.values():
+            for pubsub in subscribers:
+                pubsub.messages.put_nowait(ConnectionError("connection lost"))
+
+
+class TestInvalidationBus(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.broker = FakeBroker()
+        self.patches = [
+            patch.object(invalidation, "get_redis", lambda: SimpleNamespace(client=self.broker)),
+            patch.object(get_settings(), "REDIS_RETRY_INTERVAL", 0.02),
+        ]
+        for started in self.patches:
+            started.start()
+        self.buses, self.evicted = [], []
+        for name in ("a", "b"):
+            worker = InvalidationBus()
+            worker.subscribe(lambda entity, entity_id, name=name: self.evicted.append((name, entity, entity_id)))
+            self.buses.append(worker)
+
+    async def asyncTearDown(self):
+        for worker in self.buses:
+            await worker.stop()
+        for started in self.patches:
+            started.stop()
+
+    async def start(self):
+        for worker in self.buses:
+            worker.start()
+        await self.until(lambda: len(self.broker.subscribers.get(get_settings().INVALIDATION_CHANNEL, [])) == 2)
+        self.evicted.clear()
+
+    async def until(self, condition, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "condition not reached")
+            await asyncio.sleep(0.005)
+
+    async def test_publish_evicts_locally_and_in_other_workers(self):
+        await self.start()
+        lag = sample("invalidation_lag_seconds_count")
+        first, second = self.buses
+        first.publish("contact", 7)
+        self.assertEqual(self.evicted, [("a", "contact", 7)])
+        await self.until(lambda: ("b", "contact", 7) in self.evicted)
+        self.assertEqual(self.evicted, [("a", "contact", 7), ("b", "contact", 7)])
+        self.assertEqual(sample("invalidation_lag_seconds_count") - lag, 1)
+
+    async def test_events_are_batched_into_one_message(self):
+        await self.start()
+        first, second = self.buses
+        for contact_id in range(5):
+            first.publish("owned_contact", contact_id)
+        await self.until(lambda: len([event for event in self.evicted if event[0] == "b"]) == 5)
+        self.assertEqual(self.broker.published, 1)
+        self.assertEqual([event[2] for event in self.evicted if event[0] == "b"], list(range(5)))
+
+    async def test_gap_in_versions_evicts_everything(self):
+        worker = self.buses[1]
+        resyncs = sample("invalidation_resyncs_total", {"reason": "gap"})
+        worker.receive(f"other {time.time()} contact:1:1 contact:2:2")
+        worker.receive(f"other {time.time()} contact:3:3")
+        self.assertNotIn(("b", None, None), self.evicted)
+        worker.receive(f"other {time.time()} contact:9:9")
+        self.assertIn(("b", None, None), self.evicted)
+        self.assertEqual(self.evicted[-1], ("b", "contact", 9))
+        self.assertEqual(sample("invalidation_resyncs_total", {"reason": "gap"}) - resyncs, 1)
+
+    async def test_malformed_message_evicts_everything(self):
+        self.buses[1].receive("garbage")
+        self.assertEqual(self.evicted, [("b", None, None)])
+
+    async def test_reconnect_evicts_everything(self):
+        await self.start()
+        resyncs = sample("invalidation_resyncs_total", {"reason": "connect"})
+        self.broker.disconnect()
+        await asyncio.sleep(0.05)
+        self.broker.down = False
+        await self.until(lambda: len(self.broker.subscribers[get_settings().INVALIDATION_CHANNEL]) == 2)
+        self.assertIn(("a", None, None), self.evicted)
+        self.assertIn(("b", None, None), self.evicted)
+        self.assertEqual(sample("invalidation_resyncs_total", {"reason": "connect"}) - resyncs, 2)
+
+        self.evicted.clear()
+        self.buses[0].publish("contact", 3)
+        await self.until(lambda: ("b", "contact", 3) in self.evicted)
+
+    async def test_unpublished_events_are_retried(self):
+        await self.start()
+        first, second = self.buses
+        self.broker.down = True
+        first.publish("contact", 4)
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(first.queue), 1)
+        self.assertEqual(sample("invalidation_queue_size"), 1)
+        self.broker.down = False
+        await self.until(lambda: ("b", "contact", 4) in self.evicted)
+        self.assertEqual(len(first.queue), 0)
+
+    async def test_own_messages_are_ignored(self):
+        worker = self.buses[0]
+        worker.origin = "self"
+        worker.receive(f"self {time.time()} contact:1:1")
+        self.assertEqual(self.evicted, [])
+
+
+class TestInvalidationHandlers(unittest.IsolatedAsyncioTestCase):
+
+    async def test_single_flight_and_local_cache_are_evicted(self):
+        service = SimpleNamespace(local=cache._redis().local)
+        service.local.set(cache.contact_key(5), "cached")
+        service.local.set(cache.contact_key(6), "cached")
+        flights._flights[("get_contact", (1, 5))] = object()
+        bus.receive(f"peer-{id(self)} {time.time()} owned_contact:5:1")
+        self.assertEqual(flights._flights, {})
+        self.assertIsNone(service.local.get(cache.contact_key(5)))
+        self.assertEqual(service.local.get(cache.contact_key(6)), "cached")
+        bus.resync("test")
+        self.assertEqual(len(service.local), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import email
+import socket
+import unittest
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig, MessageSchema, MessageType
+
+from src.services.email import TEMPLATE_FOLDER, get_confirmation_email
+from src.services.mail_transport import SMTPPool
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+class TestSMTPPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.conf = ConnectionConfig(
+            MAIL_USERNAME="testemail@ukr.net",
+            MAIL_PASSWORD="password",
+            MAIL_FROM="testemail@ukr.net",
+            MAIL_PORT=port,
+            MAIL_SERVER="127.0.0.1",
+            MAIL_STARTTLS=False,
+            MAIL_SSL_TLS=False,
+            USE_CREDENTIALS=False,
+            VALIDATE_CERTS=False,
+            TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+        )
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def message(self, number):
+        return MessageSchema(
+            subject="Confirm your email ",
+            recipients=[f"testemail{number}@ukr.net"],
+            template_body={"host": "http://test/", "username": "test_name", "token": "token"},
+            subtype=MessageType.html,
+        )
+
+    async def test_reuses_session(self):
+        pool = SMTPPool(self.conf, size=1)
+        for number in range(3):
+            await pool.send_message(self.message(number), template_name="email_template.html")
+        await pool.close()
+        self.assertEqual(len(self.handler.messages), 3)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertEqual(pool.connects, 1)
+        html = [part for part in email.message_from_bytes(self.handler.messages[0].content).walk()
+                if part.get_content_type() == "text/html"][0]
+        self.assertIn(b"api/auth/confirmed_email/token", html.get_payload(decode=True))
+
+    async def test_send_prepared(self):
+        pool = SMTPPool(self.conf, size=1)
+        prepared = get_confirmation_email().prepare(
+            "testemail@ukr.net", username="Тест", host="http://test/", token="token"
+        )
+        await pool.send_prepared(prepared)
+        await pool.close()
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(self.handler.messages[0].rcpt_tos, ["testemail@ukr.net"])
+        parts = {
+            part.get_content_type(): part.get_payload(decode=True).decode("utf-8")
+            for part in email.message_from_bytes(self.handler.messages[0].content).walk()
+            if not part.is_multipart()
+        }
+        self.assertIn("Hi Тест,", parts["text/plain"])
+        self.assertIn("http://test/api/auth/confirmed_email/token", parts["text/html"])
+
+    async def test_reconnects_when_idle(self):
+        pool = SMTPPool(self.conf, size=1, idle_timeout=0)
+        for number in range(2):
+            await pool.send_message(self.message(number), template_name="email_template.html")
+        await pool.close()
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(pool.connects, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
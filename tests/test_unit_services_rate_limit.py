@@ -0,0 +1,140 @@
+import asyncio
+import math
+import random
+import unittest
+from unittest.mock import patch
+
+from limits import parse
+from starlette.requests import Request
+
+from src.services import rate_limit
+from src.services.auth import auth_service
+from src.services.rate_limit import TwoTierRateLimiter, TwoTierStorage, client_ip, user_or_ip_key
+from src.services.redis_client import RedisService
+from tests.test_unit_services_cache import FakeRedis
+
+from conf.config import get_settings
+
+
+class CounterRedis(FakeRedis):
+    async def incrby(self, key, amount):
+        self.data[key] = str(int(self.data.get(key, "0")) + amount)
+        return int(self.data[key])
+
+    async def expire(self, key, seconds):
+        return key in self.data
+
+
+def make_request(peer: str, headers: dict | None = None) -> Request:
+    return Request({
+        "type": "http",
+        "client": (peer, 40000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+class TestKeys(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        proxies = patch.object(get_settings(), "TRUSTED_PROXIES", ["10.0.0.0/8"])
+        proxies.start()
+        self.addCleanup(proxies.stop)
+        rate_limit.trusted_networks.cache_clear()
+        self.addCleanup(rate_limit.trusted_networks.cache_clear)
+
+    def test_forwarded_for_is_ignored_from_untrusted_peers(self):
+        request = make_request("203.0.113.5", {"X-Forwarded-For": "198.51.100.1"})
+        self.assertEqual(client_ip(request), "203.0.113.5")
+
+    def test_forwarded_for_from_trusted_proxies(self):
+        request = make_request("10.0.0.2", {"X-Forwarded-For": "1.1.1.1, 198.51.100.1, 10.0.0.7"})
+        self.assertEqual(client_ip(request), "198.51.100.1")
+        self.assertEqual(client_ip(make_request("10.0.0.2", {"X-Forwarded-For": "10.0.0.9"})), "10.0.0.9")
+        self.assertEqual(client_ip(make_request("10.0.0.2")), "10.0.0.2")
+
+    async def test_user_key_needs_a_valid_access_token(self):
+        access_token = await auth_service.create_access_token(data={"sub": "user@example.com"})
+        refresh_token = await auth_service.create_refresh_token(data={"sub": "user@example.com"})
+        for token, key in (
+            (access_token, "user:user@example.com"),
+            (refresh_token, "ip:203.0.113.5"),
+            ("garbage", "ip:203.0.113.5"),
+        ):
+            request = make_request("203.0.113.5", {"Authorization": f"Bearer {token}"})
+            self.assertEqual(user_or_ip_key(request), key)
+
+
+class TestTwoTierStorage(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = CounterRedis()
+        self.service = RedisService("localhost", 6379)
+        self.service._client = self.redis
+        redis = patch.object(rate_limit, "get_redis", lambda: self.service)
+        redis.start()
+        self.addCleanup(redis.stop)
+        self.item = parse("20/hour")
+
+    def make_workers(self, count: int) -> list[TwoTierRateLimiter]:
+        workers = []
+        for _ in range(count):
+            storage = TwoTierStorage()
+            storage.workers = count
+            workers.append(TwoTierRateLimiter(storage))
+        return workers
+
+    async def test_single_worker_is_exact(self):
+        limiter, = self.make_workers(1)
+        admitted = [limiter.hit(self.item, "ip:1") for _ in range(25)]
+        self.assertEqual(admitted.count(True), 20)
+        self.assertFalse(limiter.test(self.item, "ip:1"))
+        self.assertTrue(limiter.hit(self.item, "ip:2"))
+        self.assertEqual(limiter.get_window_stats(self.item, "ip:1").remaining, 0)
+
+    async def test_workers_share_the_budget(self):
+        workers = self.make_workers(4)
+        # all traffic reaches one worker: its share grows with every reconciliation
+        busy = workers[0]
+        admitted = 0
+        for _ in range(10):
+            admitted += sum(busy.hit(self.item, "ip:1") for _ in range(20))
+            await busy.storage.sync()
+        self.assertEqual(admitted, 20)
+        # a worker that has not reconciled this key yet admits at most its share
+        late = workers[1]
+        self.assertEqual(sum(late.hit(self.item, "ip:1") for _ in range(20)), 5)
+        await late.storage.sync()
+        self.assertFalse(late.hit(self.item, "ip:1"))
+
+    async def test_over_admission_is_bounded(self):
+        count = 4
+        bound = self.item.amount + count * math.ceil(self.item.amount / count)
+        for seed in range(20):
+            self.redis.data.clear()
+            workers = self.make_workers(count)
+            generator = random.Random(seed)
+            admitted = 0
+            for _ in range(400):
+                worker = generator.choice(workers)
+                if generator.random() < 0.2:
+                    await worker.storage.sync()
+                else:
+                    admitted += worker.hit(self.item, "ip:1")
+            self.assertLessEqual(admitted, bound)
+            for worker in workers:
+                await worker.storage.sync()
+            self.assertEqual(int(self.redis.data[next(iter(self.redis.data))]), admitted)
+
+    async def test_reconciliation_task(self):
+        limiter, = self.make_workers(1)
+        limiter.hit(self.item, "ip:1")
+        with patch.object(get_settings(), "RATELIMIT_SYNC_INTERVAL", 0.01):
+            limiter.storage.start()
+            await asyncio.sleep(0.05)
+            limiter.hit(self.item, "ip:1")
+            await limiter.storage.stop()
+        self.assertEqual(list(self.redis.data.values()), ["2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import time
+import unittest
+
+from redis.exceptions import ConnectionError
+
+from src.services.redis_client import INVALIDATE_CHANNEL, LocalStore, RedisService
+from tests.test_unit_services_cache import FakeRedis
+
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.mgets = 0
+        self.ttls = {}
+
+    async def mget(self, *keys):
+        if self.down:
+            raise ConnectionError("down")
+        self.mgets += 1
+        return await super().mget(*keys)
+
+    async def set(self, key, value, ex=None):
+        if self.down:
+            raise ConnectionError("down")
+        await super().set(key, value, ex)
+
+    def pipeline(self, transaction=True):
+        if self.down:
+            raise ConnectionError("down")
+        return super().pipeline(transaction)
+
+    async def incrby(self, key, amount):
+        self.data[key] = str(int(self.data.get(key, "0")) + amount)
+        return int(self.data[key])
+
+    async def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return key in self.data
+
+
+class FakeListener:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    async def read_response(self, timeout=None):
+        if not self.messages:
+            raise ConnectionError("closed")
+        return self.messages.pop(0)
+
+    async def send_command(self, *args):
+        pass
+
+
+class TestLocalStore(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        store = LocalStore(2, 60)
+        store.set("a", 1)
+        store.set("b", 2)
+        store.get("a")
+        store.set("c", 3)
+        self.assertEqual((store.get("a"), store.get("b"), store.get("c")), (1, None, 3))
+
+    def test_expires_and_keeps_none(self):
+        store = LocalStore(10, 60)
+        store.set("missing", None)
+        store.set("old", "value", ex=0)
+        time.sleep(0.001)
+        self.assertEqual(store.lookup("missing"), (True, None))
+        self.assertEqual(store.lookup("old"), (False, None))
+        self.assertEqual(store.incr("counter"), 1)
+        self.assertEqual(store.incr("counter"), 2)
+
+
+class TestRedisService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = CountingRedis()
+        self.service = RedisService("localhost", 6379, retry_interval=60, tracked_prefixes=["contact:"])
+        self.service._client = self.redis
+
+    async def test_batch_is_one_pipeline(self):
+        async with self.service.batch() as batch:
+            batch.set("contact:1", "a")
+            batch.incr("search:generation")
+        self.assertEqual(batch.results, [None, 1])
+        self.assertEqual(await self.service.mget(["contact:1", "search:generation"]), ["a", "1"])
+
+    async def test_fallback_and_replay(self):
+        await self.service.set("contact:1", "old")
+        self.redis.down = True
+        await self.service.set("contact:1", "new")
+        async with self.service.batch() as batch:
+            batch.incr("search:generation")
+        self.assertFalse(self.service.available)
+        self.assertEqual(await self.service.get("contact:1"), "new")
+        self.assertEqual(self.redis.data["contact:1"], "old")
+
+        self.redis.down = False
+        self.service._down_until = time.monotonic()
+        self.assertIsNone(await self.service.get("contact:1"))
+        self.assertTrue(self.service.available)
+        self.assertEqual(self.redis.data["search:generation"], "1")
+        self.assertEqual(len(self.service.fallback), 0)
+
+    async def test_replay_counters_with_amount_and_ttl(self):
+        self.redis.down = True
+        async with self.service.batch() as batch:
+            batch.incrby("ratelimit:a", 3)
+            batch.expire("ratelimit:a", 61)
+        async with self.service.batch() as batch:
+            batch.incrby("ratelimit:a", 2)
+        self.assertEqual(batch.results, [5])
+        self.assertEqual(self.service._pending_incrs, set())
+
+        self.redis.down = False
+        self.service._down_until = time.monotonic()
+        await self.service.get("contact:1")
+        self.assertEqual(self.redis.data["ratelimit:a"], "5")
+        self.assertEqual(self.redis.ttls["ratelimit:a"], 61)
+
+    async def test_client_side_cache(self):
+        self.redis.data.update({"contact:1": "a", "search:generation": "3"})
+        self.service.tracking = True
+        await self.service.mget(["contact:1", "search:generation"])
+        self.assertEqual(await self.service.mget(["contact:1"]), ["a"])
+        self.assertEqual(self.redis.mgets, 1)
+
+        self.redis.data["contact:1"] = "b"
+        listener = FakeListener([["message", INVALIDATE_CHANNEL, ["contact:1"]]])
+        with self.assertRaises(ConnectionError):
+            await self.service._receive(listener)
+        self.assertEqual(await self.service.get("contact:1"), "b")
+        self.assertEqual(self.redis.mgets, 2)
+
+    async def test_untracked_when_listener_is_down(self):
+        self.redis.data["contact:1"] = "a"
+        await self.service.get("contact:1")
+        await self.service.get("contact:1")
+        self.assertEqual(self.redis.mgets, 2)
+        self.assertEqual(len(self.service.local), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
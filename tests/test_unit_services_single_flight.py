@@ -0,0 +1,116 @@
+import asyncio
+import tempfile
+import unittest
+from datetime import date
+
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, OwnedContact
+from src.repository import owned_contacts as repository_owned_contacts
+from src.services.single_flight import SingleFlight
+
+
+def calls(operation: str, result: str) -> float:
+    return REGISTRY.get_sample_value(
+        "single_flight_calls_total", {"operation": operation, "result": result}
+    ) or 0.0
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/flight.db")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        async with self.sessions() as session:
+            owner = Contact(
+                name="Owner", email="owner@example.com", phone="0670000009", birthday=date(1990, 1, 1), password="hash"
+            )
+            session.add(owner)
+            await session.flush()
+            self.owner_id = owner.id
+            session.add_all(
+                OwnedContact(
+                    owner_id=owner.id,
+                    name=f"Flight {number}",
+                    email=f"flight{number}@example.com",
+                    phone=f"067000000{number}",
+                    birthday=date(1990, 1, number + 1),
+                )
+                for number in range(3)
+            )
+            await session.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_concurrent_reads_share_one_query(self):
+        executed, coalesced = calls("get_contact", "executed"), calls("get_contact", "coalesced")
+        sessions = [self.sessions() for _ in range(10)]
+        results = await asyncio.gather(*(repository_owned_contacts.get_contact(self.owner_id, 1, session) for session in sessions))
+        self.assertEqual(calls("get_contact", "executed") - executed, 1)
+        self.assertEqual(calls("get_contact", "coalesced") - coalesced, 9)
+        self.assertEqual(len({id(contact) for contact in results}), 10)
+        for session, contact in zip(sessions, results):
+            self.assertIn(contact, session)
+            self.assertEqual((contact.id, contact.email), (1, "flight0@example.com"))
+
+        waiter, session = results[-1], sessions[-1]
+        waiter.name = "Renamed"
+        await session.commit()
+        for session in sessions:
+            await session.close()
+        async with self.sessions() as session:
+            self.assertEqual((await repository_owned_contacts.get_contact(self.owner_id, 1, session)).name, "Renamed")
+
+    async def test_lists_and_objects_already_in_the_session(self):
+        async with self.sessions() as first, self.sessions() as second:
+            own = await repository_owned_contacts.get_contact(self.owner_id, 2, second)
+            results = await asyncio.gather(
+                repository_owned_contacts.search_contacts(self.owner_id, "Flight", 0, 10, first),
+                repository_owned_contacts.search_contacts(self.owner_id, "Flight", 0, 10, second),
+            )
+            self.assertEqual([contact.id for contact in results[0]], [contact.id for contact in results[1]])
+            self.assertIs(next(contact for contact in results[1] if contact.id == own.id), own)
+
+    async def test_waiters_run_the_read_when_the_first_caller_fails(self):
+        group = SingleFlight()
+        started = asyncio.Event()
+
+        async def failing():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RuntimeError("connection lost")
+
+        async def succeeding():
+            return None
+
+        first = asyncio.create_task(group.run("read", 1, None, failing))
+        await started.wait()
+        self.assertIsNone(await group.run("read", 1, None, succeeding))
+        with self.assertRaises(RuntimeError):
+            await first
+
+    async def test_writes_forget_flights_in_progress(self):
+        group = SingleFlight()
+        release = asyncio.Event()
+
+        async def stale():
+            await release.wait()
+            return "before"
+
+        async def fresh():
+            return "after"
+
+        first = asyncio.create_task(group.run("read", 1, None, stale))
+        await asyncio.sleep(0)
+        group.forget()
+        self.assertEqual(await group.run("read", 1, None, fresh), "after")
+        release.set()
+        self.assertEqual(await first, "before")
+
+
+if __name__ == "__main__":
+    unittest.main()
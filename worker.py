@@ -0,0 +1,74 @@
+"""
+Outbox worker: delivers the confirmation emails queued by the web process.
+
+    python worker.py
+"""
+import asyncio
+import logging
+import signal
+
+from src.database.db import sessionmanager
+from src.repository import outbox as repository_outbox
+from src.services.email import get_confirmation_email, get_mail_pool, send_email
+from src.services.metrics import EMAILS
+
+from conf.config import config
+
+logger = logging.getLogger(__name__)
+
+
+async def process_batch(db, send=send_email) -> int:
+    """
+    The process_batch function claims one batch of due outbox records and delivers them concurrently.
+        Records that were sent are marked as sent, the others are scheduled for a retry
+        or moved to the dead-letter state.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param send: Callable: Deliver one email, raises on failure
+    :return: The number of records claimed
+    :doc-author: Trelent
+    """
+    records = await repository_outbox.claim_batch(config.OUTBOX_BATCH_SIZE, db)
+    results = await asyncio.gather(
+        *(send(record.email, record.username, record.host) for record in records),
+        return_exceptions=True,
+    )
+    sent = []
+    for record, result in zip(records, results):
+        if isinstance(result, Exception):
+            await repository_outbox.mark_failed(record, repr(result), db)
+            EMAILS.labels("dead" if record.status == repository_outbox.DEAD else "retry").inc()
+        else:
+            sent.append(record.id)
+    await repository_outbox.mark_sent(sent, db)
+    EMAILS.labels("sent").inc(len(sent))
+    return len(records)
+
+
+async def run(stop: asyncio.Event):
+    while not stop.is_set():
+        claimed = 0
+        try:
+            async with sessionmanager.session(raise_errors=True) as db:
+                claimed = await process_batch(db)
+        except Exception:
+            logger.exception("Outbox batch failed")
+        if claimed < config.OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop.wait(), config.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    await get_mail_pool().close()
+
+
+async def main():
+    get_confirmation_email()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await run(stop)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())